@@ -37,6 +37,7 @@ setup(
     packages=find_packages(),
     author_email='developer@ufactory.cc',
     install_requires=requirements,
+    extras_require={'numpy': ['numpy']},
     long_description=long_description,
     license='MIT',
     zip_safe=False
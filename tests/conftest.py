@@ -0,0 +1,14 @@
+import pytest
+
+from xarm.tools.simulator import Simulator
+
+
+@pytest.fixture
+def sim():
+    # the TCP servers of the simulated controller on 127.0.0.1 (the ports of the xArm)
+    try:
+        sim = Simulator(enabled=True).start()
+    except OSError as e:
+        pytest.skip('the simulator can not listen: {}'.format(e))
+    yield sim
+    sim.stop()
@@ -0,0 +1,91 @@
+import asyncio
+import inspect
+
+import pytest
+
+from xarm.x3 import XArm
+from xarm.x3.aio import AsyncXArm, SYNC_SAFE_METHODS
+from xarm.x3.events import Events
+
+# the arguments of the coroutine interfaces, the others are called without argument
+ASYNC_ARGS = {
+    'connect': (),
+    'set_state': (0,),
+    'set_mode': (0,),
+    'set_position': dict(x=300, y=0, z=200, speed=500, wait=True, timeout=5),
+    'set_servo_angle': dict(angle=[1, 0, 0, 0, 0, 0, 0], speed=100, wait=True, timeout=5),
+    'set_servo_angle_j': ([0] * 7,),
+    'set_pause_time': (0,),
+}
+# called last, in this order
+ASYNC_LAST = ['emergency_stop', 'disconnect']
+
+
+def public_methods():
+    return sorted(name for name in dir(AsyncXArm)
+                  if not name.startswith('_') and callable(getattr(AsyncXArm, name)))
+
+
+def call(method, args):
+    if isinstance(args, dict):
+        return method(**args)
+    return method(*args)
+
+
+def test_every_public_method():
+    async def main():
+        arm = AsyncXArm('sim://')
+        await arm.connect()
+        for _ in range(100):
+            if arm.ready and arm.state == 2:
+                break
+            await asyncio.sleep(0.01)
+        assert arm.connected and arm.version
+
+        names = public_methods()
+        coroutines = [name for name in names if inspect.iscoroutinefunction(getattr(AsyncXArm, name))]
+        for name in [name for name in coroutines if name not in ASYNC_LAST] + ASYNC_LAST:
+            ret = await call(getattr(arm, name), ASYNC_ARGS.get(name, ()))
+            if isinstance(ret, tuple):
+                ret = ret[0]
+            assert ret in (None, 0), name
+
+        for name in names:
+            if name in coroutines:
+                continue
+            if hasattr(Events, name):
+                getattr(arm, name)(lambda ret: None)
+            elif name in SYNC_SAFE_METHODS:
+                assert name in XArm.__dict__
+            else:
+                with pytest.raises(NotImplementedError, match=name):
+                    getattr(arm, name)()
+        assert not arm.connected
+
+    asyncio.run(main())
+
+
+def test_properties_do_not_call_the_sync_interfaces():
+    arm = AsyncXArm('sim://', enable_report=False)
+    for name in ('version', 'position', 'angles', 'state', 'cmd_num', 'error_code', 'warn_code',
+                 'has_error', 'has_warn'):
+        getattr(arm, name)
+
+
+def test_sync_safe_methods_exist():
+    for name in SYNC_SAFE_METHODS:
+        assert callable(getattr(XArm, name))
+
+
+def test_gpio_set_digital_is_a_coroutine():
+    async def main():
+        arm = AsyncXArm('sim://', enable_report=False)
+        await arm.connect()
+        try:
+            assert await arm.arm_cmd.gpio_set_digital(3, 1) == [-1, -1]
+            assert (await arm.arm_cmd.gpio_set_digital(2, 1))[0] == 0
+            assert await arm.arm_cmd.wait_pipeline() == 0
+        finally:
+            await arm.disconnect()
+
+    asyncio.run(main())
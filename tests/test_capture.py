@@ -0,0 +1,168 @@
+import asyncio
+import time
+
+import pytest
+
+from xarm.core.comm.transport import register_responder, RESPONDERS
+from xarm.tools.simulator import SimArm
+from xarm.wrapper import XArmAPI
+from xarm.x3 import XArm
+from xarm.x3.aio import AsyncXArm
+from xarm.x3.capture import WireLog, WireReplay, ReportRecorder, ReportCapture, ReportReplay
+
+
+def exercise(arm):
+    return [
+        arm.get_state(),
+        arm.get_position(),
+        arm.set_mode(0),
+        arm.set_state(0),
+        arm.get_servo_angle(),
+        arm.get_err_warn_code(),
+    ]
+
+
+def test_wire_record_and_replay(tmp_path):
+    path = str(tmp_path / 'cmd.log')
+    arm = XArmAPI('sim://', enable_report=False, wire_capture=path)
+    try:
+        recorded = exercise(arm)
+    finally:
+        arm.disconnect()
+        count = arm.stop_wire_capture()
+    assert count > 0
+
+    log = WireLog(path)
+    assert len(log) > 0 and all(exchange[4] is not None for exchange in log.exchanges)
+
+    replay = WireReplay(log)
+    register_responder('replay', replay)
+    arm = XArmAPI('loop://replay', enable_report=False)
+    try:
+        assert exercise(arm) == recorded
+    finally:
+        arm.disconnect()
+        RESPONDERS.pop('replay', None)
+    stats = replay.stats
+    assert stats['matched'] == len(log) and stats['missed'] == 0 and stats['diverged'] == 0
+    assert stats['remaining'] == 0
+
+
+def test_async_wire_capture(tmp_path):
+    path = str(tmp_path / 'aio.log')
+
+    async def main():
+        arm = AsyncXArm('sim://', enable_report=False)
+        await arm.connect()
+        arm.start_wire_capture(path)
+        await arm.get_state()
+        await arm.get_position()
+        await arm.disconnect()
+        return arm.stop_wire_capture()
+
+    assert asyncio.run(main()) == 4
+    log = WireLog(path)
+    assert len(log) == 2 and all(exchange[4] is not None for exchange in log.exchanges)
+
+
+def report_frames(count):
+    # rich report frames of a moving arm
+    sim = SimArm(enabled=True)
+    frames = []
+    for i in range(count):
+        sim.angles[0] = i * 0.01
+        frames.append(bytes(sim.report_frame('rich')))
+    return frames
+
+
+def test_report_record_and_read(tmp_path):
+    path = str(tmp_path / 'report.bin')
+    frames = report_frames(50)
+    # a small chunk size to grow the file several times
+    with ReportRecorder(path, chunk_size=1024, index_interval=0.1) as recorder:
+        for i, frame in enumerate(frames):
+            recorder.write(frame, report_type='rich' if i % 2 else 'real', timestamp=1000 + i * 0.01,
+                           is_old_protocol=(i == 3))
+    assert recorder.count == 50 and recorder.closed
+    with ReportCapture(path) as capture:
+        records = list(capture)
+        assert [bytes(r[1]) for r in records] == frames
+        assert [r[0] for r in records] == pytest.approx([1000 + i * 0.01 for i in range(50)])
+        assert [r[2] for r in records[:3]] == ['real', 'rich', 'real']
+        assert [r[3] for r in records[:5]] == [False, False, False, True, False]
+        assert capture.end_time == pytest.approx(1000.49)
+        # the index entries are about index_interval apart
+        assert 4 <= len(capture._index_times) <= 6
+
+
+def test_report_records_between_times(tmp_path):
+    path = str(tmp_path / 'report.bin')
+    frames = report_frames(100)
+    with ReportRecorder(path, index_interval=0.1) as recorder:
+        for i, frame in enumerate(frames):
+            recorder.write(frame, timestamp=1000 + i * 0.01)
+    with ReportCapture(path) as capture:
+        records = list(capture.records(1000.255, 1000.505))
+        assert [bytes(r[1]) for r in records] == frames[26:51]
+        assert list(capture.records(2000)) == []
+        assert len(list(capture.records(t1=999))) == 0
+
+
+def test_unclosed_capture_is_readable(tmp_path):
+    path = str(tmp_path / 'report.bin')
+    frames = report_frames(10)
+    recorder = ReportRecorder(path, chunk_size=64 * 1024)
+    try:
+        for frame in frames:
+            recorder.write(frame)
+        recorder.flush()
+        # the preallocated tail of the file ends the records
+        with ReportCapture(path) as capture:
+            assert [bytes(r[1]) for r in capture] == frames
+    finally:
+        recorder.close()
+
+
+def test_not_a_capture(tmp_path):
+    path = tmp_path / 'other.bin'
+    path.write_bytes(bytes(64))
+    with pytest.raises(ValueError):
+        ReportCapture(str(path))
+
+
+def test_replay_feeds_the_report_handlers(tmp_path):
+    path = str(tmp_path / 'report.bin')
+    frames = report_frames(20)
+    with ReportRecorder(path) as recorder:
+        for i, frame in enumerate(frames):
+            recorder.write(frame, timestamp=1000 + i * 0.01)
+    arm = XArm(do_not_open=True, is_radian=True)
+    with ReportCapture(path) as capture:
+        replay = ReportReplay(capture, arm, speed=0)
+        assert replay.run() == 20
+        assert arm.angles[0] == pytest.approx(0.19)
+        assert arm.state == 2
+        # 0.19s of records at 4 times the speed
+        start = time.monotonic()
+        replay = ReportReplay(capture, arm, speed=4).start(t1=1000.105)
+        replay.join(2)
+        assert not replay.alive and replay.count == 11
+        assert 0.015 < time.monotonic() - start < 1
+        assert arm.angles[0] == pytest.approx(0.1)
+
+
+def test_report_capture_of_an_arm(tmp_path):
+    path = str(tmp_path / 'report.bin')
+    arm = XArmAPI('sim://', report_capture=path)
+    try:
+        deadline = time.monotonic() + 2
+        while arm._arm._report_recorder.count < 5 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        arm.disconnect()
+    count = arm.stop_report_capture()
+    assert count >= 5
+    with ReportCapture(path) as capture:
+        records = list(capture)
+        assert len(records) == count
+        assert all(r[2] == arm._arm._report_type for r in records)
@@ -0,0 +1,68 @@
+import random
+import struct
+
+import pytest
+
+from xarm.core.utils import codec, convert
+
+VALUES = [0.0, 1.5, -2.25, 3.1415926, 1e-6, -1e6, 123.456]
+
+
+# the byte-by-byte helpers of the previous convert module
+def old_fp32s_to_bytes(data, n):
+    return b''.join(bytes(struct.pack('f', data[i])) for i in range(n))
+
+
+def old_bytes_to_fp32s(data, n):
+    return [struct.unpack('f', bytes(data[i * 4:i * 4 + 4]))[0] for i in range(n)]
+
+
+def old_u16_to_bytes(data):
+    return bytes([data // 256 % 256]) + bytes([data % 256])
+
+
+def old_bytes_to_u16s(data, n):
+    return [data[i * 2] << 8 | data[i * 2 + 1] for i in range(n)]
+
+
+def old_bytes_to_long_big(data):
+    return struct.unpack('>l', bytes(data[0:4]))[0]
+
+
+@pytest.mark.parametrize('n', [1, 3, 6, 7, 8, 10, 16])
+def test_fp32s(n):
+    values = (VALUES * 3)[:n]
+    data = codec.pack_fp32s(values, n)
+    assert data == old_fp32s_to_bytes(values, n)
+    assert codec.unpack_fp32s(data, n) == old_bytes_to_fp32s(data, n)
+    # the payload of send_pend is a list of ints
+    assert codec.unpack_fp32s(list(data), n) == old_bytes_to_fp32s(data, n)
+    assert convert.fp32s_to_bytes(values, n) == data
+    assert convert.bytes_to_fp32s(data, n) == old_bytes_to_fp32s(data, n)
+
+
+def test_pack_into_and_offsets():
+    buf = bytearray(3 + 4 * 6)
+    assert codec.pack_fp32s_into(buf, 3, VALUES, 6) == len(buf)
+    assert bytes(buf[3:]) == old_fp32s_to_bytes(VALUES, 6)
+    assert codec.unpack_fp32s(buf, 6, offset=3) == old_bytes_to_fp32s(buf[3:], 6)
+    assert codec.unpack_fp32(buf, 7) == old_bytes_to_fp32s(buf[7:11], 1)[0]
+
+
+def test_integers():
+    rng = random.Random(7)
+    for _ in range(200):
+        data = bytes(rng.getrandbits(8) for _ in range(16))
+        assert codec.unpack_u16s(data, 8) == old_bytes_to_u16s(data, 8)
+        assert codec.unpack_u16(data, 2) == old_bytes_to_u16s(data[2:], 1)[0]
+        assert codec.unpack_i32(data) == old_bytes_to_long_big(data)
+        assert codec.unpack_u32(data) == convert.bytes_to_u32(data)
+        assert convert.bytes_to_long_big(list(data)) == old_bytes_to_long_big(data)
+    for value in (0, 1, 255, 256, 0x1234, 65535, 65536, -1):
+        assert convert.u16_to_bytes(value) == old_u16_to_bytes(value)
+
+
+def test_structs_are_cached():
+    assert codec.fp32s_struct(7) is codec.fp32s_struct(7)
+    assert codec.fp32s_struct(11).size == 44
+    assert codec.u16s_struct(3) is codec.u16s_struct(3)
@@ -0,0 +1,91 @@
+import random
+
+import pytest
+
+from xarm.core.utils import crc16
+from xarm.core.utils.crc16 import CRC16_INIT, CRC_TABLE, Crc16Modbus, crc16_update, crc_modbus, check_modbus, \
+    check_modbus_batch
+
+
+def bitwise_crc(data, crc=CRC16_INIT):
+    # the reference, bit by bit
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+    return crc
+
+
+def random_data(count, max_len=300, seed=1):
+    rng = random.Random(seed)
+    return [bytes(rng.getrandbits(8) for _ in range(rng.randint(0, max_len))) for _ in range(count)]
+
+
+def test_known_value():
+    assert crc_modbus(b'123456789') == bytes([0x37, 0x4B])
+    assert crc_modbus(b'') == bytes([0xFF, 0xFF])
+
+
+def test_table():
+    assert len(CRC_TABLE) == 256
+    for i in range(256):
+        assert CRC_TABLE[i] == bitwise_crc(bytes([i]), 0)
+
+
+def test_word_table():
+    words = crc16._word_table()
+    assert len(words) == 65536
+    for word in list(range(0, 65536, 257)) + [1, 0xFF00, 0xFFFF]:
+        assert words[word] == bitwise_crc(word.to_bytes(2, 'little'), 0)
+
+
+@pytest.mark.parametrize('length', [0, 1, 2, 15, 16, 17, 64, 255, 1000])
+def test_update_against_bitwise(length):
+    data = bytes(random.Random(length).getrandbits(8) for _ in range(length))
+    assert crc16_update(CRC16_INIT, data) == bitwise_crc(data)
+    assert crc16_update(CRC16_INIT, bytearray(data)) == bitwise_crc(data)
+    assert crc16_update(CRC16_INIT, memoryview(data)) == bitwise_crc(data)
+    assert crc16_update(CRC16_INIT, list(data)) == bitwise_crc(data)
+
+
+def test_unaligned_memoryview():
+    data = bytes(range(100))
+    assert crc16_update(CRC16_INIT, memoryview(data)[1:80]) == bitwise_crc(data[1:80])
+
+
+def test_crc_modbus_and_check():
+    for data in random_data(50):
+        crc = bitwise_crc(data)
+        assert crc_modbus(data) == bytes([crc & 0xFF, crc >> 8])
+        assert check_modbus(data + crc_modbus(data))
+        if data:
+            assert not check_modbus(bytes([data[0] ^ 1]) + data[1:] + crc_modbus(data))
+
+
+def test_incremental():
+    data = random_data(1, max_len=500, seed=3)[0] + b'tail'
+    crc = Crc16Modbus()
+    for i in range(0, len(data), 7):
+        crc.update(data[i:i + 7])
+    assert crc.digest() == crc_modbus(data) == Crc16Modbus(data).digest()
+    crc.reset()
+    assert crc.crc == CRC16_INIT
+
+
+def batch_frames():
+    frames = [data + crc_modbus(data) for data in random_data(40, max_len=40, seed=5)]
+    frames[3] = frames[3][:-1] + bytes([frames[3][-1] ^ 0x10])
+    frames[7] = bytearray(frames[7])
+    return frames
+
+
+def test_batch_check():
+    frames = batch_frames()
+    assert check_modbus_batch(frames) == [bitwise_crc(frame) == 0 for frame in frames]
+    assert check_modbus_batch([]) == []
+
+
+def test_batch_check_without_numpy(monkeypatch):
+    monkeypatch.setattr(crc16, 'np', None)
+    frames = batch_frames()
+    assert check_modbus_batch(frames) == [bitwise_crc(frame) == 0 for frame in frames]
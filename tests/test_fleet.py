@@ -0,0 +1,54 @@
+import pytest
+
+from xarm.tools.simulator import Simulator
+from xarm.wrapper import XArmFleet
+from xarm.x3.code import APIState
+
+HOSTS = ['127.0.0.1', '127.0.0.2']
+
+
+@pytest.fixture
+def sims():
+    sims = []
+    try:
+        for host in HOSTS:
+            sims.append(Simulator(host=host, enabled=True).start())
+    except OSError as e:
+        for sim in sims:
+            sim.stop()
+        pytest.skip('the simulators can not listen: {}'.format(e))
+    yield dict(zip(HOSTS, sims))
+    for sim in sims:
+        sim.stop()
+
+
+def test_fleet(sims):
+    fleet = XArmFleet(HOSTS, reactors=1, max_workers=2)
+    try:
+        assert fleet.connected == {host: True for host in HOSTS}
+        assert len(fleet) == 2 and fleet['127.0.0.2'] is fleet.arms['127.0.0.2']
+        # all the sockets of the arms are on the shared reactor
+        reactors = {arm._arm._reactor for arm in fleet}
+        assert len(reactors) == 1 and reactors.pop().is_alive()
+
+        assert fleet.call('get_state') == {host: (0, 2) for host in HOSTS}
+        assert fleet.broadcast_mode(0) == {host: 0 for host in HOSTS}
+        assert fleet.broadcast_state(4) == {host: 0 for host in HOSTS}
+        assert all(sim.arm.state == 4 for sim in sims.values())
+        positions = fleet.gather_positions()
+        assert all(code == 0 and len(pose) == 6 for code, pose in positions.values())
+        assert fleet.call('no_such_interface') == {host: APIState.API_EXCEPTION for host in HOSTS}
+        assert fleet.call('get_state', ports=['127.0.0.2']) == {'127.0.0.2': (0, 4)}
+    finally:
+        fleet.disconnect()
+    assert not any(fleet.connected.values())
+    assert not any(reactor.is_alive() for reactor in fleet._reactors)
+
+
+def test_fleet_with_an_unreachable_arm(sims):
+    fleet = XArmFleet(['127.0.0.1', '127.0.0.3'], reactors=2)
+    try:
+        assert fleet.connected == {'127.0.0.1': True, '127.0.0.3': False}
+        assert fleet.call('get_state')['127.0.0.3'][0] == APIState.NOT_CONNECTED
+    finally:
+        fleet.disconnect()
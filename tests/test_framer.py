@@ -0,0 +1,97 @@
+import socket
+import struct
+
+from xarm.core.comm.framer import ReportFramer, CmdFramer
+
+
+def report_frame(size, fill):
+    return struct.pack('>I', size) + bytes([fill]) * (size - 4)
+
+
+def cmd_frame(bus_flag, funcode, data):
+    return struct.pack('>HHHB', bus_flag, 2, len(data) + 1, funcode) + data
+
+
+def collect(framer):
+    return [frame.tobytes() for frame in framer.frames()]
+
+
+def test_report_frame_split_across_feeds():
+    framer = ReportFramer(capacity=1024, max_frame_size=256)
+    frame = report_frame(100, 7)
+    got = []
+    for i in range(0, len(frame), 13):
+        framer.feed(frame[i:i + 13])
+        got += collect(framer)
+    assert got == [frame]
+    assert framer.pending == 0 and framer.frame_count == 1
+
+
+def test_report_header_split():
+    framer = ReportFramer(capacity=1024, max_frame_size=256)
+    frame = report_frame(20, 1)
+    framer.feed(frame[:2])
+    assert collect(framer) == []
+    framer.feed(frame[2:])
+    assert collect(framer) == [frame]
+
+
+def test_report_frames_coalesced():
+    framer = ReportFramer(capacity=1024, max_frame_size=256)
+    frames = [report_frame(size, size & 0xFF) for size in (10, 200, 4, 87)]
+    data = b''.join(frames)
+    framer.feed(data + frames[0][:5])
+    assert collect(framer) == frames
+    assert framer.pending == 5
+    framer.feed(frames[0][5:])
+    assert collect(framer) == [frames[0]]
+
+
+def test_compact_keeps_the_partial_frame():
+    framer = ReportFramer(capacity=300, max_frame_size=200)
+    frames = [report_frame(150, i) for i in range(10)]
+    data = b''.join(frames)
+    got = []
+    for i in range(0, len(data), 70):
+        framer.feed(data[i:i + 70])
+        got += collect(framer)
+    assert got == frames
+
+
+def test_invalid_size_resyncs():
+    framer = ReportFramer(capacity=1024, max_frame_size=256)
+    framer.feed(struct.pack('>I', 100000) + b'\x00' * 10)
+    assert collect(framer) == []
+    assert framer.resync_count == 1 and framer.pending == 0
+    frame = report_frame(16, 3)
+    framer.feed(frame)
+    assert collect(framer) == [frame]
+
+
+def test_cmd_frames_split_and_coalesced():
+    framer = CmdFramer(capacity=1024, max_frame_size=256)
+    frames = [cmd_frame(i + 1, 0x0D, bytes([0, i])) for i in range(5)]
+    data = b''.join(frames)
+    got = []
+    for i in range(0, len(data), 7):
+        framer.feed(data[i:i + 7])
+        got += collect(framer)
+    assert got == frames
+    framer.feed(data)
+    assert collect(framer) == frames
+
+
+def test_recv_into_from_socket():
+    framer = ReportFramer(capacity=1024, max_frame_size=256)
+    left, right = socket.socketpair()
+    try:
+        frames = [report_frame(30, 1), report_frame(40, 2)]
+        left.sendall(b''.join(frames))
+        got = []
+        while len(got) < 2:
+            assert framer.recv_into(right) > 0
+            got += collect(framer)
+        assert got == frames
+    finally:
+        left.close()
+        right.close()
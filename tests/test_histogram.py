@@ -0,0 +1,50 @@
+from xarm.core.config.x_config import XCONF
+from xarm.core.utils.histogram import LatencyHistogram, LatencyStats
+from xarm.wrapper import XArmAPI
+
+
+def test_histogram_buckets_and_percentiles():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(50) is None and histogram.stats()['mean'] is None
+    for us in [0.5] + [3] * 90 + [100] * 9:
+        histogram.record(us / 1000000.0)
+    stats = histogram.stats()
+    assert stats['count'] == 100
+    # 0.5us: bucket 0, 3us: [2, 4), 100us: [64, 128)
+    assert stats['buckets'] == {1: 1, 4: 90, 128: 9}
+    assert stats['min'] == 0.5e-6 and stats['max'] == 100e-6
+    assert stats['p50'] == 4e-6 and stats['p90'] == 4e-6
+    # the upper bound is limited by the max
+    assert stats['p99'] == 100e-6
+
+
+def test_histogram_keeps_the_long_latencies_in_the_last_bucket():
+    histogram = LatencyHistogram()
+    histogram.record(100.0)
+    assert histogram.counts[-1] == 1
+    assert histogram.percentile(50) == 100.0
+
+
+def test_stats_by_key():
+    stats = LatencyStats()
+    assert stats.get(1) is None and stats.get() == {}
+    stats.record(1, 0.001)
+    stats.record(1, 0.002)
+    stats.record(2, 0.5)
+    assert stats.get(1)['count'] == 2 and stats.get(2)['max'] == 0.5
+    assert sorted(stats.get()) == [1, 2]
+    stats.reset()
+    assert stats.get() == {}
+
+
+def test_rtt_stats_over_sim():
+    arm = XArmAPI('sim://', enable_report=False)
+    try:
+        for _ in range(5):
+            assert arm.get_state()[0] == 0
+        stats = arm.get_rtt_stats(XCONF.UxbusReg.GET_STATE)
+        assert stats['count'] >= 5 and stats['min'] <= stats['mean'] <= stats['max']
+        assert XCONF.UxbusReg.GET_STATE in arm.get_rtt_stats(reset=True)
+        assert arm.get_rtt_stats(XCONF.UxbusReg.GET_STATE) is None
+    finally:
+        arm.disconnect()
@@ -0,0 +1,63 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from xarm.x3.history import TelemetryHistory
+from xarm.x3.report import RobotStateSnapshot
+
+
+def snapshot(i):
+    return RobotStateSnapshot().copy(angles=[i * 0.1] * 7, position=[float(i)] * 6, joints_torque=[0.0] * 7,
+                                     state=2, cmd_num=i)
+
+
+def history_of(count, capacity=5):
+    history = TelemetryHistory(seconds=capacity, rate=1)
+    for i in range(count):
+        history.append(float(i), snapshot(i))
+    return history
+
+
+def test_latest_before_and_after_wraparound():
+    history = history_of(3)
+    assert len(history) == 3
+    assert history.latest(2)['time'].tolist() == [1, 2]
+    for count in (5, 6, 13, 24):
+        history = history_of(count)
+        assert len(history) == 5
+        assert history.latest(5)['time'].tolist() == list(range(count - 5, count))
+        assert history.latest(10)['cmdnum'].tolist() == list(range(count - 5, count))
+
+
+def test_view_is_kept_for_capacity_reports():
+    for start in (5, 7, 9, 12):
+        history = history_of(start)
+        view = history.latest(5)
+        expected = view['time'].tolist()
+        for i in range(start, start + 5):
+            history.append(float(i), snapshot(i))
+            assert view['time'].tolist() == expected
+        assert history.latest(5)['time'].tolist() == list(range(start, start + 5))
+
+
+def test_window():
+    history = history_of(13)
+    assert history.window(9.5)['time'].tolist() == [10, 11, 12]
+    assert history.window(8, 10)['time'].tolist() == [8, 9, 10]
+    assert history.window(0, 5).size == 0
+
+
+def test_at_interpolates():
+    history = history_of(13)
+    record = history.at(10.25)
+    assert record['time'] == 10.25
+    assert record['pose'].tolist() == pytest.approx([10.25] * 6)
+    assert record['cmdnum'] == 10
+    assert history.at(12)['cmdnum'] == 12
+    assert history.at(7) is None and history.at(12.5) is None
+
+
+def test_clear():
+    history = history_of(8)
+    history.clear()
+    assert len(history) == 0 and history.latest(3).size == 0 and history.at(7) is None
@@ -0,0 +1,72 @@
+import threading
+import time
+
+from xarm.core.comm.reactor import Reactor
+from xarm.wrapper import XArmAPI
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_callbacks_and_timers_run_in_the_reactor_thread():
+    reactor = Reactor()
+    reactor.start()
+    try:
+        calls = []
+        done = threading.Event()
+        reactor.call_soon(lambda: calls.append(('soon', reactor.in_reactor_thread)))
+        reactor.call_later(0.05, lambda: (calls.append(('later', reactor.in_reactor_thread)), done.set()))
+        reactor.call_later(0.01, lambda: calls.append(('first', reactor.in_reactor_thread)))
+        reactor.call_later(0.02, lambda: calls.append(('cancelled', True))).cancel()
+        assert done.wait(2)
+        assert calls == [('soon', True), ('first', True), ('later', True)]
+    finally:
+        reactor.stop()
+        reactor.join(2)
+    assert not reactor.is_alive()
+
+
+def test_reactor_round_trip(sim):
+    arm = XArmAPI('127.0.0.1', io_mode='reactor')
+    try:
+        assert arm.connected
+        reactor = arm._arm._reactor
+        assert reactor is not None and reactor.is_alive()
+        # no receive thread per socket
+        assert not arm._arm._stream.is_alive()
+        assert arm.version
+        assert arm.get_position()[0] == 0
+        code, angles = arm.get_servo_angle()
+        assert code == 0 and len(angles) == 7
+        # the reports are received in the reactor thread
+        count = sim.report_count
+        assert wait_for(lambda: sim.report_count > count + 5)
+        assert wait_for(lambda: arm.state == 2)
+        assert arm.set_mode(0) == 0 and arm.set_state(0) == 0
+    finally:
+        arm.disconnect()
+    reactor.join(2)
+    assert not reactor.is_alive()
+
+
+def test_arms_share_one_reactor(sim):
+    reactor = Reactor()
+    reactor.start()
+    arms = [XArmAPI('127.0.0.1', reactor=reactor, io_mode='reactor') for _ in range(2)]
+    try:
+        for arm in arms:
+            assert arm.connected and arm._arm._reactor is reactor
+            assert arm.get_state() == (0, 2)
+    finally:
+        for arm in arms:
+            arm.disconnect()
+    # the shared reactor is not stopped by the arms
+    assert reactor.is_alive()
+    reactor.stop()
+    reactor.join(2)
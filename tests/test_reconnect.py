@@ -0,0 +1,29 @@
+import time
+
+from xarm.wrapper import XArmAPI
+from xarm.x3.code import APIState
+
+
+def test_thread_mode_reconnect(sim):
+    arm = XArmAPI('127.0.0.1', auto_reconnect=True)
+    try:
+        assert arm.connected
+        assert arm.get_position()[0] == 0
+
+        sim.stop()
+        start = time.monotonic()
+        while arm.connected and time.monotonic() - start < 2:
+            time.sleep(0.01)
+        # lost at once, not after the retries of the receive thread
+        assert not arm.connected
+        assert time.monotonic() - start < 1
+        start = time.monotonic()
+        assert arm.get_position()[0] == APIState.NOT_CONNECTED
+        assert time.monotonic() - start < 0.5
+        assert not arm.wait_connected(timeout=0.2)
+
+        sim.start()
+        assert arm.wait_connected(timeout=10)
+        assert arm.get_position()[0] == 0
+    finally:
+        arm.disconnect()
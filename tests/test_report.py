@@ -0,0 +1,111 @@
+import pytest
+
+from xarm.x3.report import REPORT_REAL, REPORT_NORMAL, REPORT_RICH, REPORT_NORMAL_OLD, REPORT_RICH_OLD, \
+    report_layout, decode_reports
+
+LAYOUTS = [REPORT_REAL, REPORT_NORMAL, REPORT_RICH, REPORT_NORMAL_OLD, REPORT_RICH_OLD]
+LAYOUT_IDS = ['real', 'normal', 'rich', 'normal_old', 'rich_old']
+FIELD_SIZES = {'u1': 1, '>u2': 2, '>u4': 4, '<f4': 4}
+
+
+def field_values(layout, seed=0):
+    # distinct values of every field, the floats are exact in fp32
+    values = {}
+    for i, (name, offset, fmt, count) in enumerate(layout.fields):
+        base = seed * 7 + i
+        if name == 'size':
+            values[name] = layout.size
+        elif fmt.startswith('S'):
+            values[name] = bytes(0x41 + (base + j) % 26 for j in range(int(fmt[1:])))
+        elif fmt == '<f4':
+            values[name] = [(base + j) * 0.5 - 10 for j in range(count)]
+        else:
+            limit = 0xFF if fmt == 'u1' else 0xFFFF
+            values[name] = [(base * 31 + j) % limit for j in range(count)]
+        if count == 1 and isinstance(values[name], list):
+            values[name] = values[name][0]
+    return values
+
+
+@pytest.mark.parametrize('layout', LAYOUTS, ids=LAYOUT_IDS)
+def test_pack_unpack_round_trip(layout):
+    values = field_values(layout)
+    frame = layout.pack(values)
+    assert len(frame) == layout.size
+    assert layout.unpack(frame) == values
+    assert layout.pack(layout.unpack(bytes(frame))) == frame
+
+
+def test_pack_defaults():
+    frame = REPORT_NORMAL.pack({})
+    values = REPORT_NORMAL.unpack(frame)
+    assert values['size'] == REPORT_NORMAL.size
+    assert values['angles'] == [0.0] * 7 and values['error_code'] == 0
+
+
+def test_short_frame_keeps_the_complete_fields():
+    values = field_values(REPORT_NORMAL)
+    frame = REPORT_NORMAL.pack(values)[:100]
+    ret = REPORT_NORMAL.unpack(frame)
+    complete = [name for name, offset, fmt, count in REPORT_NORMAL.fields
+                if offset + FIELD_SIZES[fmt] * count <= 100]
+    assert ret == {name: values[name] for name in complete}
+    assert ret['torque'] == values['torque'] and ret['warn_code'] == values['warn_code']
+    assert 'pose_offset' not in ret and 'gravity_direction' not in ret
+
+
+def test_report_layout_lookup():
+    assert report_layout('rich') is REPORT_RICH
+    assert report_layout('normal', is_old_protocol=True) is REPORT_NORMAL_OLD
+    assert report_layout('real') is REPORT_REAL
+
+
+@pytest.mark.parametrize('layout, report_type, is_old', [
+    (REPORT_REAL, 'real', False), (REPORT_NORMAL, 'normal', False), (REPORT_RICH, 'rich', False),
+    (REPORT_NORMAL_OLD, 'normal', True), (REPORT_RICH_OLD, 'rich', True)], ids=LAYOUT_IDS)
+def test_decode_reports_matches_unpack(layout, report_type, is_old):
+    pytest.importorskip('numpy')
+    frames = [bytes(layout.pack(field_values(layout, seed))) for seed in range(5)]
+    # the trailing incomplete frame is ignored
+    reports = decode_reports(b''.join(frames) + frames[0][:10], report_type, is_old)
+    assert len(reports) == len(frames)
+    for report, frame in zip(reports, frames):
+        for name, value in layout.unpack(frame).items():
+            got = report[name]
+            assert (got.tolist() if hasattr(got, 'tolist') else got) == value, name
+
+
+def test_decode_reports_with_other_frame_sizes():
+    pytest.importorskip('numpy')
+    values = [field_values(REPORT_NORMAL, seed) for seed in range(4)]
+    full = [bytes(REPORT_NORMAL.pack(v)) for v in values]
+    # a shorter frame (older firmware) and a longer frame, with their own size headers
+    short = bytearray(full[1][:133])
+    short[0:4] = (133).to_bytes(4, 'big')
+    long = bytearray(full[2] + b'\xff' * 10)
+    long[0:4] = (len(long)).to_bytes(4, 'big')
+    data = full[0] + bytes(short) + bytes(long) + full[3] + full[0][:20]
+    reports = decode_reports(data, 'normal')
+    assert reports['size'].tolist() == [145, 133, 155, 145]
+    for report, frame in zip(reports, [full[0], bytes(short), bytes(long), full[3]]):
+        for name, value in REPORT_NORMAL.unpack(frame).items():
+            got = report[name]
+            assert (got.tolist() if hasattr(got, 'tolist') else got) == value, name
+    # the fields out of the shorter frame are zeros
+    assert reports[1]['gravity_direction'].tolist() == [0.0] * 3
+
+
+def test_decode_reports_stops_at_an_invalid_size():
+    pytest.importorskip('numpy')
+    frame = bytes(REPORT_NORMAL.pack(field_values(REPORT_NORMAL)))
+    bad = (2).to_bytes(4, 'big') + bytes(200)
+    assert len(decode_reports(frame + bad + frame, 'normal')) == 1
+
+
+def test_decode_reports_of_short_frames_only():
+    pytest.importorskip('numpy')
+    frame = bytearray(REPORT_NORMAL.pack(field_values(REPORT_NORMAL))[:133])
+    frame[0:4] = (133).to_bytes(4, 'big')
+    reports = decode_reports(bytes(frame) * 3, 'normal')
+    assert reports['size'].tolist() == [133] * 3
+    assert reports['angles'].tolist() == [REPORT_NORMAL.unpack(frame)['angles']] * 3
@@ -0,0 +1,61 @@
+import threading
+import time
+
+from xarm.core.comm.rx_ring import RxRing
+
+
+def test_fifo():
+    ring = RxRing(4)
+    for i in range(3):
+        ring.put(i)
+    assert [ring.get() for _ in range(4)] == [0, 1, 2, None]
+    assert ring.empty()
+
+
+def test_drop_oldest_when_full():
+    ring = RxRing(3)
+    for i in range(5):
+        ring.put(i)
+    assert ring.full() and len(ring) == 3
+    assert ring.drop_count == 2 and ring.put_count == 5 and ring.high_water == 3
+    assert [ring.get() for _ in range(3)] == [2, 3, 4]
+    ring.reset_stats()
+    assert ring.stats == {'length': 0, 'maxlen': 3, 'put_count': 0, 'drop_count': 0, 'high_water': 0}
+
+
+def test_get_without_timeout_does_not_wait():
+    ring = RxRing(3)
+    start = time.monotonic()
+    assert ring.get() is None
+    assert ring.get(0) is None
+    assert time.monotonic() - start < 0.05
+
+
+def test_get_timeout_expires():
+    ring = RxRing(3)
+    start = time.monotonic()
+    assert ring.get(timeout=0.1) is None
+    elapsed = time.monotonic() - start
+    assert 0.09 <= elapsed < 1
+
+
+def test_get_wakes_on_put():
+    ring = RxRing(3)
+    timer = threading.Timer(0.05, ring.put, args=('data',))
+    timer.start()
+    start = time.monotonic()
+    try:
+        assert ring.get(timeout=2) == 'data'
+        assert time.monotonic() - start < 1
+    finally:
+        timer.join()
+
+
+def test_get_deadline_ignores_the_wall_clock(monkeypatch):
+    # a wall-clock step backwards must not extend the wait
+    real_time = time.time
+    monkeypatch.setattr(time, 'time', lambda: real_time() - 3600)
+    ring = RxRing(3)
+    start = time.monotonic()
+    assert ring.get(timeout=0.1) is None
+    assert time.monotonic() - start < 1
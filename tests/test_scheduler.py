@@ -0,0 +1,85 @@
+import threading
+import time
+
+import pytest
+
+from xarm.core.comm.scheduler import TimerScheduler, get_scheduler
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = TimerScheduler(name='test-timer')
+    scheduler.start()
+    yield scheduler
+    scheduler.stop()
+    scheduler.join(1)
+
+
+def wait_for(predicate, timeout=2):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.005)
+    return predicate()
+
+
+def test_timers_run_in_deadline_order(scheduler):
+    calls = []
+    for delay in (0.06, 0.02, 0.04, 0.0):
+        scheduler.call_later(delay, lambda delay=delay: calls.append(delay))
+    assert wait_for(lambda: len(calls) == 4)
+    assert calls == [0.0, 0.02, 0.04, 0.06]
+    assert scheduler.pending == 0
+
+
+def test_earlier_timer_wakes_the_thread(scheduler):
+    event = threading.Event()
+    scheduler.call_later(10, lambda: None)
+    start = time.monotonic()
+    scheduler.call_later(0.01, event.set)
+    assert event.wait(1)
+    assert time.monotonic() - start < 0.5
+
+
+def test_cancelled_timer_is_not_called(scheduler):
+    calls = []
+    timer = scheduler.call_later(0.02, lambda: calls.append('cancelled'))
+    scheduler.call_later(0.04, lambda: calls.append('called'))
+    timer.cancel()
+    assert wait_for(lambda: calls)
+    time.sleep(0.05)
+    assert calls == ['called']
+    assert scheduler.pending == 0
+
+
+def test_interval_timer_repeats_until_cancelled(scheduler):
+    calls = []
+    timer = scheduler.call_later(0.01, lambda: calls.append(time.monotonic()), interval=0.01)
+    assert wait_for(lambda: len(calls) >= 5)
+    timer.cancel()
+    time.sleep(0.03)
+    count = len(calls)
+    time.sleep(0.05)
+    assert len(calls) == count
+    assert all(b > a for a, b in zip(calls, calls[1:]))
+
+
+def test_failed_callback_does_not_stop_the_thread(scheduler):
+    event = threading.Event()
+    scheduler.call_later(0, lambda: 1 / 0)
+    scheduler.call_later(0.01, event.set)
+    assert event.wait(1)
+    assert scheduler.is_alive()
+
+
+def test_shared_scheduler_is_restarted():
+    scheduler = get_scheduler()
+    assert get_scheduler() is scheduler and scheduler.is_alive()
+    scheduler.stop()
+    scheduler.join(1)
+    restarted = get_scheduler()
+    assert restarted is not scheduler and restarted.is_alive()
+    event = threading.Event()
+    restarted.call_later(0, event.set)
+    assert event.wait(1)
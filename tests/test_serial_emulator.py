@@ -0,0 +1,86 @@
+import os
+import select
+import time
+
+import pytest
+
+from xarm.core.config.x_config import XCONF
+from xarm.core.utils import crc16
+from xarm.core.wrapper.uxbus_cmd_ser import UX2_HEADER
+
+pytestmark = pytest.mark.skipif(not hasattr(os, 'openpty'), reason='no pseudo-terminal')
+
+FROMID = XCONF.SerialConf.UXBUS_DEF_FROMID
+TOID = XCONF.SerialConf.UXBUS_DEF_TOID
+
+
+@pytest.fixture
+def emulator():
+    from xarm.tools.serial_emulator import SerialEmulator
+    emu = SerialEmulator(enabled=True).start()
+    yield emu
+    emu.stop()
+
+
+def request(reg, payload=b''):
+    frame = UX2_HEADER.pack(FROMID, TOID, len(payload) + 1, reg) + payload
+    return frame + crc16.crc_modbus(frame)
+
+
+def read_frame(fd, size, timeout=2):
+    data = b''
+    deadline = time.monotonic() + timeout
+    while len(data) < size and time.monotonic() < deadline:
+        readable, _, _ = select.select([fd], [], [], 0.05)
+        if readable:
+            data += os.read(fd, size - len(data))
+    return data
+
+
+def open_device(emu):
+    import tty
+    fd = os.open(emu.device, os.O_RDWR | os.O_NOCTTY)
+    tty.setraw(fd)
+    return fd
+
+
+def test_round_trip_through_the_pty(emulator):
+    fd = open_device(emulator)
+    try:
+        os.write(fd, request(XCONF.UxbusReg.GET_STATE))
+        response = read_frame(fd, 7)
+        assert response[:5] == bytes([TOID, FROMID, 2, 0, 2])
+        assert crc16.check_modbus(response)
+        # a request with a bad crc is dropped, the next one is answered
+        bad = bytearray(request(XCONF.UxbusReg.GET_STATE))
+        bad[-1] ^= 0xFF
+        os.write(fd, bytes(bad) + request(XCONF.UxbusReg.SET_STATE, b'\x04'))
+        response = read_frame(fd, 6)
+        assert response[:4] == bytes([TOID, FROMID, 1, 0]) and crc16.check_modbus(response)
+        assert emulator.arm.state == 4
+        stats = emulator.stats
+        assert stats['requests'] == 2 and stats['crc_errors'] >= 1
+    finally:
+        os.close(fd)
+
+
+def test_sdk_commands_through_the_pty(emulator):
+    pytest.importorskip('serial')
+    from xarm.core.comm.serial_port import SerialPort
+    from xarm.core.wrapper.uxbus_cmd_ser import UxbusCmdSer
+    # every response is preceded by random bytes
+    emulator.noise = 1
+    port = SerialPort(emulator.device)
+    try:
+        assert port.connected
+        cmd = UxbusCmdSer(port)
+        for _ in range(5):
+            assert cmd.get_state() == [0, 2]
+        assert cmd.move_joint([0.1] * 7, 1.0, 10, 0)[0] == 0
+        deadline = time.monotonic() + 2
+        while cmd.get_state()[1] != 2 and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert cmd.get_joint_pos()[1:] == pytest.approx([0.1] * 7, abs=1e-5)
+        assert emulator.noise_bytes > 0
+    finally:
+        port.close()
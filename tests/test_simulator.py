@@ -0,0 +1,155 @@
+import socket
+import struct
+import time
+
+import pytest
+
+from xarm.core.comm.transport import LoopPort
+from xarm.core.config.x_config import XCONF
+from xarm.core.wrapper.uxbus_cmd_tcp import UxbusCmdTcp, TX2_HEADER
+from xarm.tools.simulator import SimArm, HOME_POSE
+from xarm.x3.report import REPORT_NORMAL, REPORT_RICH, REPORT_REAL
+
+_R = XCONF.UxbusReg
+
+
+def command(arm):
+    # the commands of the SDK against the simulated controller, without socket
+    return UxbusCmdTcp(LoopPort(arm))
+
+
+def test_response_frames():
+    arm = SimArm(enabled=True)
+    response = arm.handle_frame(TX2_HEADER.pack(0x55, 2, 1, _R.GET_STATE))
+    assert TX2_HEADER.unpack_from(response) == (0x55, 2, 3, _R.GET_STATE)
+    assert response[7:] == b'\x00\x02'
+    # the heartbeat is echoed, the other protocols are ignored
+    heartbeat = bytes([0, 0, 0, 1, 0, 2, 0, 0])
+    assert arm.handle_frame(heartbeat) == heartbeat
+    assert arm.handle_frame(TX2_HEADER.pack(1, 5, 1, _R.GET_STATE)) is None
+    assert arm.request_count == 1
+
+
+def test_state_commands():
+    arm = SimArm()
+    cmd = command(arm)
+    assert cmd.get_state() == [0, 4]
+    assert cmd.motion_en(8, 1) == [0] and arm.mtable == arm.axis_mask
+    assert cmd.set_mode(1) == [0] and arm.mode == 1
+    assert cmd.set_state(0) == [0] and cmd.get_state() == [0, 2]
+    assert cmd.get_version()[0] == 0
+
+
+def test_error_stops_and_drops_the_motions():
+    arm = SimArm(enabled=True)
+    cmd = command(arm)
+    assert cmd.move_joint([1] * 7, 0.1, 10, 0)[0] == 0
+    arm.set_error(22)
+    assert cmd.get_state() == [XCONF.UxbusState.ERR_CODE, 4]
+    assert cmd.get_err_code() == [XCONF.UxbusState.ERR_CODE, 22, 0]
+    assert not arm.cmds
+    # the motions are ignored until the error is cleaned
+    cmd.move_joint([1] * 7, 0.1, 10, 0)
+    assert cmd.get_cmdnum()[1] == 0
+    assert cmd.clean_err()[0] == 0 and cmd.set_state(0) == [0]
+    assert cmd.get_state() == [0, 2]
+
+
+def test_joint_motion_moves_to_the_target():
+    arm = SimArm(axis=6, enabled=True)
+    cmd = command(arm)
+    target = [0.5, -0.2, 0.1, 0, 0, 0.3]
+    assert cmd.move_joint(target + [0], 1.0, 10, 0)[0] == 0
+    assert cmd.sleep_instruction(0.1)[0] == 0
+    assert cmd.get_state() == [0, 1] and cmd.get_cmdnum() == [0, 2]
+    # 0.5 rad at 1 rad/s
+    arm.step(0.25)
+    assert arm.angles[0] == pytest.approx(0.25)
+    arm.step(0.3)
+    assert arm.angles[:6] == pytest.approx(target)
+    assert cmd.get_state() == [0, 1] and cmd.get_cmdnum() == [0, 1]
+    arm.step(0.1)
+    assert cmd.get_state() == [0, 2] and cmd.get_cmdnum() == [0, 0]
+    # the pose follows the angles
+    assert cmd.get_tcp_pose()[1:] == pytest.approx(arm.forward(arm.angles), abs=1e-4)
+
+
+def test_line_motion_keeps_the_angles_consistent():
+    arm = SimArm(enabled=True)
+    cmd = command(arm)
+    target = list(HOME_POSE)
+    target[0] += 30
+    assert cmd.move_line(target, 100, 1000, 0)[0] == 0
+    arm.step(1)
+    assert arm.position == pytest.approx(target)
+    assert arm.angles[0] == pytest.approx(0.3)
+    assert cmd.get_joint_pos()[1] == pytest.approx(0.3, abs=1e-5)
+
+
+def test_registers():
+    arm = SimArm(enabled=True)
+    cmd = command(arm)
+    assert cmd.gripper_addr_w16(0x0100, 1)[0] == 0
+    assert cmd.gripper_addr_r16(0x0100)[:2] == [0, 1]
+
+
+@pytest.mark.parametrize('layout, report_type', [(REPORT_NORMAL, 'normal'), (REPORT_RICH, 'rich'),
+                                                 (REPORT_REAL, 'real')])
+def test_report_frames(layout, report_type):
+    arm = SimArm(axis=6, enabled=True)
+    arm.mode = 1
+    arm.set_warn(11)
+    values = layout.unpack(arm.report_frame(report_type))
+    assert values['size'] == layout.size
+    assert values['state_mode'] == (1 << 4) | 2
+    assert values['angles'] == [0.0] * 7
+    assert values['pose'] == pytest.approx(HOME_POSE)
+    if 'warn_code' in values:
+        assert values['warn_code'] == 11
+    if 'arm_axis' in values:
+        assert values['arm_axis'] == 6
+
+
+def recv_exactly(conn, size):
+    data = b''
+    while len(data) < size:
+        chunk = conn.recv(size - len(data))
+        assert chunk
+        data += chunk
+    return data
+
+
+def test_tcp_simulator(sim):
+    conn = socket.create_connection((sim.host, XCONF.SocketConf.TCP_CONTROL_PORT), timeout=5)
+    report = socket.create_connection((sim.host, XCONF.SocketConf.TCP_REPORT_NORM_PORT), timeout=5)
+    try:
+        # two requests in one segment
+        conn.sendall(TX2_HEADER.pack(1, 2, 1, _R.GET_STATE) + TX2_HEADER.pack(2, 2, 1, _R.GET_CMDNUM))
+        first, second = recv_exactly(conn, 9), recv_exactly(conn, 10)
+        assert TX2_HEADER.unpack_from(first)[::3] == (1, _R.GET_STATE) and first[8] == 2
+        assert TX2_HEADER.unpack_from(second)[::3] == (2, _R.GET_CMDNUM)
+        frame = recv_exactly(report, REPORT_NORMAL.size)
+        assert REPORT_NORMAL.unpack(frame)['size'] == REPORT_NORMAL.size
+        stats = sim.stats
+        assert stats['requests'] == 2 and stats['reports'] >= 1 and stats['connections'] == 2
+    finally:
+        conn.close()
+        report.close()
+
+
+def test_tcp_simulator_runs_the_motions(sim):
+    conn = socket.create_connection((sim.host, XCONF.SocketConf.TCP_CONTROL_PORT), timeout=5)
+    try:
+        # 0.2 rad at 2 rad/s by the motion loop of the simulator
+        payload = struct.pack('<10f', *([0.2] * 7 + [2.0, 10, 0]))
+        conn.sendall(TX2_HEADER.pack(1, 2, len(payload) + 1, _R.MOVE_JOINT) + payload)
+        assert recv_exactly(conn, 8)[7] == 0
+        deadline = time.monotonic() + 2
+        while sim.arm.state == 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        conn.sendall(TX2_HEADER.pack(2, 2, 1, _R.GET_JOINT_POS))
+        response = recv_exactly(conn, 8 + 28)
+        assert struct.unpack('<7f', response[8:]) == pytest.approx([0.2] * 7)
+        assert sim.arm.state == 2
+    finally:
+        conn.close()
@@ -0,0 +1,48 @@
+import threading
+
+from xarm.x3 import XArm
+from xarm.x3.report import REPORT_NORMAL
+
+REPORTS = 20000
+
+
+def test_api_writes_do_not_roll_back_the_reports():
+    arm = XArm(do_not_open=True)
+    frames = [REPORT_NORMAL.pack({'state_mode': 2, 'cmd_num': i, 'angles': [float(i)] * 7}) for i in range(REPORTS)]
+    done = threading.Event()
+    rolled_back = []
+
+    def report_thread():
+        for frame in frames:
+            arm._handle_report_normal(frame)
+        done.set()
+
+    def api_thread():
+        while not done.is_set():
+            arm._state = 2
+            arm._update_snapshot(error_code=0, warn_code=0)
+
+    def reader_thread():
+        last = 0
+        while not done.is_set():
+            snapshot = arm.report_snapshot
+            if snapshot.cmd_num < last or snapshot.angles[0] != snapshot.cmd_num:
+                rolled_back.append((last, snapshot.cmd_num, snapshot.angles[0]))
+            last = max(last, snapshot.cmd_num)
+
+    threads = [threading.Thread(target=target) for target in (report_thread, api_thread, reader_thread)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+    assert not rolled_back
+    assert arm._cmd_num == REPORTS - 1 and arm._angles[0] == REPORTS - 1
+
+
+def test_multiple_fields_in_one_snapshot():
+    arm = XArm(do_not_open=True)
+    last = arm.report_snapshot
+    arm._update_snapshot(error_code=21, warn_code=3)
+    assert arm.report_snapshot is not last
+    assert (arm._error_code, arm._warn_code) == (21, 3)
+    assert (last.error_code, last.warn_code) == (0, 0)
@@ -0,0 +1,137 @@
+import socket
+import threading
+import time
+
+import pytest
+
+from xarm.core.comm.scheduler import get_scheduler
+from xarm.core.comm.socket_port import SocketPort
+from xarm.x3.utils import CommandBatch
+
+
+@pytest.fixture
+def server():
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(1)
+    yield listener
+    listener.close()
+
+
+def connect(listener, **kwargs):
+    port = SocketPort('127.0.0.1', listener.getsockname()[1], **kwargs)
+    conn, _ = listener.accept()
+    assert port.connected
+    return port, conn
+
+
+def recv_exactly(conn, size, timeout=5):
+    conn.settimeout(timeout)
+    data = b''
+    while len(data) < size:
+        chunk = conn.recv(size - len(data))
+        assert chunk
+        data += chunk
+    return data
+
+
+def test_coalesced_frames_are_flushed_by_the_timer(server):
+    port, conn = connect(server, coalesce_window=0.01)
+    try:
+        frames = [bytes([i]) * 10 for i in range(5)]
+        for frame in frames:
+            assert port.write(frame) == 0
+        assert recv_exactly(conn, 50) == b''.join(frames)
+        assert port.tx_pending == 0 and port.tx_frame_count == 5
+        assert port.tx_send_count < 5
+    finally:
+        port.close()
+        conn.close()
+
+
+def test_stalled_peer_does_not_block_the_timer_thread(server):
+    port, conn = connect(server, coalesce_window=0.005)
+    port.com.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+    try:
+        # fill the socket buffers, the peer does not read
+        frame = b'x' * 1000
+        deadline = time.monotonic() + 10
+        written = 0
+        while port.tx_pending < 10 and time.monotonic() < deadline:
+            assert port.write(frame) == 0
+            written += 1
+            time.sleep(0.002)
+        assert port.tx_pending >= 10
+
+        # the other timers still run
+        fired = threading.Event()
+        get_scheduler().call_later(0.01, fired.set)
+        assert fired.wait(0.5)
+
+        # once the peer reads, the frames left are sent in order
+        assert recv_exactly(conn, written * len(frame)) == frame * written
+        assert port.connected
+    finally:
+        port.close()
+        conn.close()
+
+
+class FakeCmd(object):
+    def __init__(self):
+        self.pipeline_depth = 1
+
+    def set_pipeline_depth(self, depth):
+        self.pipeline_depth = depth
+
+    def wait_pipeline(self):
+        return 0
+
+
+class FakeStream(object):
+    def begin_batch(self):
+        raise OSError('closed')
+
+
+class FakeArm(object):
+    connected = True
+    _stream_type = 'socket'
+
+    def __init__(self):
+        self.arm_cmd = FakeCmd()
+        self._stream = FakeStream()
+
+
+def test_batch_keeps_the_pipeline_depth_if_the_port_refuses():
+    arm = FakeArm()
+    with pytest.raises(OSError):
+        with CommandBatch(arm):
+            pass
+    assert arm.arm_cmd.pipeline_depth == 1
+
+
+def test_profile_options_are_set(server):
+    port, conn = connect(server, profile='lowlatency')
+    try:
+        assert port.socket_options['nodelay'] is True
+        assert port.com.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY)
+        assert port.com.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF) >= 65536
+        # the options the platform refuses (busy_poll without the capability) are skipped
+        assert set(port.socket_options) <= {'nodelay', 'quickack', 'busy_poll', 'rcvbuf', 'sndbuf'}
+        assert port._quickack == ('quickack' in port.socket_options)
+        assert port.write(b'ping') == 0
+        assert recv_exactly(conn, 4) == b'ping'
+    finally:
+        port.close()
+        conn.close()
+
+
+def test_default_and_unknown_profiles_set_no_option(server):
+    for profile in ('default', 'unknown'):
+        port, conn = connect(server, profile=profile)
+        try:
+            assert port.socket_options == {} and not port._quickack
+            assert not port.com.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY)
+        finally:
+            port.close()
+            conn.close()
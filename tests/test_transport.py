@@ -0,0 +1,29 @@
+from xarm.core.comm.transport import LoopTransport, SimTransport, parse_port, create_transport
+from xarm.wrapper import XArmAPI
+
+
+def test_parse_port():
+    assert parse_port('192.168.1.100') == ('tcp', '192.168.1.100')
+    assert parse_port('localhost') == ('tcp', 'localhost')
+    assert parse_port('/dev/ttyUSB0') == ('serial', '/dev/ttyUSB0')
+    assert parse_port('SIM://') == ('sim', '')
+    assert parse_port('loop://replay') == ('loop', 'replay')
+
+
+def test_create_transport():
+    assert isinstance(create_transport('sim://'), SimTransport)
+    assert isinstance(create_transport('loop://name'), LoopTransport)
+
+
+def test_batch_over_sim():
+    arm = XArmAPI('sim://')
+    try:
+        assert arm.connected
+        with arm._arm.batch() as batch:
+            assert arm.set_mode(1) == 0
+            assert arm.set_state(4) == 0
+        assert batch.code == 0
+        assert arm._arm.arm_cmd.pipeline_depth == 1
+        assert arm.get_state() == (0, 4)
+    finally:
+        arm.disconnect()
@@ -0,0 +1,91 @@
+import queue
+
+from xarm.core.comm.uxbus_cmd_protocol import Ux2HexProtocol
+from xarm.core.utils.crc16 import crc_modbus
+
+MASTER_ID = 0xAA
+SLAVE_ID = 0x55
+
+
+def ux2_frame(data, toid=MASTER_ID, fromid=SLAVE_ID):
+    frame = bytes([toid, fromid, len(data)]) + data
+    return frame + crc_modbus(frame)
+
+
+def protocol():
+    que = queue.Queue()
+    return que, Ux2HexProtocol(que, fromid=SLAVE_ID, toid=MASTER_ID)
+
+
+def received(que):
+    frames = []
+    while not que.empty():
+        frames.append(que.get())
+    return frames
+
+
+def test_frames_between_noise():
+    que, parser = protocol()
+    frames = [ux2_frame(bytes([0x0D, 0, i])) for i in range(3)]
+    noise = [b'\x00\x13', bytes([MASTER_ID]), bytes([MASTER_ID, 0x01, 0x02])]
+    parser.put(noise[0] + frames[0] + noise[1] + frames[1] + noise[2] + frames[2])
+    assert received(que) == frames
+    assert parser.frame_count == 3
+    assert not parser.rxbuf
+
+
+def test_frame_split_byte_by_byte():
+    que, parser = protocol()
+    frame = ux2_frame(bytes(range(20)))
+    for i in range(len(frame)):
+        parser.put(frame[i:i + 1])
+    assert received(que) == [frame]
+
+
+def test_crc_error_is_counted_and_skipped():
+    que, parser = protocol()
+    bad = bytearray(ux2_frame(b'\x0D\x00\x02'))
+    bad[-1] ^= 0xFF
+    good = ux2_frame(b'\x0D\x00\x03')
+    parser.put(bytes(bad) + good)
+    assert received(que) == [good]
+    assert parser.crc_error_count == 1
+
+
+def test_other_addresses_are_ignored():
+    que, parser = protocol()
+    other_to = ux2_frame(b'\x01', toid=0x11)
+    other_from = ux2_frame(b'\x02', fromid=0x11)
+    good = ux2_frame(b'\x03')
+    parser.put(other_to + other_from + good)
+    assert received(que) == [good]
+
+
+def test_broadcast_address():
+    que = queue.Queue()
+    parser = Ux2HexProtocol(que, fromid=0xFF, toid=0xFF)
+    frames = [ux2_frame(b'\x01', toid=0x11), ux2_frame(b'\x02', fromid=0x22)]
+    parser.put(b''.join(frames))
+    assert received(que) == frames
+
+
+def test_too_long_length_resyncs():
+    que, parser = protocol()
+    good = ux2_frame(b'\x04')
+    parser.put(bytes([MASTER_ID, SLAVE_ID, 200]) + good)
+    assert received(que) == [good]
+
+
+def test_rx_callback_and_partial_tail():
+    que, parser = protocol()
+    got = []
+    parser.rx_callback = lambda frame: got.append(bytes(frame))
+    frames = [ux2_frame(b'\x05\x06'), ux2_frame(b'\x07')]
+    data = b''.join(frames)
+    parser.put(data + frames[0][:4])
+    assert got == frames and que.empty()
+    assert bytes(parser.rxbuf) == frames[0][:4]
+    parser.put(frames[0][4:])
+    assert got == frames + [frames[0]]
+    parser.flush()
+    assert not parser.rxbuf
@@ -0,0 +1,56 @@
+from xarm.core.config.x_config import XCONF
+from xarm.core.utils import crc16
+from xarm.core.wrapper.uxbus_cmd_ser import UxbusCmdSer, UX2_HEADER, UX2_CRC
+
+
+class FakeSerialPort(object):
+    """
+    Answers every request with reply(request frame)
+    """
+    def __init__(self, reply):
+        self.reply = reply
+        self.frames = []
+        self.rx_callback = None
+
+    def flush(self, fromid=-1, toid=-1):
+        pass
+
+    def set_rx_callback(self, callback):
+        self.rx_callback = callback
+
+    def write(self, data):
+        frame = bytes(data)
+        self.frames.append(frame)
+        response = self.reply(frame)
+        if response is not None:
+            self.rx_callback(response)
+        return 0
+
+
+def ux2_response(request, payload):
+    fromid, toid, _, reg = UX2_HEADER.unpack_from(request)
+    frame = UX2_HEADER.pack(toid, fromid, len(payload) + 1, reg) + payload
+    return frame + crc16.crc_modbus(frame)
+
+
+def test_request_frame_and_crc():
+    port = FakeSerialPort(lambda request: ux2_response(request, b'\x00'))
+    cmd = UxbusCmdSer(port)
+    assert cmd.set_state(4) == [0]
+    frame = port.frames[0]
+    assert UX2_HEADER.unpack_from(frame) == (XCONF.SerialConf.UXBUS_DEF_FROMID, XCONF.SerialConf.UXBUS_DEF_TOID,
+                                              2, XCONF.UxbusReg.SET_STATE)
+    assert frame[4:5] == b'\x04'
+    assert crc16.check_modbus(frame)
+
+
+def test_tx_buffer_grows_for_large_requests():
+    port = FakeSerialPort(lambda request: ux2_response(request, b'\x00'))
+    cmd = UxbusCmdSer(port)
+    payload = bytes(i % 251 for i in range(200))
+    cmd.send_xbus(XCONF.UxbusReg.SET_STATE, payload, 200)
+    assert port.frames[-1][4:-2] == payload and crc16.check_modbus(port.frames[-1])
+    buf = cmd._tx_buf
+    assert cmd.set_state(0) == [0]
+    assert cmd._tx_buf is buf
+    assert len(port.frames[-1]) == UX2_HEADER.size + 1 + UX2_CRC.size and crc16.check_modbus(port.frames[-1])
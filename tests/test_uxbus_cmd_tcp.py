@@ -0,0 +1,268 @@
+import struct
+import threading
+import time
+
+from xarm.core.config.x_config import XCONF
+from xarm.core.wrapper.uxbus_cmd_tcp import UxbusCmdTcp, TX2_HEADER, TX2_BUS_FLAG_MAX, TX2_BUS_FLAG_MIN
+from xarm.core.wrapper.uxbus_reg import REGISTERS
+
+GET_STATE = XCONF.UxbusReg.GET_STATE
+
+
+def response(bus_flag, funcode, payload=b'', state=0, length=None):
+    length = len(payload) + 2 if length is None else length
+    return TX2_HEADER.pack(bus_flag, 2, length, funcode) + bytes([state]) + payload
+
+
+class FakePort(object):
+    """
+    The port of UxbusCmdTcp: every written request is passed to reply(bus_flag, funcode),
+    which returns the response frames to receive
+    """
+    def __init__(self, reply):
+        self.reply = reply
+        self.requests = []
+        self.connected = True
+        self.rx_callback = None
+
+    def set_rx_callback(self, callback):
+        self.rx_callback = callback
+
+    def flush_tx(self):
+        return 0
+
+    def write(self, data):
+        bus_flag, _, _, funcode = TX2_HEADER.unpack_from(data)
+        self.requests.append((bus_flag, funcode))
+        for frame in self.reply(bus_flag, funcode):
+            self.rx_callback(frame)
+        return 0
+
+
+def state_reply(bus_flag, funcode):
+    return [response(bus_flag, funcode, b'\x02')]
+
+
+def test_response_is_routed_by_bus_flag():
+    port = FakePort(state_reply)
+    cmd = UxbusCmdTcp(port)
+    assert cmd.get_state() == [0, 2]
+    assert cmd.stale_count == 0
+    assert cmd.rtt_stats.get(GET_STATE)['count'] == 1
+
+
+def test_bus_flag_wraps_at_max():
+    port = FakePort(state_reply)
+    cmd = UxbusCmdTcp(port)
+    cmd.bus_flag = TX2_BUS_FLAG_MAX - 1
+    for _ in range(4):
+        assert cmd.get_state() == [0, 2]
+    assert [bus_flag for bus_flag, _ in port.requests] == [TX2_BUS_FLAG_MAX - 1, TX2_BUS_FLAG_MAX,
+                                                           TX2_BUS_FLAG_MIN, TX2_BUS_FLAG_MIN + 1]
+    assert cmd.stale_count == 0
+
+
+def test_late_response_is_counted_stale():
+    late = []
+
+    def reply(bus_flag, funcode):
+        if not late:
+            # no response in time, it is received with the next response
+            late.append(response(bus_flag, funcode, b'\x01'))
+            return []
+        return [late.pop(), response(bus_flag, funcode, b'\x02')]
+
+    cmd = UxbusCmdTcp(FakePort(reply))
+    assert cmd.send_xbus(GET_STATE, b'', 0, 100) == 0
+    code, _ = cmd.send_pend_raw(GET_STATE, 1, 100)
+    assert code == XCONF.UxbusState.ERR_TOUT
+    assert cmd.get_state() == [0, 2]
+    assert cmd.stale_count == 1
+
+
+def test_unknown_bus_flag_and_funcode_are_stale():
+    def reply(bus_flag, funcode):
+        return [response(bus_flag + 100, funcode, b'\x01'), response(bus_flag, funcode + 1, b'\x01'),
+                response(bus_flag, funcode, b'\x02')]
+
+    cmd = UxbusCmdTcp(FakePort(reply))
+    assert cmd.get_state() == [0, 2]
+    assert cmd.stale_count == 2
+
+
+def test_non_command_frames_are_ignored():
+    def reply(bus_flag, funcode):
+        heartbeat = bytes([0, 0, 0, 1, 0, 2, 0, 0])
+        return [heartbeat, b'\x00', response(bus_flag, funcode, b'\x02')]
+
+    cmd = UxbusCmdTcp(FakePort(reply))
+    assert cmd.get_state() == [0, 2]
+    assert cmd.stale_count == 0
+
+
+def test_error_and_warn_flags():
+    for state, code in ((0x40, XCONF.UxbusState.ERR_CODE), (0x20, XCONF.UxbusState.WAR_CODE)):
+        cmd = UxbusCmdTcp(FakePort(lambda bus_flag, funcode: [response(bus_flag, funcode, b'\x02', state=state)]))
+        assert cmd.get_state() == [code, 2]
+        assert cmd.has_err_warn
+
+
+def test_response_from_another_thread_wakes_the_waiter():
+    pending = []
+
+    def reply(bus_flag, funcode):
+        pending.append(response(bus_flag, funcode, b'\x02'))
+        return []
+
+    port = FakePort(reply)
+    cmd = UxbusCmdTcp(port)
+    timer = threading.Timer(0.05, lambda: port.rx_callback(pending.pop()))
+    timer.start()
+    start = time.monotonic()
+    try:
+        assert cmd.get_state() == [0, 2]
+        assert time.monotonic() - start < 0.5
+    finally:
+        timer.join()
+
+
+class BatchPort(FakePort):
+    """
+    The responses are received once the gathered requests are flushed
+    """
+    def __init__(self, reply):
+        super(BatchPort, self).__init__(reply)
+        self.received = []
+
+    def write(self, data):
+        bus_flag, _, _, funcode = TX2_HEADER.unpack_from(data)
+        self.requests.append((bus_flag, funcode))
+        self.received += self.reply(bus_flag, funcode)
+        return 0
+
+    def flush_tx(self):
+        received, self.received = self.received, []
+        for frame in received:
+            self.rx_callback(frame)
+        return 0
+
+
+def set_reply(bus_flag, funcode):
+    return [response(bus_flag, funcode)]
+
+
+def test_pipelined_set_commands_return_once_sent():
+    port = BatchPort(set_reply)
+    cmd = UxbusCmdTcp(port)
+    cmd.set_pipeline_depth(3)
+    for _ in range(10):
+        assert cmd.set_state(0) == [0]
+    # at most depth requests are outstanding
+    assert len(cmd._pends) <= 3
+    assert cmd.wait_pipeline() == 0
+    assert not cmd._pends
+    assert len(port.requests) == 10 and cmd.stale_count == 0
+
+
+def test_pipeline_returns_the_first_failed_code():
+    def reply(bus_flag, funcode):
+        if len(port.requests) == 2:
+            return [response(bus_flag, funcode, length=5)]
+        return [response(bus_flag, funcode)]
+
+    port = BatchPort(reply)
+    cmd = UxbusCmdTcp(port)
+    cmd.set_pipeline_depth(4)
+    for _ in range(4):
+        assert cmd.set_state(0) == [0]
+    assert cmd.wait_pipeline() == XCONF.UxbusState.ERR_LENG
+    # the errors are returned once
+    assert cmd.wait_pipeline() == 0
+
+
+def test_pipeline_error_and_warn_are_not_failures():
+    port = BatchPort(lambda bus_flag, funcode: [response(bus_flag, funcode, state=0x40)])
+    cmd = UxbusCmdTcp(port)
+    cmd.set_pipeline_depth(2)
+    assert cmd.set_state(0) == [0]
+    assert cmd.wait_pipeline() == 0
+    assert cmd.has_err_warn
+
+
+def test_pipeline_request_without_response_times_out():
+    port = BatchPort(lambda bus_flag, funcode: [])
+    cmd = UxbusCmdTcp(port)
+    cmd.set_pipeline_depth(2)
+    assert cmd.send_xbus(GET_STATE, b'', 0, 100) == 0
+    assert cmd.set_pend(GET_STATE, 100) == [0]
+    start = time.monotonic()
+    assert cmd.wait_pipeline(timeout=2) == XCONF.UxbusState.ERR_TOUT
+    assert time.monotonic() - start < 1
+    assert not cmd._pends
+
+
+def test_pend_deadline_follows_the_register_timeout():
+    port = BatchPort(lambda bus_flag, funcode: [])
+    cmd = UxbusCmdTcp(port)
+    cmd.set_pipeline_depth(2)
+    spec = REGISTERS[XCONF.UxbusReg.SET_STATE]
+    start = time.monotonic()
+    assert cmd.set_state(0) == [0]
+    pend = list(cmd._pends.values())[0]
+    assert abs(pend.deadline - start - spec.timeout / 1000.0) < 0.1
+
+
+class FramePort(FakePort):
+    """
+    Keeps a copy of every written frame
+    """
+    def __init__(self, reply):
+        super(FramePort, self).__init__(reply)
+        self.frames = []
+
+    def write(self, data):
+        self.frames.append(bytes(data))
+        return super(FramePort, self).write(data)
+
+
+def test_request_frame_header_and_payload():
+    port = FramePort(set_reply)
+    cmd = UxbusCmdTcp(port)
+    payload = bytes(range(10))
+    cmd.bus_flag = 0x1234
+    assert cmd.send_xbus(XCONF.UxbusReg.SET_STATE, payload, 10) == 0
+    assert port.frames[0] == TX2_HEADER.pack(0x1234, 2, 11, XCONF.UxbusReg.SET_STATE) + payload
+    # only num bytes of the payload are sent, a list payload is accepted
+    cmd.bus_flag = 0x1235
+    assert cmd.send_xbus(XCONF.UxbusReg.SET_STATE, list(payload), 4) == 0
+    assert port.frames[1] == TX2_HEADER.pack(0x1235, 2, 5, XCONF.UxbusReg.SET_STATE) + payload[:4]
+
+
+def test_tx_buffer_is_reused_and_grows():
+    port = FramePort(set_reply)
+    cmd = UxbusCmdTcp(port)
+    buf = cmd._tx_buf
+    assert cmd.set_state(0) == [0] and cmd.set_state(0) == [0]
+    assert cmd._tx_buf is buf
+    # a request larger than the buffer
+    payload = bytes(i % 251 for i in range(300))
+    cmd.send_xbus(XCONF.UxbusReg.SET_STATE, payload, 300)
+    assert len(cmd._tx_buf) >= 300 + TX2_HEADER.size
+    assert port.frames[-1][TX2_HEADER.size:] == payload
+    assert TX2_HEADER.unpack_from(port.frames[-1])[2] == 301
+    # the next small request does not keep the bytes of the large one
+    buf = cmd._tx_buf
+    assert cmd.set_state(4) == [0]
+    assert cmd._tx_buf is buf
+    assert port.frames[-1] == TX2_HEADER.pack(cmd.bus_flag - 1, 2, 2, XCONF.UxbusReg.SET_STATE) + b'\x04'
+
+
+def test_move_circle_frame():
+    port = FramePort(set_reply)
+    cmd = UxbusCmdTcp(port)
+    pose1, pose2 = [1, 2, 3, 4, 5, 6], [-1, -2, -3, -4, -5, -6]
+    assert cmd.move_circle(pose1, pose2, 100, 1000, 0, 50)[0] == 0
+    frame = port.frames[-1]
+    values = [float(v) for v in pose1 + pose2] + [100.0, 1000.0, 0.0, 50.0]
+    assert frame[TX2_HEADER.size:] == struct.pack('<16f', *values)
+    assert TX2_HEADER.unpack_from(frame)[2:] == (16 * 4 + 1, XCONF.UxbusReg.MOVE_CIRCLE)
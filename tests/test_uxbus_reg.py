@@ -0,0 +1,145 @@
+import struct
+
+import pytest
+
+from xarm.core.config.x_config import XCONF
+from xarm.core.wrapper.uxbus_cmd_tcp import UxbusCmdTcp, TX2_HEADER
+from xarm.core.wrapper.uxbus_reg import REGISTERS
+
+R = XCONF.UxbusReg
+POSE = [300.5, -1.25, 200, 3.14, -0.5, 0.001]
+JOINTS = [0.1, -0.2, 0.3, -0.4, 0.5, -0.6, 0.7]
+
+
+# the byte-by-byte helpers of the previous convert module, the reference of the requests and responses
+def old_fp32s(data, n):
+    return b''.join(bytes(struct.pack('f', data[i])) for i in range(n))
+
+
+def old_u16(data):
+    return bytes([data // 256 % 256]) + bytes([data % 256])
+
+
+def old_bytes_to_fp32s(data, n):
+    return [struct.unpack('f', bytes(data[i * 4:i * 4 + 4]))[0] for i in range(n)]
+
+
+def old_bytes_to_long_big(data):
+    return struct.unpack('>l', bytes(data[0:4]))[0]
+
+
+def old_addr_w(sid, addr, value):
+    return bytes([sid]) + old_u16(addr) + bytes(struct.pack('f', value))
+
+
+def old_addr_r(sid, addr):
+    return bytes([sid]) + old_u16(addr)
+
+
+class RecordPort(object):
+    def __init__(self):
+        self.response = b''
+        self.requests = []
+        self.connected = True
+        self.rx_callback = None
+
+    def set_rx_callback(self, callback):
+        self.rx_callback = callback
+
+    def flush_tx(self):
+        return 0
+
+    def write(self, data):
+        bus_flag, _, length, funcode = TX2_HEADER.unpack_from(data)
+        self.requests.append((funcode, bytes(data[TX2_HEADER.size:TX2_HEADER.size + length - 1])))
+        self.rx_callback(TX2_HEADER.pack(bus_flag, 2, len(self.response) + 2, funcode) + b'\x00' + self.response)
+        return 0
+
+
+def request_of(method, *args):
+    port = RecordPort()
+    getattr(UxbusCmdTcp(port), method)(*args)
+    assert len(port.requests) == 1
+    return port.requests[0]
+
+
+REQUESTS = [
+    ('shutdown_system', (1,), R.SHUTDOWN_SYSTEM, bytes([1])),
+    ('motion_en', (8, True), R.MOTION_EN, bytes([8, 1])),
+    ('set_state', (4,), R.SET_STATE, bytes([4])),
+    ('set_brake', (2, False), R.SET_BRAKE, bytes([2, 0])),
+    ('set_mode', (1,), R.SET_MODE, bytes([1])),
+    ('clean_err', (), R.CLEAN_ERR, b''),
+    ('get_state', (), R.GET_STATE, b''),
+    ('get_version', (), R.GET_VERSION, b''),
+    ('move_line', (POSE, 100, 2000, 0), R.MOVE_LINE, old_fp32s(POSE + [100, 2000, 0], 9)),
+    ('move_lineb', (POSE, 100, 2000, 0, 10), R.MOVE_LINEB, old_fp32s(POSE + [100, 2000, 0, 10], 10)),
+    ('move_joint', (JOINTS, 1, 10, 0), R.MOVE_JOINT, old_fp32s(JOINTS + [1, 10, 0], 10)),
+    ('move_gohome', (1, 10, 0), R.MOVE_HOME, old_fp32s([1, 10, 0], 3)),
+    ('move_servoj', (JOINTS, 1, 10, 0), R.MOVE_SERVOJ, old_fp32s(JOINTS + [1, 10, 0], 10)),
+    ('sleep_instruction', (1.5,), R.SLEEP_INSTT, old_fp32s([1.5], 1)),
+    ('move_circle', (POSE, POSE[::-1], 100, 2000, 0, 50), R.MOVE_CIRCLE,
+     old_fp32s(POSE + POSE[::-1] + [100, 2000, 0, 50], 16)),
+    ('set_tcp_jerk', (1000,), R.SET_TCP_JERK, old_fp32s([1000], 1)),
+    ('set_tcp_offset', (POSE,), R.SET_TCP_OFFSET, old_fp32s(POSE, 6)),
+    ('set_tcp_load', (1.5, [1, 2, 3]), R.SET_LOAD_PARAM, old_fp32s([1.5, 1, 2, 3], 4)),
+    ('set_collis_sens', (3,), R.SET_COLLIS_SENS, bytes([3])),
+    ('set_gravity_dir', ([0, 0, -1],), R.SET_GRAVITY_DIR, old_fp32s([0, 0, -1], 3)),
+    ('get_ik', (POSE,), R.GET_IK, old_fp32s(POSE, 6)),
+    ('get_fk', (JOINTS,), R.GET_FK, old_fp32s(JOINTS, 7)),
+    ('is_joint_limit', (JOINTS,), R.IS_JOINT_LIMIT, old_fp32s(JOINTS, 7)),
+    ('is_tcp_limit', (POSE,), R.IS_TCP_LIMIT, old_fp32s(POSE, 6)),
+    ('servo_addr_w16', (3, 0x0100, 1.0), R.SERVO_W16B, old_addr_w(3, 0x0100, 1.0)),
+    ('servo_addr_r32', (3, 0x0102), R.SERVO_R32B, old_addr_r(3, 0x0102)),
+    ('gripper_addr_w32', (0x0700, 400), R.GRIPP_W32B, old_addr_w(XCONF.GRIPPER_ID, 0x0700, 400)),
+    ('gpio_addr_r16', (0x0A14,), R.GRIPP_R16B, old_addr_r(XCONF.GPIO_ID, 0x0A14)),
+    ('servo_set_zero', (8,), R.SERVO_ZERO, bytes([8])),
+]
+
+
+@pytest.mark.parametrize('method, args, reg, expected', REQUESTS, ids=[case[0] for case in REQUESTS])
+def test_request_bytes(method, args, reg, expected):
+    assert request_of(method, *args) == (reg, expected)
+
+
+def response_of(method, payload, *args):
+    port = RecordPort()
+    port.response = payload
+    return getattr(UxbusCmdTcp(port), method)(*args)
+
+
+def test_decode_fp32_responses():
+    payload = old_fp32s(JOINTS, 7)
+    assert response_of('get_joint_pos', payload) == [0] + old_bytes_to_fp32s(payload, 7)
+    assert response_of('get_ik', payload, POSE) == [0] + old_bytes_to_fp32s(payload, 7)
+    payload = old_fp32s(POSE, 6)
+    assert response_of('get_tcp_pose', payload) == [0] + old_bytes_to_fp32s(payload, 6)
+
+
+def test_decode_u8_and_u16_responses():
+    version = bytes(range(40))
+    assert response_of('get_version', version) == [0] + list(version)
+    assert response_of('get_state', bytes([2])) == [0, 2]
+    assert response_of('get_err_code', bytes([21, 3])) == [0, 21, 3]
+    assert response_of('get_cmdnum', old_u16(513)) == [0, 513]
+    assert response_of('is_tcp_limit', bytes([1]), POSE) == [0, 1]
+
+
+def test_decode_i32_responses():
+    for value in (0, 1, -1, 123456, -2 ** 31):
+        payload = struct.pack('>l', value)
+        assert response_of('servo_addr_r16', payload, 1, 0x0100) == [0, old_bytes_to_long_big(payload)]
+        assert response_of('gripper_addr_r32', payload, 0x0700) == [0, value]
+
+
+def test_short_response_is_zero_filled():
+    assert response_of('get_tcp_pose', b'') == [0] + [0.0] * 6
+
+
+def test_inverse_codecs():
+    # used by the controller simulator
+    for reg, spec in REGISTERS.items():
+        values = spec.decode_request(bytes(range(spec.tx_size)))
+        assert bytes(spec.encode(values)) == bytes(range(spec.tx_size)), reg
+        values = spec.decode(bytes(range(spec.rx_size)))
+        assert bytes(spec.encode_response(values)) == bytes(range(spec.rx_size)), reg
@@ -1,2 +1,2 @@
-from .wrapper import XArmAPI
+from .wrapper import XArmAPI, XArmFleet
 from .version import __version__
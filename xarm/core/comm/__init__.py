@@ -3,4 +3,7 @@ try:
 except:
     print('Warnning: serial module is not found, if you want to connect to xArm with serial, please `pip install pyserial==3.4`')
     SerialPort = object
-from .socket_port import SocketPort
\ No newline at end of file
+from .socket_port import SocketPort
+from .reactor import Reactor
+from .scheduler import TimerScheduler, get_scheduler
+from .transport import register_transport, register_responder, create_transport, LoopPort
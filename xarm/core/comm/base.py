@@ -8,17 +8,17 @@
 
 
 import threading
-import queue
 import socket
 import time
 from ..utils.log import logger
+from .rx_ring import RxRing
 
 
 class Port(threading.Thread):
     def __init__(self, rxque_max):
         super(Port, self).__init__()
         self.daemon = True
-        self.rx_que = queue.Queue(rxque_max)
+        self.rx_que = RxRing(rxque_max)
         self.write_lock = threading.Lock()
         self._connected = False
         self.com = None
@@ -29,16 +29,32 @@ class Port(threading.Thread):
         self.buffer_size = 1
         self.heartbeat_thread = None
         self.alive = True
+        self.reactor = None
+        self.rx_callback = None
+        self.close_callback = None
+        self.framer = None
+        # the peer closed the socket (end of stream), the port is still connected until the retries are exhausted
+        self.peer_closed = False
 
     @property
     def connected(self):
         return self._connected
 
+    @property
+    def rx_stats(self):
+        """
+        The statistics of the receive ring: length, maxlen, put_count, drop_count, high_water
+        """
+        return self.rx_que.stats
+
     def run(self):
         self.recv_proc()
 
     def close(self):
         self.alive = False
+        self._connected = False
+        if self.reactor is not None:
+            self.reactor.remove_port(self)
         if 'socket' in self.port_type:
             try:
                 self.com.shutdown(socket.SHUT_RDWR)
@@ -52,8 +68,7 @@ class Port(threading.Thread):
     def flush(self, fromid=-1, toid=-1):
         if not self.connected:
             return -1
-        while not(self.rx_que.empty()):
-            self.rx_que.queue.clear()
+        self.rx_que.clear()
         if self.rx_parse != -1:
             self.rx_parse.flush(fromid, toid)
         return 0
@@ -70,14 +85,68 @@ class Port(threading.Thread):
             logger.error("{} send: {}".format(self.port_type, e))
             return -1
 
+    def flush_tx(self):
+        # write the gathered frames (ports which gather the frames override it)
+        return 0
+
     def read(self, timeout=None):
+        """
+        :param timeout: None: do not wait, else wait up to timeout seconds for the data
+        :return: the oldest received data, -1 if there is no data
+        """
         if not self.connected:
             return -1
-        if not self.rx_que.empty():
-            buf = self.rx_que.get(timeout=timeout)
-            return buf
+        buf = self.rx_que.get(timeout=timeout)
+        return -1 if buf is None else buf
+
+    def set_rx_callback(self, callback):
+        # the callback receives every frame (parsed by rx_parse if there is one) instead of rx_que
+        self.rx_callback = callback
+        if -1 != self.rx_parse:
+            self.rx_parse.rx_callback = callback
+
+    def _handle_rx(self, rx_data):
+        if -1 != self.rx_parse:
+            self.rx_parse.put(rx_data)
+        elif self.rx_callback is not None:
+            try:
+                self.rx_callback(rx_data)
+            except Exception as e:
+                logger.error('{} rx callback: {}'.format(self.port_type, e))
         else:
-            return -1
+            if isinstance(rx_data, memoryview):
+                rx_data = rx_data.tobytes()
+            self.rx_que.put(rx_data)
+
+    def _recv_socket(self):
+        # receive once and dispatch the data (or the reassembled frames), return the received length
+        if self.framer is not None:
+            length = self.framer.recv_into(self.com)
+            for frame in self.framer.frames():
+                self._handle_rx(frame)
+            return length
+        rx_data = self.com_read(self.buffer_size)
+        if len(rx_data):
+            self._handle_rx(rx_data)
+        return len(rx_data)
+
+    def handle_readable(self):
+        # called by the reactor thread when the socket is readable
+        if not self.connected or not self.alive:
+            return
+        try:
+            length = self._recv_socket()
+        except (socket.timeout, BlockingIOError, InterruptedError):
+            return
+        except Exception as e:
+            logger.error('{}: {}'.format(self.port_type, e))
+            length = 0
+        if length == 0:
+            self._connected = False
+            self.close()
+            logger.debug('{} closed by reactor'.format(self.port_type))
+            if self.close_callback is not None:
+                self.close_callback()
 
     def recv_proc(self):
         self.alive = True
@@ -85,41 +154,25 @@ class Port(threading.Thread):
         try:
             failed_read_count = 0
             while self.connected and self.alive:
-                if self.port_type == 'main-socket':
-                    try:
-                        rx_data = self.com_read(self.buffer_size)
-                    except socket.timeout:
-                        continue
-                    if len(rx_data) == 0:
-                        failed_read_count += 1
-                        if failed_read_count > 30:
-                            self._connected = False
-                            break
-                        time.sleep(0.1)
-                        continue
-                elif self.port_type == 'report-socket':
+                if self.port_type == 'main-socket' or self.port_type == 'report-socket':
                     try:
-                        rx_data = self.com_read(self.buffer_size)
+                        length = self._recv_socket()
                     except socket.timeout:
                         continue
-                    if len(rx_data) == 0:
+                    if length == 0:
+                        self.peer_closed = True
                         failed_read_count += 1
-                        if failed_read_count > 5:
+                        if failed_read_count > (30 if self.port_type == 'main-socket' else 5):
                             self._connected = False
                             break
                         time.sleep(0.1)
                         continue
                 elif self.port_type == 'main-serial':
                     rx_data = self.com_read(self.com.in_waiting or self.buffer_size)
+                    self._handle_rx(rx_data)
                 else:
                     break
                 failed_read_count = 0
-                if -1 == self.rx_parse:
-                    if self.rx_que.full():
-                        self.rx_que.get()
-                    self.rx_que.put(rx_data)
-                else:
-                    self.rx_parse.put(rx_data)
         except Exception as e:
             if self.alive:
                 logger.error('{}: {}'.format(self.port_type, e))
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2019, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+import struct
+from ..utils.log import logger
+
+U16_BE = struct.Struct('>H')
+U32_BE = struct.Struct('>I')
+
+
+class StreamFramer(object):
+    """
+    Reassemble a length-framed tcp stream into frames
+    Data is received with recv_into into a preallocated buffer and every frame is returned as a memoryview,
+    the memoryview is only valid until the next recv_into/feed
+    """
+    header_size = 4
+
+    def __init__(self, capacity=8192, max_frame_size=1024):
+        self._buf = bytearray(capacity)
+        self._view = memoryview(self._buf)
+        self._capacity = capacity
+        self._max_frame_size = max_frame_size
+        self._start = 0
+        self._end = 0
+        self.frame_count = 0
+        self.resync_count = 0
+
+    @property
+    def pending(self):
+        return self._end - self._start
+
+    def frame_size(self, view, offset):
+        raise NotImplementedError
+
+    def reset(self):
+        self._start = 0
+        self._end = 0
+
+    def _compact(self):
+        # keep the incomplete frame at the beginning of the buffer
+        length = self._end - self._start
+        if self._start and length:
+            self._buf[:length] = self._view[self._start:self._end]
+        self._start = 0
+        self._end = length
+
+    def _reserve(self):
+        if self._capacity - self._end < self._max_frame_size:
+            self._compact()
+
+    def recv_into(self, sock):
+        self._reserve()
+        length = sock.recv_into(self._view[self._end:])
+        self._end += length
+        return length
+
+    def feed(self, data):
+        length = len(data)
+        self._reserve()
+        if length > self._capacity - self._end:
+            logger.error('framer buffer overflow, drop {} bytes'.format(self._end - self._start))
+            self.resync_count += 1
+            self.reset()
+            data = data[-self._capacity:]
+            length = len(data)
+        self._buf[self._end:self._end + length] = data
+        self._end += length
+        return length
+
+    def frames(self):
+        view = self._view
+        while self._end - self._start >= self.header_size:
+            size = self.frame_size(view, self._start)
+            if size < self.header_size or size > self._max_frame_size:
+                logger.error('invalid frame size {}, drop {} bytes'.format(size, self._end - self._start))
+                self.resync_count += 1
+                self.reset()
+                return
+            if self._end - self._start < size:
+                return
+            start = self._start
+            self._start += size
+            self.frame_count += 1
+            yield view[start:start + size]
+        if self._start == self._end:
+            self.reset()
+
+
+class ReportFramer(StreamFramer):
+    """
+    Report frame: the 4-byte length header is the whole frame size
+    """
+    header_size = 4
+
+    def frame_size(self, view, offset):
+        return U32_BE.unpack_from(view, offset)[0]
+
+
+class CmdFramer(StreamFramer):
+    """
+    Command response frame: [bus_flag(2), prot_flag(2), length(2), funcode + data(length)]
+    """
+    header_size = 6
+
+    def frame_size(self, view, offset):
+        return U16_BE.unpack_from(view, offset + 4)[0] + 6
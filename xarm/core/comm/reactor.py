@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2019, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+import heapq
+import itertools
+import selectors
+import socket
+import threading
+import time
+from ..utils.log import logger
+
+
+class ReactorTimer(object):
+    def __init__(self, when, interval, callback):
+        self.when = when
+        self.interval = interval
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class Reactor(threading.Thread):
+    """
+    One selector thread that owns the sockets (and the periodic timers) of one or more xArm,
+    the received data of every registered port is handled in this thread
+    """
+    def __init__(self, name='xarm-reactor'):
+        super(Reactor, self).__init__(name=name)
+        self.daemon = True
+        self.alive = True
+        self._selector = selectors.DefaultSelector()
+        self._timers = []
+        self._timer_seq = itertools.count()
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._wakeup_r.setblocking(False)
+        self._wakeup_w.setblocking(False)
+        self._selector.register(self._wakeup_r, selectors.EVENT_READ, None)
+
+    @property
+    def in_reactor_thread(self):
+        return threading.current_thread() is self
+
+    def _wakeup(self):
+        if self.in_reactor_thread:
+            return
+        try:
+            self._wakeup_w.send(b'\0')
+        except Exception:
+            pass
+
+    def call_soon(self, callback, *args):
+        with self._lock:
+            self._callbacks.append((callback, args))
+        self._wakeup()
+
+    def call_later(self, delay, callback, interval=None):
+        timer = ReactorTimer(time.monotonic() + delay, interval, callback)
+        with self._lock:
+            heapq.heappush(self._timers, (timer.when, next(self._timer_seq), timer))
+        self._wakeup()
+        return timer
+
+    def add_port(self, port):
+        if self.in_reactor_thread:
+            self._selector.register(port.com, selectors.EVENT_READ, port)
+        else:
+            self.call_soon(self.add_port, port)
+
+    def remove_port(self, port):
+        if self.in_reactor_thread:
+            try:
+                self._selector.unregister(port.com)
+            except (KeyError, ValueError):
+                pass
+        else:
+            self.call_soon(self.remove_port, port)
+
+    def stop(self):
+        self.alive = False
+        self._wakeup()
+
+    def _next_timeout(self):
+        with self._lock:
+            if self._callbacks:
+                return 0
+            if not self._timers:
+                return None
+            return max(0, self._timers[0][0] - time.monotonic())
+
+    def _run_callbacks(self):
+        with self._lock:
+            callbacks, self._callbacks = self._callbacks, []
+        for callback, args in callbacks:
+            try:
+                callback(*args)
+            except Exception as e:
+                logger.error('reactor callback: {}'.format(e))
+
+    def _run_timers(self):
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            while self._timers and self._timers[0][0] <= now:
+                expired.append(heapq.heappop(self._timers)[2])
+        for timer in expired:
+            if timer.cancelled:
+                continue
+            try:
+                timer.callback()
+            except Exception as e:
+                logger.error('reactor timer: {}'.format(e))
+            if timer.interval is not None and not timer.cancelled:
+                timer.when += timer.interval
+                if timer.when < now:
+                    timer.when = now + timer.interval
+                with self._lock:
+                    heapq.heappush(self._timers, (timer.when, next(self._timer_seq), timer))
+
+    def run(self):
+        logger.debug('{} start'.format(self.name))
+        while self.alive:
+            try:
+                events = self._selector.select(self._next_timeout())
+            except Exception as e:
+                logger.error('{} select: {}'.format(self.name, e))
+                time.sleep(0.01)
+                continue
+            for key, _ in events:
+                port = key.data
+                if port is None:
+                    try:
+                        while self._wakeup_r.recv(1024):
+                            pass
+                    except Exception:
+                        pass
+                else:
+                    port.handle_readable()
+            self._run_callbacks()
+            self._run_timers()
+        for key in list(self._selector.get_map().values()):
+            if key.data is not None:
+                try:
+                    key.data.close()
+                except Exception:
+                    pass
+        self._selector.close()
+        self._wakeup_r.close()
+        self._wakeup_w.close()
+        logger.debug('{} had stopped'.format(self.name))
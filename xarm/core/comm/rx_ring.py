@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2019, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+import time
+import threading
+from collections import deque
+
+
+class RxRing(object):
+    """
+    Bounded receive ring of one producer (the receive thread) and one consumer
+    When the ring is full the oldest item is dropped and counted, put never blocks.
+    The deque append/popleft are atomic, the producer only touches the event if the consumer is waiting.
+    """
+    def __init__(self, maxlen):
+        self._items = deque(maxlen=maxlen)
+        self._maxlen = maxlen
+        self._event = threading.Event()
+        self._waiting = False
+        self.put_count = 0
+        self.drop_count = 0
+        self.high_water = 0
+
+    @property
+    def maxlen(self):
+        return self._maxlen
+
+    def __len__(self):
+        return len(self._items)
+
+    def empty(self):
+        return not self._items
+
+    def full(self):
+        return len(self._items) >= self._maxlen
+
+    def put(self, item):
+        items = self._items
+        if len(items) >= self._maxlen:
+            self.drop_count += 1
+        items.append(item)
+        self.put_count += 1
+        length = len(items)
+        if length > self.high_water:
+            self.high_water = length
+        if self._waiting:
+            self._event.set()
+
+    def get(self, timeout=None):
+        """
+        :param timeout: None or 0: do not wait, else wait up to timeout seconds
+        :return: the oldest item, None if there is no item
+        """
+        try:
+            return self._items.popleft()
+        except IndexError:
+            if not timeout:
+                return None
+        expired = time.monotonic() + timeout
+        self._waiting = True
+        try:
+            while True:
+                self._event.clear()
+                try:
+                    return self._items.popleft()
+                except IndexError:
+                    pass
+                remaining = expired - time.monotonic()
+                if remaining <= 0 or not self._event.wait(remaining):
+                    try:
+                        return self._items.popleft()
+                    except IndexError:
+                        return None
+        finally:
+            self._waiting = False
+
+    def clear(self):
+        self._items.clear()
+
+    def reset_stats(self):
+        self.put_count = 0
+        self.drop_count = 0
+        self.high_water = len(self._items)
+
+    @property
+    def stats(self):
+        return {
+            'length': len(self._items),
+            'maxlen': self._maxlen,
+            'put_count': self.put_count,
+            'drop_count': self.drop_count,
+            'high_water': self.high_water,
+        }
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2019, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+import heapq
+import itertools
+import threading
+import time
+from ..utils.log import logger
+from .reactor import ReactorTimer
+
+
+class TimerScheduler(threading.Thread):
+    """
+    One timer thread (a heap of the deadlines) shared by all the xArm of the process,
+    it drives the heartbeats, the flush of the gathered frames and the timeouts of the waited motions,
+    the callbacks run in the timer thread and must not block
+    """
+    def __init__(self, name='xarm-timer'):
+        super(TimerScheduler, self).__init__(name=name)
+        self.daemon = True
+        self.alive = True
+        self._timers = []
+        self._timer_seq = itertools.count()
+        self._cond = threading.Condition()
+
+    @property
+    def pending(self):
+        return len(self._timers)
+
+    def call_later(self, delay, callback, interval=None):
+        """
+        :param delay: seconds
+        :param callback: called in the timer thread
+        :param interval: None: call once, else call every interval seconds until cancelled
+        :return: the timer, timer.cancel() to cancel it
+        """
+        timer = ReactorTimer(time.monotonic() + delay, interval, callback)
+        with self._cond:
+            heapq.heappush(self._timers, (timer.when, next(self._timer_seq), timer))
+            if self._timers[0][2] is timer:
+                self._cond.notify()
+        return timer
+
+    def stop(self):
+        with self._cond:
+            self.alive = False
+            self._cond.notify()
+
+    def _pop_expired(self):
+        # wait for the first deadline, return the expired timers
+        with self._cond:
+            while self.alive:
+                now = time.monotonic()
+                expired = []
+                while self._timers and (self._timers[0][2].cancelled or self._timers[0][0] <= now):
+                    timer = heapq.heappop(self._timers)[2]
+                    if not timer.cancelled:
+                        expired.append(timer)
+                if expired:
+                    return now, expired
+                self._cond.wait(self._timers[0][0] - now if self._timers else None)
+            return None, []
+
+    def run(self):
+        logger.debug('{} start'.format(self.name))
+        while self.alive:
+            now, expired = self._pop_expired()
+            for timer in expired:
+                try:
+                    timer.callback()
+                except Exception as e:
+                    logger.error('{} callback: {}'.format(self.name, e))
+                if timer.interval is not None and not timer.cancelled:
+                    timer.when += timer.interval
+                    if timer.when < now:
+                        timer.when = now + timer.interval
+                    with self._cond:
+                        heapq.heappush(self._timers, (timer.when, next(self._timer_seq), timer))
+        logger.debug('{} had stopped'.format(self.name))
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """
+    :return: the shared TimerScheduler of the process (started on first use)
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None or not _scheduler.is_alive():
+            _scheduler = TimerScheduler()
+            _scheduler.start()
+        return _scheduler
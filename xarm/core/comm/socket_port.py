@@ -8,47 +8,58 @@
 # Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
 
 
-import queue
+import sys
+import select
 import socket
 import threading
 import time
 from ..utils.log import logger
 from .base import Port
+from .scheduler import get_scheduler
+from .framer import ReportFramer, CmdFramer
 from ..config.x_config import XCONF
 
+HEARTBEAT_DATA = bytes([0, 0, 0, 1, 0, 2, 0, 0])
+MSG_DONTWAIT = getattr(socket, 'MSG_DONTWAIT', 0)
 
-class HeartBeatThread(threading.Thread):
-    def __init__(self, sock_class):
-        threading.Thread.__init__(self)
-        self.sock_class = sock_class
-        self.daemon = True
-
-    def run(self):
-        logger.debug('{} heartbeat thread start'.format(self.sock_class.port_type))
-        heat_data = bytes([0, 0, 0, 1, 0, 2, 0, 0])
-
-        while self.sock_class.connected:
-            if self.sock_class.write(heat_data) == -1:
-                break
-            time.sleep(1)
-        logger.debug('{} heartbeat thread had stopped'.format(self.sock_class.port_type))
+# (level, option) of the profile options, None if the platform does not support it
+SOCKET_OPTIONS = {
+    'rcvbuf': (socket.SOL_SOCKET, socket.SO_RCVBUF),
+    'sndbuf': (socket.SOL_SOCKET, socket.SO_SNDBUF),
+    'nodelay': (socket.IPPROTO_TCP, socket.TCP_NODELAY),
+    'quickack': (socket.IPPROTO_TCP, getattr(socket, 'TCP_QUICKACK', None)),
+    'busy_poll': (socket.SOL_SOCKET, getattr(socket, 'SO_BUSY_POLL', 46 if sys.platform.startswith('linux') else None)),
+}
 
 
 class SocketPort(Port):
     def __init__(self, server_ip, server_port, rxque_max=XCONF.SocketConf.TCP_RX_QUE_MAX, heartbeat=False,
-                 buffer_size=XCONF.SocketConf.TCP_CONTROL_BUF_SIZE):
+                 buffer_size=XCONF.SocketConf.TCP_CONTROL_BUF_SIZE, reactor=None, coalesce_window=0,
+                 profile='default'):
         super(SocketPort, self).__init__(rxque_max)
+        self.socket_options = {}
+        self._quickack = False
+        # coalesce_window > 0: the frames written within the window (seconds) are gathered into one sendmsg
+        self.coalesce_window = coalesce_window
+        self._batch_depth = 0
+        self._tx_frames = []
+        self._tx_size = 0
+        self._tx_flush_timer = None
+        self.tx_frame_count = 0
+        self.tx_send_count = 0
         if server_port == XCONF.SocketConf.TCP_CONTROL_PORT:
             self.port_type = 'main-socket'
             # self.com.setsockopt(socket.SOL_SOCKET, socket.SO_RCVTIMEO, 5)
         else:
             self.port_type = 'report-socket'
+        self.heartbeat_timer = None
         try:
-            socket.setdefaulttimeout(1)
             self.com = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.com.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
             self.com.setblocking(True)
             self.com.settimeout(1)
+            # the buffer sizes must be set before connect
+            self._apply_profile(profile)
             self.com.connect((server_ip, server_port))
             logger.info('{} connect {} success'.format(self.port_type, server_ip))
             # logger.info('{} connect {}:{} success'.format(self.port_type, server_ip, server_port))
@@ -58,15 +69,191 @@ class SocketPort(Port):
             # time.sleep(1)
 
             self.rx_parse = -1
+            if self.port_type == 'report-socket':
+                self.framer = ReportFramer(capacity=XCONF.SocketConf.TCP_REPORT_FRAMER_CAPACITY)
+            else:
+                self.framer = CmdFramer(capacity=XCONF.SocketConf.TCP_CONTROL_FRAMER_CAPACITY)
             self.com_read = self.com.recv
             self.com_write = self.com.send
             self.write_lock = threading.Lock()
-            self.start()
+            if reactor is not None:
+                self.reactor = reactor
+                reactor.add_port(self)
+            else:
+                self.start()
             if heartbeat:
-                self.heartbeat_thread = HeartBeatThread(self)
-                self.heartbeat_thread.start()
+                self.heartbeat_timer = self._timers.call_later(1, self._send_heartbeat, interval=1)
         except Exception as e:
             logger.error('{} connect {} failed, {}'.format(self.port_type, server_ip, e))
             # logger.error('{} connect {}:{} failed, {}'.format(self.port_type, server_ip, server_port, e))
             self._connected = False
 
+    def _apply_profile(self, profile):
+        options = XCONF.SocketConf.SOCKET_PROFILES.get(profile)
+        if options is None:
+            logger.error('{} unknown socket profile: {}'.format(self.port_type, profile))
+            return
+        for name, value in options.items():
+            level, option = SOCKET_OPTIONS[name]
+            if option is None:
+                continue
+            try:
+                self.com.setsockopt(level, option, int(value))
+                self.socket_options[name] = value
+            except OSError as e:
+                logger.debug('{} set socket option {} failed: {}'.format(self.port_type, name, e))
+        self._quickack = 'quickack' in self.socket_options
+
+    def _recv_socket(self):
+        length = super(SocketPort, self)._recv_socket()
+        if self._quickack:
+            # the quickack mode is not permanent, set it again after every receive
+            try:
+                self.com.setsockopt(socket.IPPROTO_TCP, SOCKET_OPTIONS['quickack'][1], 1)
+            except OSError:
+                pass
+        return length
+
+    @property
+    def tx_pending(self):
+        return len(self._tx_frames)
+
+    def begin_batch(self):
+        """
+        Gather the written frames until end_batch (or flush_tx), can be nested
+        """
+        with self.write_lock:
+            self._batch_depth += 1
+
+    def end_batch(self):
+        with self.write_lock:
+            self._batch_depth = max(0, self._batch_depth - 1)
+            depth = self._batch_depth
+        return self.flush_tx() if depth == 0 else 0
+
+    def write(self, data):
+        if not self._batch_depth and not self.coalesce_window:
+            return super(SocketPort, self).write(data)
+        if not self.connected:
+            return -1
+        with self.write_lock:
+            self._tx_frames.append(bytes(data))
+            self._tx_size += len(data)
+            full = len(self._tx_frames) >= XCONF.SocketConf.TCP_TX_COALESCE_MAX_FRAMES \
+                or self._tx_size >= XCONF.SocketConf.TCP_TX_COALESCE_MAX_BYTES
+            arm_timer = not full and not self._batch_depth and self._tx_flush_timer is None
+            if arm_timer:
+                # retried every window until the gathered frames are sent
+                self._tx_flush_timer = self._timers.call_later(self.coalesce_window, self._flush_on_timer,
+                                                               interval=self.coalesce_window)
+        return self.flush_tx() if full else 0
+
+    def _send_frames(self, frames, flags=0):
+        """
+        sendmsg may send a part of the frames
+        :param flags: MSG_DONTWAIT: stop once the send buffer is full
+        :return: the frames which are not sent (the first one may be a part of a frame)
+        """
+        if not hasattr(self.com, 'sendmsg'):
+            data = b''.join(frames)
+            if not flags:
+                self.com.sendall(data)
+                self.tx_send_count += 1
+                return []
+            frames = [data]
+        while frames:
+            if flags:
+                # a socket with timeout polls before the send, do not let it wait
+                _, writable, _ = select.select([], [self.com], [], 0)
+                if not writable:
+                    return frames
+            try:
+                sent = self.com.sendmsg(frames, [], flags) if hasattr(self.com, 'sendmsg') \
+                    else self.com.send(frames[0], flags)
+            except BlockingIOError:
+                return frames
+            self.tx_send_count += 1
+            index = 0
+            while index < len(frames) and sent >= len(frames[index]):
+                sent -= len(frames[index])
+                index += 1
+            frames = frames[index:]
+            if frames and sent:
+                frames[0] = frames[0][sent:]
+        return []
+
+    def flush_tx(self):
+        """
+        Write the gathered frames with one sendmsg
+        """
+        with self.write_lock:
+            if self._tx_flush_timer is not None:
+                self._tx_flush_timer.cancel()
+                self._tx_flush_timer = None
+            frames, self._tx_frames = self._tx_frames, []
+            self._tx_size = 0
+            if not frames:
+                return 0
+            if not self.connected:
+                return -1
+            try:
+                self._send_frames(frames)
+                self.tx_frame_count += len(frames)
+                return 0
+            except Exception as e:
+                self._connected = False
+                logger.error('{} send: {}'.format(self.port_type, e))
+                return -1
+
+    def _flush_on_timer(self):
+        # runs in the shared timer thread (or the reactor thread), so it never waits (see _send_heartbeat):
+        # it is retried at the next window if a writer holds the lock or the send buffer is full
+        if not self.write_lock.acquire(blocking=False):
+            return
+        try:
+            frames = self._tx_frames
+            if frames and self.connected:
+                self._tx_frames = self._send_frames(frames, MSG_DONTWAIT)
+                self._tx_size = sum(len(frame) for frame in self._tx_frames)
+                self.tx_frame_count += len(frames) - len(self._tx_frames)
+                if self._tx_frames:
+                    return
+            if self._tx_flush_timer is not None:
+                self._tx_flush_timer.cancel()
+                self._tx_flush_timer = None
+        except Exception as e:
+            self._connected = False
+            logger.error('{} send: {}'.format(self.port_type, e))
+        finally:
+            self.write_lock.release()
+
+    @property
+    def _timers(self):
+        # the timers of the reactor mode run in the reactor thread, else in the shared timer thread
+        return self.reactor if self.reactor is not None else get_scheduler()
+
+    def _send_heartbeat(self):
+        # runs in the shared timer thread (or the reactor thread), so it never waits:
+        # the beat is skipped if a writer holds the lock (its frame keeps the connection alive too)
+        # or the send buffer is full
+        if not self.connected:
+            self.heartbeat_timer.cancel()
+            return
+        if not self.write_lock.acquire(blocking=False):
+            return
+        try:
+            _, writable, _ = select.select([], [self.com], [], 0)
+            if not writable:
+                return
+            sent = self.com.send(HEARTBEAT_DATA, MSG_DONTWAIT)
+            if sent < len(HEARTBEAT_DATA):
+                # the rest of a partly sent frame must follow before any other frame
+                self.com.sendall(HEARTBEAT_DATA[sent:])
+        except BlockingIOError:
+            pass
+        except Exception as e:
+            self._connected = False
+            self.heartbeat_timer.cancel()
+            logger.error('{} send heartbeat: {}'.format(self.port_type, e))
+        finally:
+            self.write_lock.release()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2019, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+"""
+Transports of the xArm connection, selected by the scheme of the port
+    tcp://192.168.1.100 (or 192.168.1.100): the control socket and the report sockets
+    serial:///dev/ttyUSB0 (or /dev/ttyUSB0, COM3): the serial port, the reports are polled
+    loop://name: in-process loopback to the responder registered by register_responder(name, responder)
+    sim://: in-process loopback to a new simulated controller (xarm.tools.simulator.SimArm)
+A responder of the loopback implements handle_frame(frame) -> response frame (or None),
+optionally report_frame(report_type) -> report frame (or None) and step(dt) to advance its motions.
+register_transport(scheme, cls) adds a transport.
+"""
+
+import re
+from ..config.x_config import XCONF
+from .base import Port
+from .scheduler import get_scheduler
+from .socket_port import SocketPort
+try:
+    from .serial_port import SerialPort
+except:
+    SerialPort = None
+
+TRANSPORTS = {}
+RESPONDERS = {}
+
+_IP_PATTERN = re.compile(r"^(?:(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\.){3}(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)$")
+
+REPORT_TYPES = {
+    XCONF.SocketConf.TCP_REPORT_NORM_PORT: 'normal',
+    XCONF.SocketConf.TCP_REPORT_RICH_PORT: 'rich',
+    XCONF.SocketConf.TCP_REPORT_REAL_PORT: 'real',
+}
+
+
+def register_transport(scheme, cls):
+    TRANSPORTS[scheme] = cls
+    return cls
+
+
+def register_responder(name, responder):
+    """
+    Register the peer of loop://name
+    """
+    RESPONDERS[name] = responder
+
+
+def parse_port(port):
+    """
+    :return: (scheme, address), the port without scheme is an ip address (tcp) or a serial port
+    """
+    if '://' in port:
+        scheme, address = port.split('://', 1)
+        return scheme.lower(), address
+    if port == 'localhost' or _IP_PATTERN.match(port):
+        return 'tcp', port
+    return 'serial', port
+
+
+def create_transport(port):
+    if not isinstance(port, str):
+        return SerialTransport(port)
+    scheme, address = parse_port(port)
+    cls = TRANSPORTS.get(scheme)
+    if cls is None:
+        raise Exception('unknown transport of port {}'.format(port))
+    return cls(address)
+
+
+class Transport(object):
+    """
+    Opens the ports of one connection
+    stream_type: 'socket' (UxbusCmdTcp and the report ports) or 'serial' (UxbusCmdSer, the reports are polled)
+    """
+    stream_type = 'socket'
+
+    def __init__(self, address):
+        self.address = address
+
+    def open_control(self, **kwargs):
+        raise NotImplementedError
+
+    def open_report(self, port, **kwargs):
+        return None
+
+
+class TcpTransport(Transport):
+    def open_control(self, heartbeat=False, reactor=None, coalesce_window=0, profile='default'):
+        return SocketPort(self.address, XCONF.SocketConf.TCP_CONTROL_PORT, heartbeat=heartbeat,
+                          buffer_size=XCONF.SocketConf.TCP_CONTROL_BUF_SIZE, reactor=reactor,
+                          coalesce_window=coalesce_window, profile=profile)
+
+    def open_report(self, port, buffer_size=XCONF.SocketConf.TCP_REPORT_RICH_BUF_SIZE, reactor=None,
+                    profile='default'):
+        return SocketPort(self.address, port, buffer_size=buffer_size, reactor=reactor, profile=profile)
+
+
+class SerialTransport(Transport):
+    stream_type = 'serial'
+
+    def open_control(self, **kwargs):
+        if SerialPort is None:
+            raise Exception('serial module is not found, please `pip install pyserial==3.4`')
+        return SerialPort(self.address)
+
+
+class LoopPort(Port):
+    """
+    In-process port without socket and receive thread:
+    the written frame is handled by the responder in the writer thread and its response is received at once
+    """
+    def __init__(self, responder, port_type='main-loop', rxque_max=XCONF.SocketConf.TCP_RX_QUE_MAX):
+        super(LoopPort, self).__init__(rxque_max)
+        self.responder = responder
+        self.port_type = port_type
+        self.com_write = self._deliver
+        self._timers = []
+        self._connected = True
+
+    def _deliver(self, data):
+        response = self.responder.handle_frame(data)
+        if response is not None:
+            self._handle_rx(response)
+
+    def begin_batch(self):
+        # the frames are delivered as soon as they are written, there is nothing to gather
+        pass
+
+    def end_batch(self):
+        pass
+
+    def call_every(self, interval, callback):
+        # the periodic jobs of the port (reports, motions) run in the shared timer thread until the port is closed
+        self._timers.append(get_scheduler().call_later(interval, callback, interval=interval))
+
+    def close(self):
+        self.alive = False
+        self._connected = False
+        for timer in self._timers:
+            timer.cancel()
+        self._timers = []
+
+
+class LoopTransport(Transport):
+    """
+    :param address: the name of the registered responder
+    """
+    REPORT_RATE = 100  # the report frames per second
+    MOTION_TICK = 0.005  # the period (seconds) of responder.step
+
+    def __init__(self, address, responder=None):
+        super(LoopTransport, self).__init__(address)
+        self.responder = RESPONDERS.get(address) if responder is None else responder
+
+    def open_control(self, **kwargs):
+        if self.responder is None:
+            raise Exception('no responder of loop://{}'.format(self.address))
+        port = LoopPort(self.responder)
+        if hasattr(self.responder, 'step'):
+            port.call_every(self.MOTION_TICK, lambda: self.responder.step(self.MOTION_TICK))
+        return port
+
+    def open_report(self, port, **kwargs):
+        report_type = REPORT_TYPES.get(port)
+        if not hasattr(self.responder, 'report_frame') or report_type is None:
+            return None
+        report_port = LoopPort(self.responder, port_type='report-loop')
+
+        def push():
+            frame = self.responder.report_frame(report_type)
+            if frame is not None:
+                report_port._handle_rx(frame)
+        report_port.call_every(1.0 / self.REPORT_RATE, push)
+        return report_port
+
+
+class SimTransport(LoopTransport):
+    """
+    Loopback to a new simulated controller (enabled and ready to move), the controller is transport.responder
+    """
+    def __init__(self, address):
+        from ...tools.simulator import SimArm
+        super(SimTransport, self).__init__(address, responder=SimArm(enabled=True))
+
+
+register_transport('tcp', TcpTransport)
+register_transport('serial', SerialTransport)
+register_transport('loop', LoopTransport)
+register_transport('sim', SimTransport)
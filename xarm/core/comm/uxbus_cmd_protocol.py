@@ -12,89 +12,88 @@ from ..utils import crc16
 from ..utils.log import logger
 
 # ux2_hex_protocol define
-UX2HEX_RXSTART_FROMID = 0
-UX2HEX_RXSTART_TOID = 1
-UX2HEX_RXSTATE_LEN = 2
-UX2HEX_RXSTATE_DATA = 3
-UX2HEX_RXSTATE_CRC1 = 4
-UX2HEX_RXSTATE_CRC2 = 5
+# frame: [toid(1), fromid(1), length(1), data(length), crc(2)], crc16-modbus of the header and data
+UX2HEX_HEADER_LEN = 3
+UX2HEX_CRC_LEN = 2
 UX2HEX_RXLEN_MAX = 50
 
 
 class Ux2HexProtocol(object):
     """
     fromid and toid: broadcast address is 0xFF
+    The received data is appended to one bytearray which is scanned for whole frames,
+    every valid frame is passed to rx_callback as a memoryview (only valid during the callback)
+    or put to rx_que as bytes
     """
     def __init__(self, rx_que, fromid, toid):
         self.rx_que = rx_que
-        self.rxstate = UX2HEX_RXSTART_FROMID
-        self.data_idx = 0
-        self.len = 0
         self.fromid = fromid
         self.toid = toid
-        self.rxbuf = None
+        self.rxbuf = bytearray()
+        self.rx_callback = None
+        self.frame_count = 0
+        self.crc_error_count = 0
 
     # wipe cache , set from_id and to_id
     def flush(self, fromid=-1, toid=-1):
-        self.rxstate = UX2HEX_RXSTART_FROMID
-        self.data_idx = 0
-        self.len = 0
+        del self.rxbuf[:]
         if fromid != -1:
             self.fromid = fromid
         if toid != -1:
             self.toid = toid
 
+    def _emit(self, frame):
+        self.frame_count += 1
+        if self.rx_callback is not None:
+            try:
+                self.rx_callback(frame)
+            except Exception as e:
+                logger.error('rx callback: {}'.format(e))
+        else:
+            self.rx_que.put(frame.tobytes())
+
+    def _scan(self, buf, view):
+        # return the offset of the first byte which is not consumed
+        toid, fromid = self.toid, self.fromid
+        end = len(buf)
+        start = 0
+        while end - start >= UX2HEX_HEADER_LEN:
+            if toid != 0xFF:
+                start = buf.find(toid, start)
+                if start < 0:
+                    return end
+                if end - start < UX2HEX_HEADER_LEN:
+                    break
+            length = buf[start + 2]
+            if (fromid != 0xFF and buf[start + 1] != fromid) or length >= UX2HEX_RXLEN_MAX:
+                start += 1
+                continue
+            crc_offset = start + UX2HEX_HEADER_LEN + length
+            if crc_offset + UX2HEX_CRC_LEN > end:
+                break
+            frame = view[start:crc_offset + UX2HEX_CRC_LEN]
+            if not crc16.check_modbus(frame):
+                frame.release()
+                self.crc_error_count += 1
+                start += 1
+                continue
+            self._emit(frame)
+            frame.release()
+            start = crc_offset + UX2HEX_CRC_LEN
+        return start
+
     def put(self, rxstr, length=0):
         if length == 0:
             length = len(rxstr)
         if len(rxstr) < length:
             logger.error('len(rxstr) < length')
 
-        for i in range(length):
-            rxch = bytes([rxstr[i]])
-            # print_hex(self.DB_FLG, rxch, 1)
-            # print('state:%d' % (self.rxstate))
-            if UX2HEX_RXSTART_FROMID == self.rxstate:
-                if self.toid == rxch[0] or 255 == self.toid:
-                    self.rxbuf = rxch
-                    self.rxstate = UX2HEX_RXSTART_TOID
-
-            elif UX2HEX_RXSTART_TOID == self.rxstate:
-                if self.fromid == rxch[0] or self.fromid == 0xFF:
-                    self.rxbuf += rxch
-                    self.rxstate = UX2HEX_RXSTATE_LEN
-                else:
-                    self.rxstate = UX2HEX_RXSTART_FROMID
-
-            elif UX2HEX_RXSTATE_LEN == self.rxstate:
-                if rxch[0] < UX2HEX_RXLEN_MAX:
-                    self.rxbuf += rxch
-                    self.len = rxch[0]
-                    self.data_idx = 0
-                    self.rxstate = UX2HEX_RXSTATE_DATA
-                else:
-                    self.rxstate = UX2HEX_RXSTART_FROMID
-
-            elif UX2HEX_RXSTATE_DATA == self.rxstate:
-                if self.data_idx < self.len:
-                    self.rxbuf += rxch
-                    self.data_idx += 1
-                    if self.data_idx == self.len:
-                        self.rxstate = UX2HEX_RXSTATE_CRC1
-                else:
-                    self.rxstate = UX2HEX_RXSTART_FROMID
-
-            elif UX2HEX_RXSTATE_CRC1 == self.rxstate:
-                self.rxbuf += rxch
-                self.rxstate = UX2HEX_RXSTATE_CRC2
-
-            elif UX2HEX_RXSTATE_CRC2 == self.rxstate:
-                self.rxbuf += rxch
-                self.rxstate = UX2HEX_RXSTART_FROMID
-                crc = crc16.crc_modbus(self.rxbuf[:self.len + 3])
-                if crc[0] == self.rxbuf[self.len + 3] and crc[1] == self.rxbuf[self.len + 4]:
-                    if self.rx_que.full():
-                        self.rx_que.get()
-                    self.rx_que.put(self.rxbuf)
-                    # print(self.rxbuf)
-
+        buf = self.rxbuf
+        buf += rxstr[:length] if length < len(rxstr) else rxstr
+        view = memoryview(buf)
+        try:
+            consumed = self._scan(buf, view)
+        finally:
+            view.release()
+        if consumed:
+            del buf[:consumed]
@@ -145,6 +145,19 @@ class XCONF(object):
         TCP_REPORT_REAL_BUF_SIZE = 87
         TCP_REPORT_NORMAL_BUF_SIZE = 133
         TCP_REPORT_RICH_BUF_SIZE = 233
+        TCP_REPORT_FRAMER_CAPACITY = 8192
+        TCP_CONTROL_FRAMER_CAPACITY = 8192
+        TCP_TX_COALESCE_MAX_FRAMES = 64  # the gathered frames are written once there are so many
+        TCP_TX_COALESCE_MAX_BYTES = 16384
+        # socket options of the profiles (the unsupported options are skipped), rcvbuf/sndbuf are bytes, busy_poll is us
+        SOCKET_PROFILES = {
+            'default': {},
+            'lowlatency': {'nodelay': True, 'quickack': True, 'busy_poll': 50, 'rcvbuf': 65536, 'sndbuf': 65536},
+        }
+        # the delay (seconds) before the n-th reconnect is min(MIN * 2^n, MAX), +/- JITTER of it
+        RECONNECT_DELAY_MIN = 0.5
+        RECONNECT_DELAY_MAX = 10
+        RECONNECT_JITTER = 0.2
 
     class UxbusReg:
         GET_VERSION = 1
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2019, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+"""
+Precompiled struct codecs of the register payloads and the report frames
+fp32 values are little-endian, u16/u32/i32 values are big-endian
+"""
+
+import struct
+
+FP32 = struct.Struct('<f')
+U16 = struct.Struct('>H')
+U32 = struct.Struct('>I')
+I32 = struct.Struct('>i')
+
+_FP32S = {}
+_U16S = {}
+
+
+def fp32s_struct(n):
+    st = _FP32S.get(n)
+    if st is None:
+        st = _FP32S[n] = struct.Struct('<{}f'.format(n))
+    return st
+
+
+def u16s_struct(n):
+    st = _U16S.get(n)
+    if st is None:
+        st = _U16S[n] = struct.Struct('>{}H'.format(n))
+    return st
+
+
+# the sizes used by the registers (joints, pose, move_line, move_joint, move_circle) and the reports
+for _n in (1, 2, 3, 4, 5, 6, 7, 9, 10, 16):
+    fp32s_struct(_n)
+u16s_struct(1)
+u16s_struct(8)
+
+
+def _buffer(data):
+    # the payload of send_pend is a list of ints
+    return bytes(data) if isinstance(data, list) else data
+
+
+def pack_fp32s(values, n):
+    return fp32s_struct(n).pack(*values[:n])
+
+
+def pack_fp32s_into(buf, offset, values, n):
+    fp32s_struct(n).pack_into(buf, offset, *values[:n])
+    return offset + n * 4
+
+
+def unpack_fp32s(data, n, offset=0):
+    return list(fp32s_struct(n).unpack_from(_buffer(data), offset))
+
+
+def unpack_u16s(data, n, offset=0):
+    return list(u16s_struct(n).unpack_from(_buffer(data), offset))
+
+
+def unpack_fp32(data, offset=0):
+    return FP32.unpack_from(_buffer(data), offset)[0]
+
+
+def unpack_u16(data, offset=0):
+    return U16.unpack_from(_buffer(data), offset)[0]
+
+
+def unpack_u32(data, offset=0):
+    return U32.unpack_from(_buffer(data), offset)[0]
+
+
+def unpack_i32(data, offset=0):
+    return I32.unpack_from(_buffer(data), offset)[0]
@@ -8,41 +8,28 @@
 #                       <jimy92@163.com>
 #
 
-import struct
+from . import codec
 
 
 def fp32_to_bytes(data):
-    return bytes(struct.pack("f", data))
+    return codec.FP32.pack(data)
 
 
 def bytes_to_fp32(data):
-    byte = bytes([data[0]])
-    byte += bytes([data[1]])
-    byte += bytes([data[2]])
-    byte += bytes([data[3]])
-    ret = struct.unpack("f", byte)
-    return ret[0]
+    return codec.unpack_fp32(data)
 
 
 def fp32s_to_bytes(data, n):
     assert n > 0
-    ret = fp32_to_bytes(data[0])
-    for i in range(1, n):
-        ret += fp32_to_bytes(data[i])
-    return ret
+    return codec.pack_fp32s(data, n)
 
 
 def bytes_to_fp32s(data, n):
-    ret = [0] * n
-    for i in range(n):
-        ret[i] = bytes_to_fp32(data[i * 4:i * 4 + 4])
-    return ret
+    return codec.unpack_fp32s(data, n)
 
 
 def u16_to_bytes(data):
-    bts = bytes([data // 256 % 256])
-    bts += bytes([data % 256])
-    return bts
+    return codec.U16.pack(data % 65536)
 
 
 def bytes_to_u16(data):
@@ -51,10 +38,7 @@ def bytes_to_u16(data):
 
 
 def bytes_to_u16s(data, n):
-    ret = [0] * n
-    for i in range(n):
-        ret[i] = bytes_to_u16(data[i * 2: i * 2 + 2])
-    return ret
+    return codec.unpack_u16s(data, n)
 
 
 def bytes_to_u32(data):
@@ -63,9 +47,4 @@ def bytes_to_u32(data):
 
 
 def bytes_to_long_big(data):
-    byte = bytes([data[0]])
-    byte += bytes([data[1]])
-    byte += bytes([data[2]])
-    byte += bytes([data[3]])
-    ret = struct.unpack(">l", byte)
-    return ret[0]
+    return codec.unpack_i32(data)
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2019, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+
+class LatencyHistogram(object):
+    """
+    Histogram of latencies with log2 buckets of microseconds,
+    bucket i counts the latencies in [2^(i-1), 2^i) us (bucket 0: < 1us, the last bucket: the rest)
+    """
+    BUCKETS = 25  # up to 2^24 us (about 16.8s)
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, seconds):
+        index = int(seconds * 1000000).bit_length()
+        self.counts[index if index < self.BUCKETS else self.BUCKETS - 1] += 1
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if self.max is None or seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, percent):
+        """
+        :return: the upper bound (seconds) of the bucket which contains the percentile, None if there is no record
+        """
+        if not self.count:
+            return None
+        target = self.count * percent / 100.0
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= target and count:
+                if index == self.BUCKETS - 1:
+                    # the last bucket has no upper bound
+                    return self.max
+                return min((1 << index) / 1000000.0, self.max)
+        return self.max
+
+    def stats(self):
+        return {
+            'count': self.count,
+            'min': self.min,
+            'max': self.max,
+            'mean': self.total / self.count if self.count else None,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'buckets': {(1 << index): count for index, count in enumerate(self.counts) if count},
+        }
+
+
+class LatencyStats(object):
+    """
+    Latency histograms by key (such as the funcode), recorded by one thread
+    """
+    def __init__(self):
+        self._histograms = {}
+
+    def record(self, key, seconds):
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = LatencyHistogram()
+        histogram.record(seconds)
+
+    def get(self, key=None):
+        """
+        :param key: None: all the keys
+        :return: {key: stats} or the stats of the key (None if there is no record)
+        """
+        if key is not None:
+            histogram = self._histograms.get(key)
+            return histogram.stats() if histogram else None
+        return {k: h.stats() for k, h in list(self._histograms.items())}
+
+    def reset(self):
+        self._histograms = {}
@@ -8,10 +8,13 @@
 # Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
 
 
+import time
 import threading
 import functools
-from ..utils import convert
+from ..utils import codec
+from ..utils.histogram import LatencyStats
 from ..config.x_config import XCONF
+from .uxbus_reg import REGISTERS
 
 
 def lock_require(func):
@@ -22,6 +25,43 @@ def lock_require(func):
     return decorator
 
 
+class UxbusPend(object):
+    """
+    A sent request waiting for its response, set by the receive thread
+    """
+    def __init__(self, funcode, bus_flag=0, timeout=XCONF.UxbusConf.GET_TIMEOUT):
+        self.funcode = funcode
+        self.bus_flag = bus_flag
+        self.deadline = time.monotonic() + timeout / 1000.0
+        self.sent = time.perf_counter()
+        self.data = None
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+
+    @property
+    def done(self):
+        return self._event.is_set()
+
+    def add_done_callback(self, callback):
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def set(self, data):
+        with self._lock:
+            self.data = data
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(self)
+
+    def wait(self, timeout):
+        return self._event.wait(timeout)
+
+
 class UxbusCmd(object):
     def __init__(self):
         self._has_error = False
@@ -30,22 +70,83 @@ class UxbusCmd(object):
         self._warn_code = 0
         self._cmd_num = 0
         self.lock = threading.Lock()
+        self._pend = None
+        # the responses which match no waiting request (late responses of the timed out requests)
+        self.stale_count = 0
+        # round-trip time (request sent -> response received) histograms by funcode
+        self.rtt_stats = LatencyStats()
+        self._tx_buf = bytearray(128)
+        self._tx_view = memoryview(self._tx_buf)
 
     def check_xbus_prot(self, data, funcode):
         raise NotImplementedError
 
-    def send_pend(self, funcode, num, timeout):
+    def send_xbus(self, funcode, txdata, num, timeout=XCONF.UxbusConf.GET_TIMEOUT):
+        """
+        Send a request, timeout (ms) is the deadline of its response
+        """
         raise NotImplementedError
 
-    def send_xbus(self, funcode, txdata, num):
+    def _tx_frame(self, size, header_size, txdata, num):
+        """
+        The request frame is built in the reusable buffer of the connection (the requests are sent under self.lock),
+        the payload is copied after the header
+        :return: (buffer, memoryview of the frame)
+        """
+        if size > len(self._tx_buf):
+            self._tx_buf = bytearray(size * 2)
+            self._tx_view = memoryview(self._tx_buf)
+        view = self._tx_view[:size]
+        if num:
+            payload = txdata[:num]
+            if not isinstance(payload, (bytes, bytearray, memoryview)):
+                payload = bytes(payload)
+            view[header_size:header_size + num] = payload
+        return self._tx_buf, view
+
+    def send_pend_raw(self, funcode, num, timeout):
+        """
+        Wait for the response of the last request
+        :return: (code, payload), payload is num bytes (zeros if there is no valid response)
+        """
         raise NotImplementedError
 
+    def send_pend(self, funcode, num, timeout):
+        code, payload = self.send_pend_raw(funcode, num, timeout)
+        return [code] + list(payload)
+
+    def set_pend(self, funcode, timeout):
+        return self.send_pend(funcode, 0, timeout)
+
+    def set_pipeline_depth(self, depth):
+        pass
+
+    def wait_pipeline(self, timeout=None):
+        return 0
+
+    @lock_require
+    def _exec(self, spec, values):
+        ret = self.send_xbus(spec.reg, spec.encode(values), spec.tx_size, spec.timeout)
+        if ret != 0:
+            return [XCONF.UxbusState.ERR_NOTTCP] * (spec.rx_count + 1)
+        if spec.is_set:
+            return self.set_pend(spec.reg, spec.timeout)
+        code, payload = self.send_pend_raw(spec.reg, spec.rx_size, spec.timeout)
+        return [code] + spec.decode(payload)
+
+    def exec_reg(self, reg, *values):
+        """
+        Execute the register declared in uxbus_reg.REGISTERS with the flat values of its request
+        :return: [code, values of the response]
+        """
+        return self._exec(REGISTERS[reg], values)
+
     @lock_require
     def set_nu8(self, funcode, datas, num):
-        ret = self.send_xbus(funcode, datas, num)
+        ret = self.send_xbus(funcode, datas, num, XCONF.UxbusConf.SET_TIMEOUT)
         if ret != 0:
             return [XCONF.UxbusState.ERR_NOTTCP]
-        return self.send_pend(funcode, 0, XCONF.UxbusConf.SET_TIMEOUT)
+        return self.set_pend(funcode, XCONF.UxbusConf.SET_TIMEOUT)
 
     @lock_require
     def get_nu8(self, funcode, num):
@@ -56,38 +157,32 @@ class UxbusCmd(object):
 
     @lock_require
     def set_nfp32(self, funcode, datas, num):
-        hexdata = convert.fp32s_to_bytes(datas, num)
-        ret = self.send_xbus(funcode, hexdata, num * 4)
+        hexdata = codec.pack_fp32s(datas, num)
+        ret = self.send_xbus(funcode, hexdata, num * 4, XCONF.UxbusConf.SET_TIMEOUT)
         if ret != 0:
             return [XCONF.UxbusState.ERR_NOTTCP]
-        return self.send_pend(funcode, 0, XCONF.UxbusConf.SET_TIMEOUT)
+        return self.set_pend(funcode, XCONF.UxbusConf.SET_TIMEOUT)
 
     @lock_require
     def get_nfp32(self, funcode, num):
         ret = self.send_xbus(funcode, 0, 0)
         if ret != 0:
             return [XCONF.UxbusState.ERR_NOTTCP] * (num * 4 + 1)
-        ret = self.send_pend(funcode, num * 4, XCONF.UxbusConf.GET_TIMEOUT)
-        data = [0] * (1 + num)
-        data[0] = ret[0]
-        data[1:num] = convert.bytes_to_fp32s(ret[1:num * 4 + 1], num)
-        return data
+        code, payload = self.send_pend_raw(funcode, num * 4, XCONF.UxbusConf.GET_TIMEOUT)
+        return [code] + codec.unpack_fp32s(payload, num)
 
     @lock_require
     def swop_nfp32(self, funcode, datas, txn, rxn):
-        hexdata = convert.fp32s_to_bytes(datas, txn)
+        hexdata = codec.pack_fp32s(datas, txn)
         ret = self.send_xbus(funcode, hexdata, txn * 4)
         if ret != 0:
             return [XCONF.UxbusState.ERR_NOTTCP] * (rxn + 1)
-        ret = self.send_pend(funcode, rxn * 4, XCONF.UxbusConf.GET_TIMEOUT)
-        data = [0] * (1 + rxn)
-        data[0] = ret[0]
-        data[1:rxn] = convert.bytes_to_fp32s(ret[1:rxn * 4 + 1], rxn)
-        return data
+        code, payload = self.send_pend_raw(funcode, rxn * 4, XCONF.UxbusConf.GET_TIMEOUT)
+        return [code] + codec.unpack_fp32s(payload, rxn)
 
     @lock_require
     def is_nfp32(self, funcode, datas, txn):
-        hexdata = convert.fp32s_to_bytes(datas, txn)
+        hexdata = codec.pack_fp32s(datas, txn)
         ret = self.send_xbus(funcode, hexdata, txn * 4)
         if ret != 0:
             return [XCONF.UxbusState.ERR_NOTTCP] * 2
@@ -98,190 +193,125 @@ class UxbusCmd(object):
         ret = self.send_xbus(funcode, 0, 0)
         if ret != 0:
             return [XCONF.UxbusState.ERR_NOTTCP] * (num * 2 + 1)
-        ret = self.send_pend(funcode, num * 2, XCONF.UxbusConf.GET_TIMEOUT)
-        data = [0] * (1 + num)
-        data[0] = ret[0]
-        data[1:num] = convert.bytes_to_u16s(ret[1:num * 2 + 1], num)
-        return data
+        code, payload = self.send_pend_raw(funcode, num * 2, XCONF.UxbusConf.GET_TIMEOUT)
+        return [code] + codec.unpack_u16s(payload, num)
 
     def get_version(self):
-        return self.get_nu8(XCONF.UxbusReg.GET_VERSION, 40)
+        return self.exec_reg(XCONF.UxbusReg.GET_VERSION)
 
     def shutdown_system(self, value):
-        txdata = [value]
-        return self.set_nu8(XCONF.UxbusReg.SHUTDOWN_SYSTEM, txdata, 1)
+        return self.exec_reg(XCONF.UxbusReg.SHUTDOWN_SYSTEM, value)
 
     def motion_en(self, axis_id, enable):
-        txdata = [axis_id, int(enable)]
-        return self.set_nu8(XCONF.UxbusReg.MOTION_EN, txdata, 2)
+        return self.exec_reg(XCONF.UxbusReg.MOTION_EN, axis_id, int(enable))
 
     def set_state(self, value):
-        txdata = [value]
-        return self.set_nu8(XCONF.UxbusReg.SET_STATE, txdata, 1)
+        return self.exec_reg(XCONF.UxbusReg.SET_STATE, value)
 
     def get_state(self):
-        return self.get_nu8(XCONF.UxbusReg.GET_STATE, 1)
+        return self.exec_reg(XCONF.UxbusReg.GET_STATE)
 
     def get_cmdnum(self):
-        return self.get_nu16(XCONF.UxbusReg.GET_CMDNUM, 1)
+        return self.exec_reg(XCONF.UxbusReg.GET_CMDNUM)
 
     def get_err_code(self):
-        return self.get_nu8(XCONF.UxbusReg.GET_ERROR, 2)
+        return self.exec_reg(XCONF.UxbusReg.GET_ERROR)
 
     def clean_err(self):
-        return self.set_nu8(XCONF.UxbusReg.CLEAN_ERR, 0, 0)
+        return self.exec_reg(XCONF.UxbusReg.CLEAN_ERR)
 
     def clean_war(self):
-        return self.set_nu8(XCONF.UxbusReg.CLEAN_WAR, 0, 0)
+        return self.exec_reg(XCONF.UxbusReg.CLEAN_WAR)
 
     def set_brake(self, axis_id, enable):
-        txdata = [axis_id, int(enable)]
-        return self.set_nu8(XCONF.UxbusReg.SET_BRAKE, txdata, 2)
+        return self.exec_reg(XCONF.UxbusReg.SET_BRAKE, axis_id, int(enable))
 
     def set_mode(self, mode):
-        txdata = [mode]
-        return self.set_nu8(XCONF.UxbusReg.SET_MODE, txdata, 1)
+        return self.exec_reg(XCONF.UxbusReg.SET_MODE, mode)
 
     def move_line(self, mvpose, mvvelo, mvacc, mvtime):
-        txdata = [mvpose[i] for i in range(6)]
-        txdata += [mvvelo, mvacc, mvtime]
-        return self.set_nfp32(XCONF.UxbusReg.MOVE_LINE, txdata, 9)
+        return self.exec_reg(XCONF.UxbusReg.MOVE_LINE, *mvpose[:6], mvvelo, mvacc, mvtime)
 
     def move_lineb(self, mvpose, mvvelo, mvacc, mvtime, mvradii):
-        txdata = [mvpose[i] for i in range(6)]
-        txdata += [mvvelo, mvacc, mvtime, mvradii]
-        return self.set_nfp32(XCONF.UxbusReg.MOVE_LINEB, txdata, 10)
+        return self.exec_reg(XCONF.UxbusReg.MOVE_LINEB, *mvpose[:6], mvvelo, mvacc, mvtime, mvradii)
 
     def move_joint(self, mvjoint, mvvelo, mvacc, mvtime):
-        txdata = [mvjoint[i] for i in range(7)]
-        txdata += [mvvelo, mvacc, mvtime]
-        return self.set_nfp32(XCONF.UxbusReg.MOVE_JOINT, txdata, 10)
+        return self.exec_reg(XCONF.UxbusReg.MOVE_JOINT, *mvjoint[:7], mvvelo, mvacc, mvtime)
 
     def move_gohome(self, mvvelo, mvacc, mvtime):
-        txdata = [mvvelo, mvacc, mvtime]
-        return self.set_nfp32(XCONF.UxbusReg.MOVE_HOME, txdata, 3)
+        return self.exec_reg(XCONF.UxbusReg.MOVE_HOME, mvvelo, mvacc, mvtime)
 
     def move_servoj(self, mvjoint, mvvelo, mvacc, mvtime):
-        txdata = [mvjoint[i] for i in range(7)]
-        txdata += [mvvelo, mvacc, mvtime]
-        return self.set_nfp32(XCONF.UxbusReg.MOVE_SERVOJ, txdata, 10)
+        return self.exec_reg(XCONF.UxbusReg.MOVE_SERVOJ, *mvjoint[:7], mvvelo, mvacc, mvtime)
 
     def sleep_instruction(self, sltime):
-        txdata = [sltime]
-        return self.set_nfp32(XCONF.UxbusReg.SLEEP_INSTT, txdata, 1)
+        return self.exec_reg(XCONF.UxbusReg.SLEEP_INSTT, sltime)
 
     def move_circle(self, pose1, pose2, mvvelo, mvacc, mvtime, percent):
-        txdata = [0] * 16
-        for i in range(6):
-            txdata[i] = pose1[i]
-            txdata[6 + i] = pose2[i]
-        txdata[12] = mvvelo
-        txdata[13] = mvacc
-        txdata[14] = mvtime
-        txdata[15] = percent
-        ret = self.set_nfp32(XCONF.UxbusReg.MOVE_CIRCLE, txdata, 16)
-        return ret
+        return self.exec_reg(XCONF.UxbusReg.MOVE_CIRCLE, *pose1[:6], *pose2[:6], mvvelo, mvacc, mvtime, percent)
 
     def set_tcp_jerk(self, jerk):
-        txdata = [jerk]
-        return self.set_nfp32(XCONF.UxbusReg.SET_TCP_JERK, txdata, 1)
+        return self.exec_reg(XCONF.UxbusReg.SET_TCP_JERK, jerk)
 
     def set_tcp_maxacc(self, acc):
-        txdata = [acc]
-        return self.set_nfp32(XCONF.UxbusReg.SET_TCP_MAXACC, txdata, 1)
+        return self.exec_reg(XCONF.UxbusReg.SET_TCP_MAXACC, acc)
 
     def set_joint_jerk(self, jerk):
-        txdata = [jerk]
-        return self.set_nfp32(XCONF.UxbusReg.SET_JOINT_JERK, txdata, 1)
+        return self.exec_reg(XCONF.UxbusReg.SET_JOINT_JERK, jerk)
 
     def set_joint_maxacc(self, acc):
-        txdata = [acc]
-        return self.set_nfp32(XCONF.UxbusReg.SET_JOINT_MAXACC, txdata, 1)
+        return self.exec_reg(XCONF.UxbusReg.SET_JOINT_MAXACC, acc)
 
     def set_tcp_offset(self, pose_offset):
-        return self.set_nfp32(XCONF.UxbusReg.SET_TCP_OFFSET, pose_offset, 6)
+        return self.exec_reg(XCONF.UxbusReg.SET_TCP_OFFSET, *pose_offset[:6])
 
     def set_tcp_load(self, load_mass, load_com):
-        param_list = [load_mass]
-        param_list.extend(load_com)
-        return self.set_nfp32(XCONF.UxbusReg.SET_LOAD_PARAM, param_list, 4)
+        return self.exec_reg(XCONF.UxbusReg.SET_LOAD_PARAM, load_mass, *load_com[:3])
 
     def set_collis_sens(self, value):
-        txdata = [value]
-        return self.set_nu8(XCONF.UxbusReg.SET_COLLIS_SENS, txdata, 1)
+        return self.exec_reg(XCONF.UxbusReg.SET_COLLIS_SENS, value)
 
     def set_teach_sens(self, value):
-        txdata = [value]
-        return self.set_nu8(XCONF.UxbusReg.SET_TEACH_SENS, txdata, 1)
+        return self.exec_reg(XCONF.UxbusReg.SET_TEACH_SENS, value)
 
     def set_gravity_dir(self, gravity_dir):
-        return self.set_nfp32(XCONF.UxbusReg.SET_GRAVITY_DIR, gravity_dir, 3)
+        return self.exec_reg(XCONF.UxbusReg.SET_GRAVITY_DIR, *gravity_dir[:3])
 
     def clean_conf(self):
-        return self.set_nu8(XCONF.UxbusReg.CLEAN_CONF, 0, 0)
+        return self.exec_reg(XCONF.UxbusReg.CLEAN_CONF)
 
     def save_conf(self):
-        return self.set_nu8(XCONF.UxbusReg.SAVE_CONF, 0, 0)
+        return self.exec_reg(XCONF.UxbusReg.SAVE_CONF)
 
     def get_joint_pos(self):
-        return self.get_nfp32(XCONF.UxbusReg.GET_JOINT_POS, 7)
+        return self.exec_reg(XCONF.UxbusReg.GET_JOINT_POS)
 
     def get_tcp_pose(self):
-        return self.get_nfp32(XCONF.UxbusReg.GET_TCP_POSE, 6)
+        return self.exec_reg(XCONF.UxbusReg.GET_TCP_POSE)
 
     def get_ik(self, pose):
-        return self.swop_nfp32(XCONF.UxbusReg.GET_IK, pose, 6, 7)
+        return self.exec_reg(XCONF.UxbusReg.GET_IK, *pose[:6])
 
     def get_fk(self, angles):
-        return self.swop_nfp32(XCONF.UxbusReg.GET_FK, angles, 7, 6)
+        return self.exec_reg(XCONF.UxbusReg.GET_FK, *angles[:7])
 
     def is_joint_limit(self, joint):
-        return self.is_nfp32(XCONF.UxbusReg.IS_JOINT_LIMIT, joint, 7)
+        return self.exec_reg(XCONF.UxbusReg.IS_JOINT_LIMIT, *joint[:7])
 
     def is_tcp_limit(self, pose):
-        return self.is_nfp32(XCONF.UxbusReg.IS_TCP_LIMIT, pose, 6)
+        return self.exec_reg(XCONF.UxbusReg.IS_TCP_LIMIT, *pose[:6])
 
     def gripper_addr_w16(self, addr, value):
-        txdata = bytes([XCONF.GRIPPER_ID])
-        txdata += convert.u16_to_bytes(addr)
-        txdata += convert.fp32_to_bytes(value)
-        ret = self.send_xbus(XCONF.UxbusReg.GRIPP_W16B, txdata, 7)
-        if ret != 0:
-            return [XCONF.UxbusState.ERR_NOTTCP] * (7 + 1)
-
-        ret = self.send_pend(XCONF.UxbusReg.GRIPP_W16B, 0, XCONF.UxbusConf.GET_TIMEOUT)
-        return ret
+        return self.exec_reg(XCONF.UxbusReg.GRIPP_W16B, XCONF.GRIPPER_ID, addr, value)
 
     def gripper_addr_r16(self, addr):
-        txdata = bytes([XCONF.GRIPPER_ID])
-        txdata += convert.u16_to_bytes(addr)
-        ret = self.send_xbus(XCONF.UxbusReg.GRIPP_R16B, txdata, 3)
-        if ret != 0:
-            return [XCONF.UxbusState.ERR_NOTTCP] * (7 + 1)
-
-        ret = self.send_pend(XCONF.UxbusReg.GRIPP_R16B, 4, XCONF.UxbusConf.GET_TIMEOUT)
-        return [ret[0], convert.bytes_to_long_big(ret[1:5])]
+        return self.exec_reg(XCONF.UxbusReg.GRIPP_R16B, XCONF.GRIPPER_ID, addr)
 
     def gripper_addr_w32(self, addr, value):
-        txdata = bytes([XCONF.GRIPPER_ID])
-        txdata += convert.u16_to_bytes(addr)
-        txdata += convert.fp32_to_bytes(value)
-        ret = self.send_xbus(XCONF.UxbusReg.GRIPP_W32B, txdata, 7)
-        if ret != 0:
-            return [XCONF.UxbusState.ERR_NOTTCP] * (7 + 1)
-
-        ret = self.send_pend(XCONF.UxbusReg.GRIPP_W32B, 0, XCONF.UxbusConf.GET_TIMEOUT)
-        return ret
+        return self.exec_reg(XCONF.UxbusReg.GRIPP_W32B, XCONF.GRIPPER_ID, addr, value)
 
     def gripper_addr_r32(self, addr):
-        txdata = bytes([XCONF.GRIPPER_ID])
-        txdata += convert.u16_to_bytes(addr)
-        ret = self.send_xbus(XCONF.UxbusReg.GRIPP_R32B, txdata, 3)
-        if ret != 0:
-            return [XCONF.UxbusState.ERR_NOTTCP] * (7 + 1)
-
-        ret = self.send_pend(XCONF.UxbusReg.GRIPP_R32B, 4, XCONF.UxbusConf.GET_TIMEOUT)
-        return [ret[0], convert.bytes_to_long_big(ret[1:5])]
+        return self.exec_reg(XCONF.UxbusReg.GRIPP_R32B, XCONF.GRIPPER_ID, addr)
 
     def gripper_set_en(self, value):
         return self.gripper_addr_w16(XCONF.ServoConf.CON_EN, value)
@@ -302,59 +332,22 @@ class UxbusCmd(object):
         return self.gripper_addr_w16(XCONF.ServoConf.POS_SPD, speed)
 
     def gripper_get_errcode(self):
-        ret = self.get_nu8(XCONF.UxbusReg.GPGET_ERR, 2)
-        return ret
+        return self.exec_reg(XCONF.UxbusReg.GPGET_ERR)
 
     def gripper_clean_err(self):
         return self.gripper_addr_w16(XCONF.ServoConf.RESET_ERR, 1)
 
     def gpio_addr_w16(self, addr, value):
-        txdata = bytes([XCONF.GPIO_ID])
-        txdata += convert.u16_to_bytes(addr)
-        txdata += convert.fp32_to_bytes(value)
-        ret = self.send_xbus(XCONF.UxbusReg.GRIPP_W16B, txdata, 7)
-        if ret != 0:
-            return [XCONF.UxbusState.ERR_NOTTCP] * (7 + 1)
-
-        ret = self.send_pend(XCONF.UxbusReg.GRIPP_W16B, 0, XCONF.UxbusConf.GET_TIMEOUT)
-        return ret
+        return self.exec_reg(XCONF.UxbusReg.GRIPP_W16B, XCONF.GPIO_ID, addr, value)
 
     def gpio_addr_r16(self, addr):
-        txdata = bytes([XCONF.GPIO_ID])
-        txdata += convert.u16_to_bytes(addr)
-        ret = self.send_xbus(XCONF.UxbusReg.GRIPP_R16B, txdata, 3)
-        if ret != 0:
-            return [XCONF.UxbusState.ERR_NOTTCP] * (7 + 1)
-
-        ret = self.send_pend(XCONF.UxbusReg.GRIPP_R16B, 4, XCONF.UxbusConf.GET_TIMEOUT)
-        ret1 = [0] * 2
-        ret1[0] = ret[0]
-        ret1[1] = convert.bytes_to_long_big(ret[1:5])
-        return ret1
+        return self.exec_reg(XCONF.UxbusReg.GRIPP_R16B, XCONF.GPIO_ID, addr)
 
     def gpio_addr_w32(self, addr, value):
-        txdata = bytes([XCONF.GPIO_ID])
-        txdata += convert.u16_to_bytes(addr)
-        txdata += convert.fp32_to_bytes(value)
-        ret = self.send_xbus(XCONF.UxbusReg.GRIPP_W32B, txdata, 7)
-        if ret != 0:
-            return [XCONF.UxbusState.ERR_NOTTCP] * (7 + 1)
-
-        ret = self.send_pend(XCONF.UxbusReg.GRIPP_W32B, 0, XCONF.UxbusConf.GET_TIMEOUT)
-        return ret
+        return self.exec_reg(XCONF.UxbusReg.GRIPP_W32B, XCONF.GPIO_ID, addr, value)
 
     def gpio_addr_r32(self, addr):
-        txdata = bytes([XCONF.GPIO_ID])
-        txdata += convert.u16_to_bytes(addr)
-        ret = self.send_xbus(XCONF.UxbusReg.GRIPP_R32B, txdata, 3)
-        if ret != 0:
-            return [XCONF.UxbusState.ERR_NOTTCP] * (7 + 1)
-
-        ret = self.send_pend(XCONF.UxbusReg.GRIPP_R32B, 4, XCONF.UxbusConf.GET_TIMEOUT)
-        ret1 = [0] * 2
-        ret1[0] = ret[0]
-        ret1[1] = convert.bytes_to_long_big(ret[1:5])
-        return ret1
+        return self.exec_reg(XCONF.UxbusReg.GRIPP_R32B, XCONF.GPIO_ID, addr)
 
     def gpio_get_digital(self):
         ret = self.gpio_addr_r16(XCONF.ServoConf.DIGITAL_IN)
@@ -393,55 +386,19 @@ class UxbusCmd(object):
         return value
 
     def servo_set_zero(self, axis_id):
-        txdata = [int(axis_id)]
-        ret = self.set_nu8(XCONF.UxbusReg.SERVO_ZERO, txdata, 1)
-        return ret
+        return self.exec_reg(XCONF.UxbusReg.SERVO_ZERO, int(axis_id))
 
     def servo_get_dbmsg(self):
-        ret = self.get_nu8(XCONF.UxbusReg.SERVO_DBMSG, 16)
-        return ret
+        return self.exec_reg(XCONF.UxbusReg.SERVO_DBMSG)
 
     def servo_addr_w16(self, axis_id, addr, value):
-        txdata = bytes([axis_id])
-        txdata += convert.u16_to_bytes(addr)
-        txdata += convert.fp32_to_bytes(value)
-        ret = self.send_xbus(XCONF.UxbusReg.SERVO_W16B, txdata, 7)
-        if ret != 0:
-            return [XCONF.UxbusState.ERR_NOTTCP] * (7 + 1)
-
-        ret = self.send_pend(XCONF.UxbusReg.SERVO_W16B, 0, XCONF.UxbusConf.GET_TIMEOUT)
-        return ret
+        return self.exec_reg(XCONF.UxbusReg.SERVO_W16B, axis_id, addr, value)
 
     def servo_addr_r16(self, axis_id, addr):
-        txdata = bytes([axis_id])
-        txdata += convert.u16_to_bytes(addr)
-        ret = self.send_xbus(XCONF.UxbusReg.SERVO_R16B, txdata, 3)
-        if ret != 0:
-            return [XCONF.UxbusState.ERR_NOTTCP] * (7 + 1)
-
-        ret = self.send_pend(XCONF.UxbusReg.SERVO_R16B, 4, XCONF.UxbusConf.GET_TIMEOUT)
-        return [ret[0], convert.bytes_to_long_big(ret[1:5])]
-        # return [ret[0], convert.bytes_to_long_big(ret[1:5])[0]]
+        return self.exec_reg(XCONF.UxbusReg.SERVO_R16B, axis_id, addr)
 
     def servo_addr_w32(self, axis_id, addr, value):
-        txdata = bytes([axis_id])
-        txdata += convert.u16_to_bytes(addr)
-        txdata += convert.fp32_to_bytes(value)
-        ret = self.send_xbus(XCONF.UxbusReg.SERVO_W32B, txdata, 7)
-        if ret != 0:
-            return [XCONF.UxbusState.ERR_NOTTCP] * (7 + 1)
-
-        ret = self.send_pend(XCONF.UxbusReg.SERVO_W32B, 0, XCONF.UxbusConf.GET_TIMEOUT)
-        return ret
+        return self.exec_reg(XCONF.UxbusReg.SERVO_W32B, axis_id, addr, value)
 
     def servo_addr_r32(self, axis, addr):
-        txdata = bytes([axis])
-        txdata += convert.u16_to_bytes(addr)
-        ret = self.send_xbus(XCONF.UxbusReg.SERVO_R32B, txdata, 3)
-        if ret != 0:
-            return [XCONF.UxbusState.ERR_NOTTCP] * (7 + 1)
-
-        ret = self.send_pend(XCONF.UxbusReg.SERVO_R32B, 4, XCONF.UxbusConf.GET_TIMEOUT)
-        return [ret[0], convert.bytes_to_long_big(ret[1:5])]
-        # return [ret[0], convert.bytes_to_long_big(ret[1:5])[0]]
-
+        return self.exec_reg(XCONF.UxbusReg.SERVO_R32B, axis, addr)
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2019, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+import time
+import asyncio
+from ..utils import convert, codec
+from ..utils.log import logger
+from .uxbus_cmd import UxbusCmd
+from .uxbus_cmd_tcp import UxbusCmdTcp, TX2_PROT_CON, TX2_BUS_FLAG_MIN
+from ..config.x_config import XCONF
+
+
+class UxbusCmdAio(UxbusCmdTcp):
+    """
+    asyncio version of UxbusCmdTcp over asyncio streams
+    The primitives (set_nu8, get_nfp32, ...) are coroutines, so the encoders of UxbusCmd
+    (move_line, get_joint_pos, ...) return awaitables: `ret = await arm_cmd.move_line(...)`
+    """
+    def __init__(self, reader, writer):
+        UxbusCmd.__init__(self)
+        self.arm_port = None
+        self._reader = reader
+        self._writer = writer
+        self.bus_flag = TX2_BUS_FLAG_MIN
+        self.prot_flag = TX2_PROT_CON
+        self._has_err_warn = False
+        self._pends = {}
+        self._pipeline_depth = 1
+        self._pipeline_window = None
+        self._pipeline_errors = []
+        self._recv_task = None
+        # wire_recorder: records the requests and the responses (see xarm.x3.capture.WireRecorder)
+        self.wire_recorder = None
+        self.connected = True
+        # the stream of AsyncXArm, the end of the stream disconnects at once
+        self.peer_closed = False
+
+    def set_pipeline_depth(self, depth):
+        # the concurrent requests (asyncio.gather) are already outstanding together
+        pass
+
+    async def wait_pipeline(self, timeout=None):
+        return 0
+
+    def start(self):
+        self._recv_task = asyncio.ensure_future(self._recv_loop())
+        return self._recv_task
+
+    async def close(self):
+        self.connected = False
+        self._writer.close()
+        if self._recv_task is not None:
+            self._recv_task.cancel()
+            try:
+                await self._recv_task
+            except asyncio.CancelledError:
+                pass
+            self._recv_task = None
+
+    async def _recv_loop(self):
+        try:
+            while True:
+                header = await self._reader.readexactly(6)
+                body = await self._reader.readexactly(convert.bytes_to_u16(header[4:6]))
+                if self.wire_recorder is not None:
+                    self.wire_recorder.write_response(header + body)
+                if convert.bytes_to_u16(header[2:4]) != TX2_PROT_CON:
+                    continue
+                future = self._pends.pop(convert.bytes_to_u16(header[0:2]), None)
+                if future is not None and not future.done():
+                    future.set_result(header + body)
+                else:
+                    self.stale_count += 1
+        except (asyncio.IncompleteReadError, ConnectionError, OSError) as e:
+            logger.error('main-socket read: {}'.format(e))
+        finally:
+            self.connected = False
+            for future in self._pends.values():
+                if not future.done():
+                    future.set_result(None)
+            self._pends.clear()
+
+    async def request_raw(self, funcode, datas, num, rxn, timeout):
+        """
+        Send one request and wait for its response
+        :return: (code, payload), payload is rxn bytes (zeros if there is no valid response)
+        """
+        if not self.connected:
+            return XCONF.UxbusState.ERR_NOTTCP, bytes(rxn)
+        bus_flag = self.bus_flag
+        send_data = self._pack_frame(funcode, datas, num)
+        self._next_bus_flag()
+        future = asyncio.get_event_loop().create_future()
+        sent = time.perf_counter()
+        self._pends[bus_flag] = future
+        if self.wire_recorder is not None:
+            self.wire_recorder.write_request(send_data)
+        try:
+            # the transport may keep the data, do not pass the reusable tx buffer
+            self._writer.write(bytes(send_data))
+            await self._writer.drain()
+            rx_data = await asyncio.wait_for(future, timeout / 1000.0)
+        except asyncio.TimeoutError:
+            rx_data = None
+        except (ConnectionError, OSError) as e:
+            logger.error('main-socket write: {}'.format(e))
+            return XCONF.UxbusState.ERR_NOTTCP, bytes(rxn)
+        finally:
+            self._pends.pop(bus_flag, None)
+        if rx_data is None:
+            return XCONF.UxbusState.ERR_TOUT, bytes(rxn)
+        self.rtt_stats.record(funcode, time.perf_counter() - sent)
+        code = self.check_xbus_prot(rx_data, funcode, bus_flag)
+        if code not in [0, XCONF.UxbusState.ERR_CODE, XCONF.UxbusState.WAR_CODE]:
+            return code, bytes(rxn)
+        payload = rx_data[8:8 + rxn]
+        if len(payload) < rxn:
+            payload += bytes(rxn - len(payload))
+        return code, payload
+
+    async def request(self, funcode, datas, num, rxn, timeout):
+        """
+        Send one request and wait for its response
+        :return: [code, rxn bytes of the payload]
+        """
+        code, payload = await self.request_raw(funcode, datas, num, rxn, timeout)
+        return [code] + list(payload)
+
+    async def _exec(self, spec, values):
+        code, payload = await self.request_raw(spec.reg, spec.encode(values), spec.tx_size, spec.rx_size, spec.timeout)
+        return [code] + spec.decode(payload)
+
+    async def set_nu8(self, funcode, datas, num):
+        return await self.request(funcode, datas, num, 0, XCONF.UxbusConf.SET_TIMEOUT)
+
+    async def get_nu8(self, funcode, num):
+        return await self.request(funcode, 0, 0, num, XCONF.UxbusConf.GET_TIMEOUT)
+
+    async def set_nfp32(self, funcode, datas, num):
+        hexdata = codec.pack_fp32s(datas, num)
+        return await self.request(funcode, hexdata, num * 4, 0, XCONF.UxbusConf.SET_TIMEOUT)
+
+    async def get_nfp32(self, funcode, num):
+        code, payload = await self.request_raw(funcode, 0, 0, num * 4, XCONF.UxbusConf.GET_TIMEOUT)
+        return [code] + codec.unpack_fp32s(payload, num)
+
+    async def swop_nfp32(self, funcode, datas, txn, rxn):
+        hexdata = codec.pack_fp32s(datas, txn)
+        code, payload = await self.request_raw(funcode, hexdata, txn * 4, rxn * 4, XCONF.UxbusConf.GET_TIMEOUT)
+        return [code] + codec.unpack_fp32s(payload, rxn)
+
+    async def is_nfp32(self, funcode, datas, txn):
+        hexdata = codec.pack_fp32s(datas, txn)
+        return await self.request(funcode, hexdata, txn * 4, 1, XCONF.UxbusConf.GET_TIMEOUT)
+
+    async def get_nu16(self, funcode, num):
+        code, payload = await self.request_raw(funcode, 0, 0, num * 2, XCONF.UxbusConf.GET_TIMEOUT)
+        return [code] + codec.unpack_u16s(payload, num)
+
+    async def gpio_get_digital(self):
+        ret = await self.gpio_addr_r16(XCONF.ServoConf.DIGITAL_IN)
+        return [ret[0], ret[1] & 0x0001, (ret[1] & 0x0002) >> 1]
+
+    async def gpio_set_digital(self, ionum, value):
+        if ionum not in [1, 2]:
+            return [-1, -1]
+        tmp = (0x0100 << (ionum - 1)) | ((0x0001 << (ionum - 1)) if value else 0)
+        return await self.gpio_addr_w16(XCONF.ServoConf.DIGITAL_OUT, tmp)
+
+    async def gpio_get_analog1(self):
+        ret = await self.gpio_addr_r16(XCONF.ServoConf.ANALOG_IO1)
+        return [ret[0], ret[1] * 3.3 / 4096.0]
+
+    async def gpio_get_analog2(self):
+        ret = await self.gpio_addr_r16(XCONF.ServoConf.ANALOG_IO2)
+        return [ret[0], ret[1] * 3.3 / 4096.0]
@@ -9,10 +9,14 @@
 
 
 import time
+import struct
 from ..utils import crc16
-from .uxbus_cmd import UxbusCmd
+from .uxbus_cmd import UxbusCmd, UxbusPend
 from ..config.x_config import XCONF
 
+UX2_HEADER = struct.Struct('BBBB')  # [fromid, toid, length, reg]
+UX2_CRC = struct.Struct('<H')
+
 
 class UxbusCmdSer(UxbusCmd):
     def __init__(self, arm_port, fromid=XCONF.SerialConf.UXBUS_DEF_FROMID, toid=XCONF.SerialConf.UXBUS_DEF_TOID):
@@ -22,6 +26,7 @@ class UxbusCmdSer(UxbusCmd):
         self.toid = toid
         arm_port.flush(fromid, toid)
         self._has_err_warn = False
+        self.arm_port.set_rx_callback(self._handle_response)
 
     @property
     def has_err_warn(self):
@@ -42,25 +47,33 @@ class UxbusCmdSer(UxbusCmd):
             self._has_err_warn = False
             return 0
 
-    def send_pend(self, funcode, num, timeout):
-        ret = [0] * (num + 1)
-        times = int(timeout)
-        ret[0] = XCONF.UxbusState.ERR_TOUT
-        while times > 0:
-            times -= 1
-            rx_data = self.arm_port.read()
-            if rx_data != -1 and len(rx_data) > 5:
-                ret[0] = self.check_xbus_prot(rx_data)
-                for i in range(num):
-                    ret[i + 1] = rx_data[i + 4]
-                return ret
-            time.sleep(0.001)
-        return ret
+    def _handle_response(self, rx_data):
+        # called by the receive thread with every frame (a memoryview of the parser buffer),
+        # the serial protocol answers in order, a frame without a waiting request is stale
+        pend = self._pend
+        if pend is not None and not pend.done and len(rx_data) > 5:
+            self.rtt_stats.record(pend.funcode, time.perf_counter() - pend.sent)
+            pend.set(bytes(rx_data))
+        else:
+            self.stale_count += 1
+
+    def send_pend_raw(self, funcode, num, timeout):
+        pend = self._pend
+        if pend is None or not pend.wait(timeout / 1000.0):
+            # the late response of this request will be counted as stale
+            self._pend = None
+            return XCONF.UxbusState.ERR_TOUT, bytes(num)
+        rx_data = pend.data
+        code = self.check_xbus_prot(rx_data)
+        payload = bytes(rx_data[4:4 + num])
+        if len(payload) < num:
+            payload += bytes(num - len(payload))
+        return code, payload
 
-    def send_xbus(self, reg, txdata, num):
-        send_data = bytes([self.fromid, self.toid, num + 1, reg])
-        for i in range(num):
-            send_data += bytes([txdata[i]])
-        send_data += crc16.crc_modbus(send_data)
-        self.arm_port.flush()
+    def send_xbus(self, reg, txdata, num, timeout=XCONF.UxbusConf.GET_TIMEOUT):
+        size = UX2_HEADER.size + num
+        buf, send_data = self._tx_frame(size + UX2_CRC.size, UX2_HEADER.size, txdata, num)
+        UX2_HEADER.pack_into(buf, 0, self.fromid, self.toid, num + 1, reg)
+        UX2_CRC.pack_into(buf, size, crc16.crc16_update(crc16.CRC16_INIT, send_data[:size]))
+        self._pend = UxbusPend(reg, timeout=timeout)
         return self.arm_port.write(send_data)
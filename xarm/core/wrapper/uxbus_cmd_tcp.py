@@ -9,8 +9,10 @@
 
 
 import time
+import struct
+import threading
 from ..utils import convert
-from .uxbus_cmd import UxbusCmd
+from .uxbus_cmd import UxbusCmd, UxbusPend
 from ..config.x_config import XCONF
 
 
@@ -18,6 +20,7 @@ TX2_PROT_CON = 2  # tcp cmd prot
 TX2_PROT_HEAT = 1  # tcp heat prot
 TX2_BUS_FLAG_MIN = 1  # cmd序号 起始值
 TX2_BUS_FLAG_MAX = 5000  # cmd序号 最大值
+TX2_HEADER = struct.Struct('>HHHB')  # [bus_flag, prot_flag, length, funcode]
 
 
 class UxbusCmdTcp(UxbusCmd):
@@ -27,6 +30,14 @@ class UxbusCmdTcp(UxbusCmd):
         self.bus_flag = TX2_BUS_FLAG_MIN
         self.prot_flag = TX2_PROT_CON
         self._has_err_warn = False
+        self._pends = {}
+        self._pends_lock = threading.Lock()
+        self._pipeline_depth = 1
+        self._pipeline_window = None
+        self._pipeline_errors = []
+        # wire_recorder: records the requests and the responses (see xarm.x3.capture.WireRecorder)
+        self.wire_recorder = None
+        self.arm_port.set_rx_callback(self._handle_response)
 
     @property
     def has_err_warn(self):
@@ -36,18 +47,31 @@ class UxbusCmdTcp(UxbusCmd):
     def has_err_warn(self, value):
         self._has_err_warn = value
 
-    def check_xbus_prot(self, data, funcode):
+    @property
+    def pipeline_depth(self):
+        return self._pipeline_depth
+
+    def set_pipeline_depth(self, depth):
+        """
+        Keep up to depth requests outstanding, the set commands return [0] once sent,
+        their failures are returned by wait_pipeline. Only change it when there is no outstanding request.
+        """
+        self._pipeline_depth = max(1, int(depth))
+        self._pipeline_window = threading.Semaphore(self._pipeline_depth) if self._pipeline_depth > 1 else None
+
+    def check_xbus_prot(self, data, funcode, bus_flag=None):
         num = convert.bytes_to_u16(data[0:2])
         prot = convert.bytes_to_u16(data[2:4])
         length = convert.bytes_to_u16(data[4:6])
         fun = data[6]
         state = data[7]
 
-        bus_flag = self.bus_flag
-        if bus_flag == TX2_BUS_FLAG_MIN:
-            bus_flag = TX2_BUS_FLAG_MAX
-        else:
-            bus_flag -= 1
+        if bus_flag is None:
+            bus_flag = self.bus_flag
+            if bus_flag == TX2_BUS_FLAG_MIN:
+                bus_flag = TX2_BUS_FLAG_MAX
+            else:
+                bus_flag -= 1
         if num != bus_flag:
             return XCONF.UxbusState.ERR_NUM
         if prot != TX2_PROT_CON:
@@ -65,35 +89,127 @@ class UxbusCmdTcp(UxbusCmd):
         self._has_err_warn = False
         return 0
 
-    def send_pend(self, funcode, num, timeout):
-        ret = [0] * (num + 1)
-        times = int(timeout)
-        ret[0] = XCONF.UxbusState.ERR_TOUT
-        while times > 0:
-            times -= 1
-            rx_data = self.arm_port.read()
-            if rx_data != -1 and len(rx_data) > 7:
-                ret[0] = self.check_xbus_prot(rx_data, funcode)
-                if ret[0] in [0, XCONF.UxbusState.ERR_CODE, XCONF.UxbusState.WAR_CODE]:
-                    for i in range(num):
-                        ret[i + 1] = rx_data[i + 8]
-                return ret
-            time.sleep(0.001)
-        return ret
-
-    def send_xbus(self, funcode, datas, num):
-        send_data = convert.u16_to_bytes(self.bus_flag)
-        send_data += convert.u16_to_bytes(self.prot_flag)
-        send_data += convert.u16_to_bytes(num + 1)
-        send_data += bytes([funcode])
-        for i in range(num):
-            send_data += bytes([datas[i]])
-
-        self.arm_port.flush()
-        ret = self.arm_port.write(send_data)
-        if ret != 0:
-            return -1
+    def _pop_pend(self, bus_flag):
+        with self._pends_lock:
+            pend = self._pends.pop(bus_flag, None)
+        if pend is not None and self._pipeline_window is not None:
+            self._pipeline_window.release()
+        return pend
+
+    def _expire_pends(self):
+        now = time.monotonic()
+        with self._pends_lock:
+            expired = [pend.bus_flag for pend in self._pends.values() if pend.deadline < now]
+        for bus_flag in expired:
+            pend = self._pop_pend(bus_flag)
+            if pend is not None:
+                pend.set(None)
+
+    def _handle_response(self, rx_data):
+        # called by the receive thread with every response frame,
+        # the response is routed to its request by the bus_flag and the funcode, the others are stale
+        if self.wire_recorder is not None:
+            self.wire_recorder.write_response(rx_data)
+        if len(rx_data) < 8 or convert.bytes_to_u16(rx_data[2:4]) != TX2_PROT_CON:
+            return
+        bus_flag = convert.bytes_to_u16(rx_data[0:2])
+        with self._pends_lock:
+            pend = self._pends.get(bus_flag)
+            if pend is None or pend.funcode != rx_data[6]:
+                self.stale_count += 1
+                return
+        self._pop_pend(bus_flag)
+        self.rtt_stats.record(pend.funcode, time.perf_counter() - pend.sent)
+        pend.set(bytes(rx_data))
+
+    def _handle_pipeline_done(self, pend):
+        if pend.data is None:
+            code = XCONF.UxbusState.ERR_TOUT
+        else:
+            code = self.check_xbus_prot(pend.data, pend.funcode, pend.bus_flag)
+        if code not in [0, XCONF.UxbusState.ERR_CODE, XCONF.UxbusState.WAR_CODE]:
+            self._pipeline_errors.append((pend.funcode, code))
+
+    def set_pend(self, funcode, timeout):
+        if self._pipeline_window is None:
+            return self.send_pend(funcode, 0, timeout)
+        self._pend.add_done_callback(self._handle_pipeline_done)
+        return [0]
+
+    def wait_pipeline(self, timeout=None):
+        """
+        Wait for all the outstanding requests, return the first failed code of the pipelined set commands (or 0)
+        """
+        timeout = XCONF.UxbusConf.SET_TIMEOUT / 1000.0 if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        self.arm_port.flush_tx()
+        with self._pends_lock:
+            pends = list(self._pends.values())
+        for pend in pends:
+            # a request without response is expired at its own deadline
+            pend.wait(max(0, min(deadline, pend.deadline) - time.monotonic()))
+            if time.monotonic() >= deadline:
+                break
+        self._expire_pends()
+        errors, self._pipeline_errors = self._pipeline_errors, []
+        return errors[0][1] if errors else 0
+
+    def send_pend_raw(self, funcode, num, timeout):
+        pend = self._pend
+        if pend is None:
+            return XCONF.UxbusState.ERR_TOUT, bytes(num)
+        # the request may be gathered by the port (batch), it must be sent before waiting
+        self.arm_port.flush_tx()
+        if not pend.wait(timeout / 1000.0):
+            self._pop_pend(pend.bus_flag)
+            return XCONF.UxbusState.ERR_TOUT, bytes(num)
+        rx_data = pend.data
+        if rx_data is None:
+            return XCONF.UxbusState.ERR_TOUT, bytes(num)
+        code = self.check_xbus_prot(rx_data, funcode, pend.bus_flag)
+        if code not in [0, XCONF.UxbusState.ERR_CODE, XCONF.UxbusState.WAR_CODE]:
+            return code, bytes(num)
+        payload = rx_data[8:8 + num]
+        if len(payload) < num:
+            payload += bytes(num - len(payload))
+        return code, payload
+
+    def _pack_frame(self, funcode, datas, num):
+        # a memoryview of the reusable tx buffer, only valid until the next request
+        buf, view = self._tx_frame(TX2_HEADER.size + num, TX2_HEADER.size, datas, num)
+        TX2_HEADER.pack_into(buf, 0, self.bus_flag, self.prot_flag, num + 1, funcode)
+        return view
+
+    def _next_bus_flag(self):
         self.bus_flag += 1
         if self.bus_flag > TX2_BUS_FLAG_MAX:
             self.bus_flag = TX2_BUS_FLAG_MIN
+
+    def send_xbus(self, funcode, datas, num, timeout=XCONF.UxbusConf.GET_TIMEOUT):
+        send_data = self._pack_frame(funcode, datas, num)
+
+        if self._pipeline_window is not None:
+            # wait for a free slot, the requests without response are expired by their deadline,
+            # the frames gathered by the port are sent first (their responses free the slots)
+            acquired = self._pipeline_window.acquire(blocking=False)
+            if not acquired:
+                self.arm_port.flush_tx()
+            while not acquired:
+                acquired = self._pipeline_window.acquire(timeout=0.1)
+                if not acquired:
+                    if not self.arm_port.connected:
+                        return -1
+                    self._expire_pends()
+        # the pipelined requests are expired by the deadline of their own timeout
+        self._pend = UxbusPend(funcode, self.bus_flag, timeout)
+        with self._pends_lock:
+            self._pends[self.bus_flag] = self._pend
+        if self.wire_recorder is not None:
+            # before the write, the response may be received before the write returns
+            self.wire_recorder.write_request(send_data)
+        ret = self.arm_port.write(send_data)
+        if ret != 0:
+            self._pop_pend(self.bus_flag)
+            return -1
+        self._next_bus_flag()
         return 0
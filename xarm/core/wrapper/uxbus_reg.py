@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2019, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+"""
+Register schema of the uxbus commands
+Every register declares the layout of its request and response payload, a layout is a struct format
+or a tuple of struct formats (the servo/gripper registers mix big-endian and little-endian fields).
+The encoder and decoder of every register are generated once at import,
+as well as the inverse codecs (decode_request/encode_response) used by the controller simulator.
+"""
+
+import struct
+from ..config.x_config import XCONF
+
+
+class UxbusRegSpec(object):
+    __slots__ = ('reg', 'tx_size', 'rx_size', 'rx_count', 'is_set', 'timeout', 'encode', 'decode',
+                 'decode_request', 'encode_response')
+
+    def __init__(self, reg, request=None, response=None, timeout=None):
+        self.reg = reg
+        self.encode, self.tx_size = self._make_encoder(request)
+        self.decode, self.rx_size, self.rx_count = self._make_decoder(response)
+        self.decode_request = self._make_decoder(request)[0]
+        self.encode_response = self._make_encoder(response)[0]
+        self.is_set = self.rx_size == 0
+        if timeout is None:
+            timeout = XCONF.UxbusConf.SET_TIMEOUT if self.is_set else XCONF.UxbusConf.GET_TIMEOUT
+        self.timeout = timeout
+
+    @staticmethod
+    def _parts(layout):
+        if layout is None:
+            return []
+        if isinstance(layout, str):
+            layout = (layout,)
+        return [struct.Struct(fmt) for fmt in layout]
+
+    def _make_encoder(self, layout):
+        parts = self._parts(layout)
+        if not parts:
+            return (lambda values: b''), 0
+        if len(parts) == 1:
+            st = parts[0]
+
+            def encode(values):
+                return st.pack(*values)
+            return encode, st.size
+
+        size = sum(st.size for st in parts)
+        plan = []
+        offset = 0
+        index = 0
+        for st in parts:
+            count = len(st.unpack(bytes(st.size)))
+            plan.append((st, offset, index, index + count))
+            offset += st.size
+            index += count
+
+        def encode(values):
+            buf = bytearray(size)
+            for st, offset, start, end in plan:
+                st.pack_into(buf, offset, *values[start:end])
+            return buf
+        return encode, size
+
+    def _make_decoder(self, layout):
+        parts = self._parts(layout)
+        if not parts:
+            return (lambda data: []), 0, 0
+        if len(parts) == 1:
+            st = parts[0]
+
+            def decode(data):
+                return list(st.unpack_from(data))
+            return decode, st.size, len(st.unpack(bytes(st.size)))
+
+        plan = []
+        offset = 0
+        for st in parts:
+            plan.append((st, offset))
+            offset += st.size
+
+        def decode(data):
+            values = []
+            for st, offset in plan:
+                values.extend(st.unpack_from(data, offset))
+            return values
+        return decode, offset, len(decode(bytes(offset)))
+
+
+REGISTERS = {}
+
+
+def register(reg, request=None, response=None, timeout=None):
+    """
+    Declare a register, the request/response layouts are struct formats (fp32 '<', u16/i32 '>')
+    """
+    spec = UxbusRegSpec(reg, request=request, response=response, timeout=timeout)
+    REGISTERS[reg] = spec
+    return spec
+
+
+_R = XCONF.UxbusReg
+_ADDR_W = ('>BH', '<f')  # [id(u8), addr(u16), value(fp32)]
+_ADDR_R = '>BH'  # [id(u8), addr(u16)]
+
+register(_R.GET_VERSION, response='40B')
+register(_R.SHUTDOWN_SYSTEM, request='B')
+register(_R.MOTION_EN, request='2B')
+register(_R.SET_STATE, request='B')
+register(_R.GET_STATE, response='B')
+register(_R.GET_CMDNUM, response='>H')
+register(_R.GET_ERROR, response='2B')
+register(_R.CLEAN_ERR)
+register(_R.CLEAN_WAR)
+register(_R.SET_BRAKE, request='2B')
+register(_R.SET_MODE, request='B')
+
+register(_R.MOVE_LINE, request='<9f')
+register(_R.MOVE_LINEB, request='<10f')
+register(_R.MOVE_JOINT, request='<10f')
+register(_R.MOVE_HOME, request='<3f')
+register(_R.SLEEP_INSTT, request='<f')
+register(_R.MOVE_CIRCLE, request='<16f')
+register(_R.MOVE_SERVOJ, request='<10f')
+
+register(_R.SET_TCP_JERK, request='<f')
+register(_R.SET_TCP_MAXACC, request='<f')
+register(_R.SET_JOINT_JERK, request='<f')
+register(_R.SET_JOINT_MAXACC, request='<f')
+register(_R.SET_TCP_OFFSET, request='<6f')
+register(_R.SET_LOAD_PARAM, request='<4f')
+register(_R.SET_COLLIS_SENS, request='B')
+register(_R.SET_TEACH_SENS, request='B')
+register(_R.CLEAN_CONF)
+register(_R.SAVE_CONF)
+
+register(_R.GET_TCP_POSE, response='<6f')
+register(_R.GET_JOINT_POS, response='<7f')
+register(_R.GET_IK, request='<6f', response='<7f')
+register(_R.GET_FK, request='<7f', response='<6f')
+register(_R.IS_JOINT_LIMIT, request='<7f', response='B')
+register(_R.IS_TCP_LIMIT, request='<6f', response='B')
+
+register(_R.SET_GRAVITY_DIR, request='<3f')
+
+register(_R.SERVO_W16B, request=_ADDR_W, timeout=XCONF.UxbusConf.GET_TIMEOUT)
+register(_R.SERVO_R16B, request=_ADDR_R, response='>i')
+register(_R.SERVO_W32B, request=_ADDR_W, timeout=XCONF.UxbusConf.GET_TIMEOUT)
+register(_R.SERVO_R32B, request=_ADDR_R, response='>i')
+register(_R.SERVO_ZERO, request='B')
+register(_R.SERVO_DBMSG, response='16B')
+
+register(_R.GPGET_ERR, response='2B')
+register(_R.GRIPP_W16B, request=_ADDR_W, timeout=XCONF.UxbusConf.GET_TIMEOUT)
+register(_R.GRIPP_R16B, request=_ADDR_R, response='>i')
+register(_R.GRIPP_W32B, request=_ADDR_W, timeout=XCONF.UxbusConf.GET_TIMEOUT)
+register(_R.GRIPP_R32B, request=_ADDR_R, response='>i')
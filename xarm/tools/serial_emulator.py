@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2019, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+"""
+Serial controller emulator on a pseudo-terminal pair (Linux/macOS), the SDK opens its device unchanged
+
+    python -m xarm.tools.serial_emulator --enabled
+    (prints the device, such as /dev/pts/3)
+
+    emu = SerialEmulator(enabled=True).start()
+    arm = XArmAPI(emu.device)
+    ...
+    emu.stop()
+
+The requests and responses are UX2 hex frames [fromid, toid, length, reg/state, data, crc16-modbus],
+the commands are run by the simulated controller of xarm.tools.simulator (SimArm).
+noise > 0 writes random bytes between the responses (with the probability noise) to exercise the parser.
+"""
+
+import argparse
+import os
+import random
+import select
+import threading
+import time
+import tty
+from ..core.config.x_config import XCONF
+from ..core.comm.scheduler import get_scheduler
+from ..core.comm.uxbus_cmd_protocol import Ux2HexProtocol
+from ..core.wrapper.uxbus_cmd_ser import UX2_HEADER, UX2_CRC
+from ..core.utils import crc16
+from ..core.utils.log import logger
+from .simulator import SimArm
+
+
+class SerialEmulator(object):
+    """
+    :param axis: 5, 6 or 7
+    :param enabled: start with the motors enabled and the state 2 (ready to move)
+    :param arm: the SimArm to use, default is a new one
+    :param delay: the delay (seconds) of every response
+    :param noise: the probability of random bytes before a response
+    :param tick: the period (seconds) of the motion model
+    """
+    def __init__(self, axis=7, enabled=False, arm=None, delay=0, noise=0, tick=0.005,
+                 fromid=XCONF.SerialConf.UXBUS_DEF_FROMID, toid=XCONF.SerialConf.UXBUS_DEF_TOID):
+        self.arm = SimArm(axis=axis, enabled=enabled) if arm is None else arm
+        self.delay = delay
+        self.noise = noise
+        self.tick = tick
+        # the requests are [fromid, toid, ...], the responses are [toid, fromid, ...]
+        self.fromid = fromid
+        self.toid = toid
+        self.device = None
+        self.alive = False
+        self.noise_bytes = 0
+        self._master = None
+        self._slave = None
+        self._thread = None
+        self._timer = None
+        self._write_lock = threading.Lock()
+        self._parser = Ux2HexProtocol(None, fromid=toid, toid=fromid)
+        self._parser.rx_callback = self._handle_request
+
+    @property
+    def stats(self):
+        return {
+            'requests': self._parser.frame_count,
+            'crc_errors': self._parser.crc_error_count,
+            'noise_bytes': self.noise_bytes,
+        }
+
+    def start(self):
+        self._master, self._slave = os.openpty()
+        # raw mode without echo until the client opens the device (the slave stays open, a client may reopen it)
+        tty.setraw(self._slave)
+        self.device = os.ttyname(self._slave)
+        self.alive = True
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        self._timer = get_scheduler().call_later(self.tick, lambda: self.arm.step(self.tick), interval=self.tick)
+        logger.info('serial emulator on {}'.format(self.device))
+        return self
+
+    def stop(self):
+        self.alive = False
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._thread is not None:
+            self._thread.join(1)
+            self._thread = None
+        for fd in (self._master, self._slave):
+            if fd is not None:
+                os.close(fd)
+        self._master = self._slave = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def _serve(self):
+        while self.alive:
+            readable, _, _ = select.select([self._master], [], [], 0.1)
+            if not readable:
+                continue
+            try:
+                data = os.read(self._master, 4096)
+            except OSError:
+                # no client (EIO), wait for the next one
+                time.sleep(0.01)
+                continue
+            self._parser.put(data)
+
+    def _handle_request(self, frame):
+        state, data = self.arm.execute(frame[3], bytes(frame[4:-2]))
+        size = UX2_HEADER.size + len(data)
+        response = bytearray(size + UX2_CRC.size)
+        UX2_HEADER.pack_into(response, 0, self.toid, self.fromid, len(data) + 1, state)
+        response[UX2_HEADER.size:size] = data
+        UX2_CRC.pack_into(response, size, crc16.crc16_update(crc16.CRC16_INIT, response[:size]))
+        if self.noise > 0 and random.random() < self.noise:
+            junk = os.urandom(random.randint(1, 8))
+            self.noise_bytes += len(junk)
+            response = junk + response
+        if self.delay > 0:
+            get_scheduler().call_later(self.delay, lambda: self._write(response))
+        else:
+            self._write(response)
+
+    def _write(self, data):
+        with self._write_lock:
+            try:
+                os.write(self._master, data)
+            except OSError as e:
+                logger.error('serial emulator write: {}'.format(e))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m xarm.tools.serial_emulator',
+                                     description='xArm serial controller emulator on a pseudo-terminal')
+    parser.add_argument('--axis', type=int, default=7, choices=[5, 6, 7])
+    parser.add_argument('--enabled', action='store_true', help='start with the motors enabled and ready to move')
+    parser.add_argument('--delay', type=float, default=0, help='the delay (seconds) of every response')
+    parser.add_argument('--noise', type=float, default=0, help='the probability of random bytes before a response')
+    args = parser.parse_args(argv)
+    emu = SerialEmulator(axis=args.axis, enabled=args.enabled, delay=args.delay, noise=args.noise)
+    emu.start()
+    print(emu.device)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        emu.stop()
+
+
+if __name__ == '__main__':
+    main()
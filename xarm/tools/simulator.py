@@ -0,0 +1,509 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2019, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+"""
+Controller simulator of the xArm, the SDK runs against it without hardware
+    502: the commands, the responses keep the bus_flag and the funcode of the requests,
+        the state byte carries the error (0x40) and warn (0x20) flags
+    30001/30002/30003: the normal/rich/real report frames at the configured rates
+The motion model is simple: the joint motions move the angles and the linear motions move the pose
+at the commanded speed, the buffered motions are counted by cmd_num. The kinematics is a toy linear map
+(pose[i] = HOME_POSE[i] + KINEMATIC_SCALE[i] * angles[i]) which keeps the angles and the pose consistent.
+
+    python -m xarm.tools.simulator --host 127.0.0.1 --enabled
+
+    sim = Simulator('127.0.0.1', enabled=True)
+    sim.start()
+    arm = XArmAPI('127.0.0.1')
+    ...
+    sim.stop()
+
+The ports are fixed (the SDK connects to them), run several simulators on 127.0.0.2, 127.0.0.3, ...
+"""
+
+import argparse
+import math
+import socket
+import threading
+import time
+from collections import deque
+from ..core.config.x_config import XCONF
+from ..core.comm.scheduler import get_scheduler
+from ..core.wrapper.uxbus_reg import REGISTERS
+from ..core.wrapper.uxbus_cmd_tcp import TX2_HEADER, TX2_PROT_CON, TX2_PROT_HEAT
+from ..core.utils.log import logger
+from ..x3.report import REPORT_NORMAL, REPORT_RICH, REPORT_REAL
+
+_R = XCONF.UxbusReg
+
+REPORT_LAYOUTS = {
+    'normal': REPORT_NORMAL,
+    'rich': REPORT_RICH,
+    'real': REPORT_REAL,
+}
+
+REPORT_PORTS = {
+    XCONF.SocketConf.TCP_REPORT_NORM_PORT: 'normal',
+    XCONF.SocketConf.TCP_REPORT_RICH_PORT: 'rich',
+    XCONF.SocketConf.TCP_REPORT_REAL_PORT: 'real',
+}
+
+# the report frames per second of the report types
+REPORT_RATES = {'normal': 10, 'rich': 10, 'real': 100}
+
+HOME_POSE = [201.5, 0.0, 140.5, math.pi, 0.0, 0.0]
+KINEMATIC_SCALE = [100.0, 100.0, 100.0, 1.0, 1.0, 1.0]  # mm/rad, rad/rad
+
+
+class SimArm(object):
+    """
+    State and motion model of the simulated controller (thread safe)
+    execute(funcode, payload) runs one command, step(dt) advances the motions
+    """
+    ARM_TYPES = {
+        5: XCONF.RobotType.XARM5_X4,
+        6: XCONF.RobotType.XARM6_X4,
+        7: XCONF.RobotType.XARM7_X4,
+    }
+
+    def __init__(self, axis=7, enabled=False, version='1.2.0-2019-06-01'):
+        self.lock = threading.RLock()
+        self.axis = axis
+        self.arm_type = self.ARM_TYPES.get(axis, XCONF.RobotType.XARM7_X4)
+        self.version = 'xArm{}-{}'.format(axis, version)
+        mask = (1 << axis) - 1
+        self.state = 2 if enabled else 4
+        self.mode = 0
+        self.error_code = 0
+        self.warn_code = 0
+        self.mtbrake = mask if enabled else 0
+        self.mtable = mask if enabled else 0
+        self.angles = [0.0] * 7
+        self.position = list(HOME_POSE)
+        self.position_offset = [0.0] * 6
+        self.tcp_load = [0.0] * 4
+        self.collis_sens = 3
+        self.teach_sens = 3
+        self.gravity_direction = [0.0, 0.0, -1.0]
+        self.tcp_jerk, self.tcp_maxacc = 1000.0, 50000.0
+        self.joint_jerk, self.joint_maxacc = 20.0, 20.0
+        self.registers = {}  # {(id, addr): value} of the servo/gripper/gpio registers
+        self.cmds = deque()  # the buffered motions, [kind, target, speed] or ['sleep', seconds]
+        self.request_count = 0
+        self._handlers = {
+            _R.GET_VERSION: self._get_version,
+            _R.MOTION_EN: self._motion_en,
+            _R.SET_STATE: self._set_state,
+            _R.GET_STATE: lambda values: [self.state],
+            _R.GET_CMDNUM: lambda values: [len(self.cmds)],
+            _R.GET_ERROR: lambda values: [self.error_code, self.warn_code],
+            _R.CLEAN_ERR: self._clean_err,
+            _R.CLEAN_WAR: self._clean_war,
+            _R.SET_BRAKE: self._set_brake,
+            _R.SET_MODE: self._set_mode,
+            _R.MOVE_LINE: lambda values: self._push('line', values[:6], values[6]),
+            _R.MOVE_LINEB: lambda values: self._push('line', values[:6], values[6]),
+            _R.MOVE_CIRCLE: lambda values: self._push('line', values[6:12], values[12]),
+            _R.MOVE_JOINT: lambda values: self._push('joint', values[:7], values[7]),
+            _R.MOVE_HOME: lambda values: self._push('joint', [0.0] * 7, values[0]),
+            _R.MOVE_SERVOJ: self._move_servoj,
+            _R.SLEEP_INSTT: lambda values: self._push('sleep', values[0]),
+            _R.SET_TCP_JERK: lambda values: setattr(self, 'tcp_jerk', values[0]),
+            _R.SET_TCP_MAXACC: lambda values: setattr(self, 'tcp_maxacc', values[0]),
+            _R.SET_JOINT_JERK: lambda values: setattr(self, 'joint_jerk', values[0]),
+            _R.SET_JOINT_MAXACC: lambda values: setattr(self, 'joint_maxacc', values[0]),
+            _R.SET_TCP_OFFSET: lambda values: setattr(self, 'position_offset', list(values)),
+            _R.SET_LOAD_PARAM: lambda values: setattr(self, 'tcp_load', list(values)),
+            _R.SET_COLLIS_SENS: lambda values: setattr(self, 'collis_sens', values[0]),
+            _R.SET_TEACH_SENS: lambda values: setattr(self, 'teach_sens', values[0]),
+            _R.SET_GRAVITY_DIR: lambda values: setattr(self, 'gravity_direction', list(values)),
+            _R.GET_TCP_POSE: lambda values: self.position,
+            _R.GET_JOINT_POS: lambda values: self.angles,
+            _R.GET_IK: lambda values: self.inverse(values),
+            _R.GET_FK: lambda values: self.forward(values),
+            _R.IS_JOINT_LIMIT: lambda values: [0],
+            _R.IS_TCP_LIMIT: lambda values: [0],
+            _R.SERVO_W16B: self._write_register,
+            _R.SERVO_W32B: self._write_register,
+            _R.SERVO_R16B: self._read_register,
+            _R.SERVO_R32B: self._read_register,
+            _R.GRIPP_W16B: self._write_register,
+            _R.GRIPP_W32B: self._write_register,
+            _R.GRIPP_R16B: self._read_register,
+            _R.GRIPP_R32B: self._read_register,
+        }
+
+    @property
+    def axis_mask(self):
+        return (1 << self.axis) - 1
+
+    @property
+    def state_flags(self):
+        return (0x40 if self.error_code else 0) | (0x20 if self.warn_code else 0)
+
+    def forward(self, angles):
+        return [HOME_POSE[i] + KINEMATIC_SCALE[i] * (angles[i] if i < self.axis else 0) for i in range(6)]
+
+    def inverse(self, pose):
+        angles = [0.0] * 7
+        for i in range(min(self.axis, 6)):
+            angles[i] = (pose[i] - HOME_POSE[i]) / KINEMATIC_SCALE[i]
+        return angles
+
+    def set_error(self, error_code):
+        """
+        Raise a controller error, the motions are stopped and dropped until clean_error
+        """
+        with self.lock:
+            self.error_code = error_code
+            if error_code:
+                self.state = 4
+                self.cmds.clear()
+
+    def set_warn(self, warn_code):
+        with self.lock:
+            self.warn_code = warn_code
+
+    def execute(self, funcode, payload):
+        """
+        Run one command
+        :param funcode: the register
+        :param payload: the request payload
+        :return: (state byte, response payload)
+        """
+        spec = REGISTERS.get(funcode)
+        with self.lock:
+            self.request_count += 1
+            if spec is None:
+                return self.state_flags, b''
+            handler = self._handlers.get(funcode)
+            ret = None
+            if handler is not None and len(payload) >= spec.tx_size:
+                ret = handler(spec.decode_request(payload))
+            if not spec.rx_size:
+                return self.state_flags, b''
+            data = spec.encode_response(ret) if ret is not None else bytes(spec.rx_size)
+            return self.state_flags, bytes(data)
+
+    def handle_frame(self, frame):
+        """
+        Run the command of one request frame of the TCP protocol
+        :return: the response frame, None if the frame is not a command
+        """
+        bus_flag, prot, length, funcode = TX2_HEADER.unpack_from(frame)
+        if prot == TX2_PROT_HEAT:
+            return bytes(frame)
+        if prot != TX2_PROT_CON:
+            return None
+        state, data = self.execute(funcode, bytes(frame[7:6 + length]))
+        return TX2_HEADER.pack(bus_flag, prot, len(data) + 2, funcode) + bytes([state]) + data
+
+    def report_values(self):
+        """
+        :return: the fields of the report frames (see xarm.x3.report)
+        """
+        with self.lock:
+            return {
+                'state_mode': (self.mode << 4) | self.state,
+                'cmd_num': len(self.cmds),
+                'angles': list(self.angles),
+                'pose': list(self.position),
+                'torque': [0.0] * 7,
+                'mtbrake': self.mtbrake,
+                'mtable': self.mtable,
+                'error_code': self.error_code,
+                'warn_code': self.warn_code,
+                'pose_offset': list(self.position_offset),
+                'tcp_load': list(self.tcp_load),
+                'collis_sens': self.collis_sens,
+                'teach_sens': self.teach_sens,
+                'gravity_direction': list(self.gravity_direction),
+                'arm_type': self.arm_type,
+                'arm_axis': self.axis,
+                'arm_master_id': 0,
+                'arm_slave_id': 0,
+                'arm_motor_tid': 0,
+                'arm_motor_fid': 0,
+                'version': self.version.encode('utf-8')[:29],
+                'trs_msg': [self.tcp_jerk, 1.0, self.tcp_maxacc, 0.1, 1000.0],
+                'p2p_msg': [self.joint_jerk, 0.01, self.joint_maxacc, 0.01, 4.0],
+                'rot_msg': [2.3, 2.7],
+                'sv3_msg': [0] * 16,
+            }
+
+    def report_frame(self, report_type):
+        return REPORT_LAYOUTS[report_type].pack(self.report_values())
+
+    def step(self, dt):
+        """
+        Advance the buffered motions by dt seconds
+        """
+        with self.lock:
+            if self.state != 1:
+                return
+            while self.cmds and dt > 0:
+                dt = self._run(self.cmds[0], dt)
+            if not self.cmds:
+                self.state = 2
+
+    def _run(self, cmd, dt):
+        # run the first buffered motion for up to dt seconds, return the time left
+        if cmd[0] == 'sleep':
+            if cmd[1] > dt:
+                cmd[1] -= dt
+                return 0
+            self.cmds.popleft()
+            return dt - cmd[1]
+        current = self.angles if cmd[0] == 'joint' else self.position
+        target, speed = cmd[1], cmd[2]
+        if cmd[0] == 'joint':
+            distance = max(abs(t - c) for t, c in zip(target, current))
+        else:
+            distance = math.sqrt(sum((target[i] - current[i]) ** 2 for i in range(3)))
+        need = distance / speed if speed > 0 else 0
+        if need <= dt:
+            current[:len(target)] = target
+            self.cmds.popleft()
+            dt -= need
+        else:
+            ratio = dt / need
+            for i, t in enumerate(target):
+                current[i] += (t - current[i]) * ratio
+            dt = 0
+        if cmd[0] == 'joint':
+            self.position = self.forward(self.angles)
+        else:
+            self.angles[:6] = self.inverse(self.position)[:6]
+        return dt
+
+    def _push(self, kind, target, speed=None):
+        if self.error_code or self.state == 4:
+            return
+        if kind == 'sleep':
+            self.cmds.append(['sleep', target])
+        else:
+            self.cmds.append([kind, list(target[:self.axis] if kind == 'joint' else target), speed])
+        if self.state == 2:
+            self.state = 1
+
+    def _get_version(self, values):
+        return list(self.version.encode('utf-8').ljust(40, b'\0')[:40])
+
+    def _motion_en(self, values):
+        bits = self.axis_mask if values[0] == 8 else 1 << (values[0] - 1)
+        if values[1]:
+            self.mtable |= bits
+            self.mtbrake |= bits
+        else:
+            self.mtable &= ~bits
+            self.mtbrake &= ~bits
+
+    def _set_brake(self, values):
+        bits = self.axis_mask if values[0] == 8 else 1 << (values[0] - 1)
+        if values[1]:
+            self.mtbrake |= bits
+        else:
+            self.mtbrake &= ~bits
+
+    def _set_state(self, values):
+        if values[0] == 0:
+            if not self.error_code:
+                self.state = 1 if self.cmds else 2
+        elif values[0] == 3:
+            if self.state == 1:
+                self.state = 3
+        elif values[0] == 4:
+            self.cmds.clear()
+            self.state = 4
+
+    def _set_mode(self, values):
+        self.mode = values[0]
+
+    def _clean_err(self, values):
+        self.error_code = 0
+
+    def _clean_war(self, values):
+        self.warn_code = 0
+
+    def _move_servoj(self, values):
+        if not self.error_code and self.state != 4:
+            self.angles[:self.axis] = values[:self.axis]
+            self.position = self.forward(self.angles)
+
+    def _write_register(self, values):
+        self.registers[(values[0], values[1])] = values[2]
+
+    def _read_register(self, values):
+        return [int(self.registers.get((values[0], values[1]), 0))]
+
+
+class Simulator(object):
+    """
+    TCP servers of the simulated controller
+    :param host: the address to listen
+    :param axis: 5, 6 or 7
+    :param enabled: start with the motors enabled and the state 2 (ready to move)
+    :param rates: {report type: frames per second}, see REPORT_RATES
+    :param delay: the delay (seconds) of every response
+    :param tick: the period (seconds) of the motion model
+    """
+    def __init__(self, host='127.0.0.1', axis=7, enabled=False, rates=None, delay=0, tick=0.005):
+        self.host = host
+        self.arm = SimArm(axis=axis, enabled=enabled)
+        self.rates = dict(REPORT_RATES, **(rates or {}))
+        self.delay = delay
+        self.tick = tick
+        self.alive = False
+        self.report_count = 0
+        self._servers = []
+        self._conns = []
+        self._threads = []
+
+    @property
+    def stats(self):
+        return {
+            'requests': self.arm.request_count,
+            'reports': self.report_count,
+            'connections': len(self._conns),
+        }
+
+    def start(self):
+        self.alive = True
+        self._listen(XCONF.SocketConf.TCP_CONTROL_PORT, self._serve_control)
+        for port, report_type in REPORT_PORTS.items():
+            self._listen(port, self._serve_report, report_type)
+        self._spawn(self._motion_loop)
+        logger.info('simulator listen on {}'.format(self.host))
+        return self
+
+    def stop(self):
+        self.alive = False
+        for sock in self._servers + self._conns:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except Exception:
+                pass
+            sock.close()
+        for t in self._threads:
+            t.join(1)
+        self._servers, self._conns, self._threads = [], [], []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def _spawn(self, target, *args):
+        t = threading.Thread(target=target, args=args, daemon=True)
+        t.start()
+        self._threads.append(t)
+
+    def _listen(self, port, handler, *args):
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind((self.host, port))
+        server.listen(5)
+        self._servers.append(server)
+        self._spawn(self._accept_loop, server, handler, args)
+
+    def _accept_loop(self, server, handler, args):
+        while self.alive:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                break
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._conns.append(conn)
+            threading.Thread(target=self._serve, args=(conn, handler, args), daemon=True).start()
+
+    def _serve(self, conn, handler, args):
+        try:
+            handler(conn, *args)
+        except OSError:
+            pass
+        finally:
+            if conn in self._conns:
+                self._conns.remove(conn)
+            conn.close()
+
+    def _serve_control(self, conn):
+        lock = threading.Lock()
+
+        def send(data):
+            with lock:
+                try:
+                    conn.sendall(data)
+                except OSError:
+                    pass
+
+        buf = bytearray()
+        while self.alive:
+            data = conn.recv(4096)
+            if not data:
+                break
+            buf += data
+            while len(buf) >= 6:
+                size = ((buf[4] << 8) | buf[5]) + 6
+                if len(buf) < size:
+                    break
+                frame, buf = buf[:size], buf[size:]
+                response = self.arm.handle_frame(frame)
+                if response is None:
+                    continue
+                if self.delay > 0:
+                    get_scheduler().call_later(self.delay, lambda r=response: send(r))
+                else:
+                    send(response)
+
+    def _serve_report(self, conn, report_type):
+        period = 1.0 / self.rates[report_type]
+        expired = time.monotonic()
+        while self.alive:
+            conn.sendall(self.arm.report_frame(report_type))
+            self.report_count += 1
+            expired += period
+            remaining = expired - time.monotonic()
+            if remaining > 0:
+                time.sleep(remaining)
+            else:
+                expired = time.monotonic()
+
+    def _motion_loop(self):
+        last = time.monotonic()
+        while self.alive:
+            time.sleep(self.tick)
+            now = time.monotonic()
+            self.arm.step(now - last)
+            last = now
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m xarm.tools.simulator', description='xArm controller simulator')
+    parser.add_argument('--host', default='127.0.0.1', help='the address to listen, default is 127.0.0.1')
+    parser.add_argument('--axis', type=int, default=7, choices=[5, 6, 7])
+    parser.add_argument('--enabled', action='store_true', help='start with the motors enabled and ready to move')
+    parser.add_argument('--normal-rate', type=float, default=REPORT_RATES['normal'], help='normal reports per second')
+    parser.add_argument('--rich-rate', type=float, default=REPORT_RATES['rich'], help='rich reports per second')
+    parser.add_argument('--real-rate', type=float, default=REPORT_RATES['real'], help='real reports per second')
+    parser.add_argument('--delay', type=float, default=0, help='the delay (seconds) of every response')
+    args = parser.parse_args(argv)
+    sim = Simulator(args.host, axis=args.axis, enabled=args.enabled, delay=args.delay,
+                    rates={'normal': args.normal_rate, 'rich': args.rich_rate, 'real': args.real_rate})
+    sim.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sim.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -1 +1,2 @@
 from .xarm_api import XArmAPI
+from .xarm_fleet import XArmFleet
@@ -25,6 +25,10 @@ class XArmAPI(object):
             yaw: rotate around the Z axis
         
         :param port: port name(such as 'COM5'/'/dev/ttyUSB0') or ip-address(such as '192.168.1.185')
+            or the url of a transport (see xarm.core.comm.transport):
+                'tcp://192.168.1.185', 'serial:///dev/ttyUSB0',
+                'loop://name' (in-process loopback to the responder registered by register_responder),
+                'sim://' (in-process loopback to a new simulated controller)
             Note: this parameter is required if parameter do_not_open is False
         :param is_radian: set the default unit is radians or not, default is False
             Note: (aim of design)
@@ -86,6 +90,32 @@ class XArmAPI(object):
                 Note: only check the param angle of the interface `set_servo_angle` and the param angles of the interface `set_servo_angle_j`
             check_cmdnum_limit: check the cmdnum out of limit or not, default is True
                 Note: only available in the interface `set_position` and `set_servo_angle`
+            io_mode: io mode('thread'/'reactor'), only available in socket way, default is 'thread'
+                Note:
+                    'thread': every socket has its own receive thread, the report is handled in a report thread
+                    'reactor': one selector thread receives all sockets, handles the report inline and sends the heartbeat
+                    In 'reactor' mode the report callbacks run in the reactor thread, do not wait for a command response in them
+            reactor: a started xarm.core.comm.Reactor instance shared by many xArm, only available in socket way, default is None
+                Note: if set, io_mode is 'reactor' and the reactor will not be stopped by disconnect
+            pipeline_depth: the max number of outstanding commands on the control socket, only available in socket way, default is 1
+                Note: if greater than 1, the set interfaces return 0 once the command is sent without waiting for the response,
+                    use `wait_pipeline` to wait for the outstanding commands and get the failed code
+            coalesce_window: the frames written within the window (second) are sent together with one sendmsg,
+                only available in socket way, default is 0 (disabled), such as 0.0005
+                Note: useful with pipeline_depth greater than 1, a command waiting for its response is sent at once
+            socket_profile: the socket options profile of the sockets, only available in socket way, default is 'default'
+                'lowlatency': TCP_NODELAY, TCP_QUICKACK, SO_BUSY_POLL and small SO_RCVBUF/SO_SNDBUF (the unsupported options are skipped)
+            auto_reconnect: reconnect the lost control socket (and the report socket) in the background,
+                only available in socket way, default is False (the lost control socket disconnects the xArm)
+                Note: the interfaces return APIState.NOT_CONNECTED at once while reconnecting, use `wait_connected` to wait,
+                    the delays between the attempts grow from XCONF.SocketConf.RECONNECT_DELAY_MIN to RECONNECT_DELAY_MAX
+                    the loss is detected by the report thread (or the reactor), enable_report is required in thread io_mode
+            history: keep the reported states of the last `history` seconds in a numpy ring buffer (see `history`),
+                default is 0 (disabled), numpy is required
+            report_capture: the path of a capture file, append every raw report frame to it (see `start_report_capture`),
+                default is None (disabled), only available in socket way
+            wire_capture: the path of a log file, append every request and response of the control socket to it
+                (see `start_wire_capture`), default is None (disabled), only available in socket way
         """
         self._arm = XArm(port=port,
                          is_radian=is_radian,
@@ -124,6 +154,25 @@ class XArmAPI(object):
         """
         return self._arm.connected
 
+    @property
+    def reconnecting(self):
+        """
+        Reconnecting the lost control socket or not (see auto_reconnect)
+        """
+        return self._arm.reconnecting
+
+    @property
+    def history(self):
+        """
+        The telemetry history (xarm.x3.history.TelemetryHistory) if the history is enabled, else None
+        Note: the joints and the attitude of the pose are radians, the time is time.time()
+            history.latest(n): the last n records
+            history.window(t0, t1): the records between t0 and t1
+            history.at(t): the record interpolated at t
+            the records are numpy structured arrays (views of the buffer), such as records['joints'] (N x 7)
+        """
+        return self._arm.history
+
     @property
     def default_is_radian(self):
         """
@@ -464,6 +513,90 @@ class XArmAPI(object):
         """
         self._arm.disconnect()
 
+    def wait_pipeline(self, timeout=None):
+        """
+        Wait for all the outstanding commands, only available if pipeline_depth is greater than 1
+        :param timeout: the max time to wait(second), default is None(1 second)
+        :return: code
+            code: See the return code documentation for details.
+                0 if all the pipelined commands succeeded, else the code of the first failed command
+        """
+        return self._arm.wait_pipeline(timeout=timeout)
+
+    def batch(self):
+        """
+        Gather the commands of the scope and send them together (one sendmsg instead of one send per command),
+        only available in socket way
+        Note: the set interfaces of the scope return 0 once the command is queued without waiting for the response,
+            a get interface sends the gathered commands first
+
+            with arm.batch() as batch:
+                for pose in path:
+                    arm.set_position(*pose)
+            print(batch.code)
+
+        :return: the batch scope, batch.code is the code of the first failed command of the scope (or 0) after the scope
+        """
+        return self._arm.batch()
+
+    def get_rtt_stats(self, funcode=None, reset=False):
+        """
+        Get the round-trip time (command sent -> response received) statistics of the commands
+        :param funcode: the register of the command (see XCONF.UxbusReg), default is None (all the commands)
+        :param reset: reset the statistics after getting them, default is False
+        :return: {funcode: stats} or the stats of the funcode,
+            stats: {'count', 'min', 'max', 'mean', 'p50', 'p90', 'p99' (seconds), 'buckets': {upper bound (us): count}}
+        """
+        return self._arm.get_rtt_stats(funcode=funcode, reset=reset)
+
+    def start_report_capture(self, path, **kwargs):
+        """
+        Append every raw report frame (with its reception time) to a memory-mapped capture file,
+        only available in socket way
+        Note: read the capture with xarm.x3.capture.ReportCapture(path),
+            replay it into the report handlers with xarm.x3.capture.ReportReplay(capture, arm, speed)
+        :param path: the capture file, an existing file is overwritten, the sparse time index is path + '.idx'
+        :param kwargs: chunk_size (the bytes the file grows by), index_interval (the seconds between the index entries)
+        """
+        self._arm.start_report_capture(path, **kwargs)
+
+    def stop_report_capture(self):
+        """
+        Stop the report capture and close the capture file
+        :return: the number of captured frames
+        """
+        return self._arm.stop_report_capture()
+
+    def start_wire_capture(self, path):
+        """
+        Append every request and response of the control socket (with nanosecond timestamps) to a log file,
+        only available in socket way
+        Note: replay the log with xarm.x3.capture.WireReplay, it stands in for the controller of loop://
+
+            register_responder('replay', WireReplay(path, report_capture=report_path))
+            arm = XArmAPI('loop://replay')
+
+        :param path: the log file, an existing file is overwritten
+        """
+        self._arm.start_wire_capture(path)
+
+    def stop_wire_capture(self):
+        """
+        Stop the wire capture and close the log file
+        :return: the number of captured frames
+        """
+        return self._arm.stop_wire_capture()
+
+    def wait_connected(self, timeout=None):
+        """
+        Wait until the xArm is connected, such as the reconnection of auto_reconnect
+        Note: a control socket closed by the xArm counts as lost at once (the wait goes on until the reconnection),
+            an xArm which is gone without closing the socket is only seen once the socket fails
+        :param timeout: the max seconds to wait, default is None (wait forever)
+        :return: True if connected, False if timeout or not reconnecting (auto_reconnect is disabled or disconnect was called)
+        """
+        return self._arm.wait_connected(timeout=timeout)
+
     def send_cmd_sync(self, command=None):
         """
         Send cmd and wait (only waiting the cmd response, not waiting for the movement)
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2019, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+from concurrent.futures import ThreadPoolExecutor
+from ..core.comm import Reactor
+from ..core.utils.log import logger
+from ..x3.code import APIState
+from .xarm_api import XArmAPI
+
+
+class XArmFleet(object):
+    def __init__(self, ports, is_radian=False, reactors=1, max_workers=8, do_not_open=False, **kwargs):
+        """
+        Many xArm (socket way) in one process with a bounded number of threads
+        All the sockets, report handlers and heartbeats of the arms are multiplexed on a few shared reactor threads,
+        the blocking interfaces of the fleet-wide operations run on one worker pool.
+        Threads: reactors + max_workers (the pool threads are only created when used)
+
+        :param ports: the ip-addresses of the xArm, such as ['192.168.1.185', '192.168.1.186']
+        :param is_radian: set the default unit is radians or not, default is False
+        :param reactors: the number of the shared reactor threads, the arms are assigned in turn, default is 1
+        :param max_workers: the max number of the worker threads of the fleet-wide operations, default is 8
+        :param do_not_open: do not open, default is False, if true, you need to call connect
+        :param kwargs: the other keyword parameters of every XArmAPI, such as enable_report/report_type/enable_heartbeat
+        """
+        self._reactors = [Reactor(name='xarm-fleet-reactor-{}'.format(i)) for i in range(max(1, reactors))]
+        for reactor in self._reactors:
+            reactor.start()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_workers))
+        self._arms = {}
+        for i, port in enumerate(ports):
+            self._arms[port] = XArmAPI(port=port, is_radian=is_radian, do_not_open=True,
+                                       reactor=self._reactors[i % len(self._reactors)], **kwargs)
+        if not do_not_open:
+            self.connect()
+
+    def __getitem__(self, port):
+        return self._arms[port]
+
+    def __iter__(self):
+        return iter(self._arms.values())
+
+    def __len__(self):
+        return len(self._arms)
+
+    @property
+    def arms(self):
+        """
+        The handles of the arms, {port: XArmAPI}
+        """
+        return self._arms
+
+    @property
+    def connected(self):
+        """
+        Connection status, {port: connected}
+        """
+        return {port: bool(arm.connected) for port, arm in self._arms.items()}
+
+    @property
+    def positions(self):
+        """
+        The reported cartesion positions, {port: [x, y, z, roll, pitch, yaw]}
+        Note: no command is sent, the values are updated by the report
+        """
+        return {port: arm.position for port, arm in self._arms.items()}
+
+    @property
+    def angles(self):
+        """
+        The reported servo angles, {port: [angle-1, ..., angle-7]}
+        Note: no command is sent, the values are updated by the report
+        """
+        return {port: arm.angles for port, arm in self._arms.items()}
+
+    def _map(self, func, ports=None):
+        ports = list(self._arms.keys()) if ports is None else ports
+        futures = {port: self._pool.submit(func, port, self._arms[port]) for port in ports}
+        return {port: future.result() for port, future in futures.items()}
+
+    @staticmethod
+    def _connect_arm(port, arm):
+        try:
+            arm.connect()
+        except Exception as e:
+            logger.error('connect {} failed: {}'.format(port, e))
+        return bool(arm.connected)
+
+    def connect(self, ports=None):
+        """
+        Connect the arms concurrently
+
+        :param ports: the ip-addresses to connect, default is None (all)
+        :return: {port: connected}
+        """
+        return self._map(self._connect_arm, ports)
+
+    def disconnect(self):
+        """
+        Disconnect all the arms and stop the reactor threads and the worker pool
+        """
+        self._map(lambda port, arm: arm.disconnect() if arm.connected else None)
+        for reactor in self._reactors:
+            reactor.stop()
+        for reactor in self._reactors:
+            reactor.join()
+        self._pool.shutdown()
+
+    def call(self, name, *args, ports=None, **kwargs):
+        """
+        Call the interface of XArmAPI on the arms concurrently, such as fleet.call('set_state', 0)
+
+        :param name: the name of the interface of XArmAPI
+        :param ports: the ip-addresses to call, default is None (all)
+        :return: {port: the return of the interface}
+        """
+        def _call(port, arm):
+            try:
+                return getattr(arm, name)(*args, **kwargs)
+            except Exception as e:
+                logger.error('{} {}: {}'.format(name, port, e))
+                return APIState.API_EXCEPTION
+        return self._map(_call, ports)
+
+    def broadcast_state(self, state=0, ports=None):
+        """
+        Set the state of the arms
+
+        :param state: 0: sport state, 3: pause state, 4: stop state
+        :return: {port: code}
+        """
+        return self.call('set_state', state=state, ports=ports)
+
+    def broadcast_mode(self, mode=0, ports=None):
+        """
+        Set the mode of the arms
+
+        :param mode: 0: position control mode, 1: servo motion mode, 2: joint teaching mode
+        :return: {port: code}
+        """
+        return self.call('set_mode', mode=mode, ports=ports)
+
+    def motion_enable(self, enable=True, servo_id=None, ports=None):
+        """
+        Motion enable of the arms
+
+        :return: {port: code}
+        """
+        return self.call('motion_enable', enable=enable, servo_id=servo_id, ports=ports)
+
+    def emergency_stop(self, ports=None):
+        """
+        Emergency stop the arms
+
+        :return: {port: None}
+        """
+        return self.call('emergency_stop', ports=ports)
+
+    def gather_positions(self, is_radian=None, ports=None):
+        """
+        Get the cartesion positions of the arms concurrently (send the command to every arm)
+
+        :return: {port: (code, [x, y, z, roll, pitch, yaw])}
+        """
+        return self.call('get_position', is_radian=is_radian, ports=ports)
+
+    def gather_servo_angles(self, is_radian=None, ports=None):
+        """
+        Get the servo angles of the arms concurrently (send the command to every arm)
+
+        :return: {port: (code, [angle-1, ..., angle-7])}
+        """
+        return self.call('get_servo_angle', is_radian=is_radian, ports=ports)
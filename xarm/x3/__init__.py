@@ -10,8 +10,11 @@ import re
 import math
 import time
 import threading
-from collections import Iterable
-from ..core.comm import SerialPort, SocketPort
+try:
+    from collections.abc import Iterable
+except ImportError:
+    from collections import Iterable
+from ..core.comm import Reactor, get_scheduler, create_transport
 from ..core.config.x_config import XCONF
 from ..core.wrapper import UxbusCmdSer, UxbusCmdTcp
 from ..core.utils import convert
@@ -22,13 +25,31 @@ from .gpio import GPIO
 from .servo import Servo
 from .events import *
 from . import parse
+from .report import REPORT_NORMAL, REPORT_RICH, REPORT_NORMAL_OLD, REPORT_RICH_OLD
+from .report import RobotStateSnapshot, SnapshotField, round_pose, round_angles
+from .history import TelemetryHistory
+from .capture import ReportRecorder, WireRecorder
 from .code import APIState
-from .utils import xarm_is_connected, xarm_is_ready, compare_time
+from .utils import xarm_is_connected, xarm_is_ready, compare_time, CommandBatch, Backoff
 
 RAD_DEGREE = 57.295779513082320876798154814105
 
 
 class XArm(Gripper, Servo, GPIO, Events):
+    # the reported state, published by the report handler with one swap of self._snapshot
+    _state = SnapshotField('state')
+    _mode = SnapshotField('mode')
+    _cmd_num = SnapshotField('cmd_num')
+    _error_code = SnapshotField('error_code')
+    _warn_code = SnapshotField('warn_code')
+    _position = SnapshotField('position')
+    _angles = SnapshotField('angles')
+    _position_offset = SnapshotField('position_offset')
+    _joints_torque = SnapshotField('joints_torque')
+    _collision_sensitivity = SnapshotField('collision_sensitivity')
+    _teach_sensitivity = SnapshotField('teach_sensitivity')
+    _gravity_direction = SnapshotField('gravity_direction')
+
     def __init__(self, port=None, is_radian=False, do_not_open=False, **kwargs):
         super(XArm, self).__init__()
         self._port = port
@@ -57,6 +78,7 @@ class XArm(Gripper, Servo, GPIO, Events):
         self._stream_type = 'serial'
         self._stream = None
         self.arm_cmd = None
+        self._transport = None
         self._stream_report = None
         self._report_thread = None
         self._only_report_err_warn_changed = True
@@ -70,27 +92,15 @@ class XArm(Gripper, Servo, GPIO, Events):
         self._mvtime = 0
 
         self._version = None
-        self._position = [0] * 6
-        self._angles = [0] * 7
-        self._position_offset = [0] * 6
-        self._state = 4
-        self._mode = 0
-        self._joints_torque = [0, 0, 0, 0, 0, 0, 0]  # 力矩
-        self._tcp_load = [0, [0, 0, 0]]  # 负载[重量, 重心], [weight, [x, y, z]]
-        self._collision_sensitivity = 0  # 碰撞灵敏度
-        self._teach_sensitivity = 0  # 示教灵敏度
-        self._error_code = 0
-        self._warn_code = 0
-        self._cmd_num = 0
+        self._snapshot = RobotStateSnapshot()
+        # serializes the read-copy-publish of the snapshot (report handler and API threads)
+        self._snapshot_lock = threading.Lock()
         self._arm_type = XCONF.RobotType.XARM7_X4
         self._arm_axis = 7
         self._arm_master_id = 0
         self._arm_slave_id = 0
         self._arm_motor_tid = 0
         self._arm_motor_fid = 0
-        self._arm_motor_brake_states = [0, 0, 0, 0, 0, 0, 0, 0]  # [motor-1-brake-state, ..., motor-7-brake, reserved]
-        self._arm_motor_enable_states = [0, 0, 0, 0, 0, 0, 0, 0]  # [motor-1-enable-state, ..., motor-7-enable, reserved]
-        self._gravity_direction = [0, 0, -1]
 
         self._is_ready = False
         self._is_stop = False
@@ -101,13 +111,48 @@ class XArm(Gripper, Servo, GPIO, Events):
         self._sleep_finish_time = time.time()
         self._is_old_protocol = False
 
+        # io_mode: 'thread' (one receive thread per socket) or 'reactor' (one selector thread for all sockets)
+        self._io_mode = kwargs.get('io_mode', 'thread')
+        self._reactor = kwargs.get('reactor', None)
+        self._own_reactor = False
+        # pipeline_depth > 1: keep several set commands outstanding on the control socket
+        self._pipeline_depth = kwargs.get('pipeline_depth', 1)
+        # coalesce_window > 0: the frames written within the window (seconds) are sent with one sendmsg
+        self._coalesce_window = kwargs.get('coalesce_window', 0)
+        # socket_profile: the socket options of XCONF.SocketConf.SOCKET_PROFILES, such as 'lowlatency'
+        self._socket_profile = kwargs.get('socket_profile', 'default')
+        # auto_reconnect: reconnect the lost control socket in the background (socket way only)
+        self._auto_reconnect = kwargs.get('auto_reconnect', False)
+        self._reconnect_thread = None
+        self._reconnect_lock = threading.Lock()
+        self._reconnect_stop = threading.Event()
+        # history > 0: keep the reported states of the last `history` seconds in a numpy ring buffer
+        self._history = TelemetryHistory(seconds=kwargs.get('history')) if kwargs.get('history') else None
+        # report_capture: append the raw report frames to the capture file (see xarm.x3.capture)
+        self._report_recorder = None
+        if kwargs.get('report_capture'):
+            self.start_report_capture(kwargs.get('report_capture'))
+        # wire_capture: append the requests and the responses of the control socket to the log file
+        self._wire_recorder = None
+        if kwargs.get('wire_capture'):
+            self.start_wire_capture(kwargs.get('wire_capture'))
+
         Events.__init__(self)
         if not do_not_open:
             self.connect()
 
     @property
     def connected(self):
-        return self._stream and self._stream.connected
+        # a control socket closed by the peer is lost at once, before the receive thread gives it up
+        return self._stream and self._stream.connected and not self._stream.peer_closed
+
+    @property
+    def reconnecting(self):
+        return self._reconnect_thread is not None
+
+    @property
+    def history(self):
+        return self._history
 
     @property
     def ready(self):
@@ -123,12 +168,27 @@ class XArm(Gripper, Servo, GPIO, Events):
             self.get_version()
         return self._version
 
+    @property
+    def report_snapshot(self):
+        """
+        The state of the last report frame (RobotStateSnapshot), the values are not rounded and in radians
+        """
+        return self._snapshot
+
+    @property
+    def report_rx_stats(self):
+        """
+        The statistics of the receive ring of the report socket (drop_count > 0: the report handler fell behind)
+        """
+        return self._stream_report.rx_stats if self._stream_report else None
+
     @property
     def position(self):
         if not self._enable_report:
             self.get_position()
-        return [self._position[i] * RAD_DEGREE if 2 < i < 6 and not self._default_is_radian
-                else self._position[i] for i in range(len(self._position))]
+        position = round_pose(self._position)
+        return [position[i] * RAD_DEGREE if 2 < i < 6 and not self._default_is_radian
+                else position[i] for i in range(len(position))]
 
     @property
     def tcp_speed_limit(self):
@@ -155,7 +215,7 @@ class XArm(Gripper, Servo, GPIO, Events):
     def angles(self):
         if not self._enable_report:
             self.get_servo_angle()
-        return [angle if self._default_is_radian else angle * RAD_DEGREE for angle in self._angles]
+        return [angle if self._default_is_radian else angle * RAD_DEGREE for angle in round_angles(self._angles)]
 
     @property
     def joint_speed_limit(self):
@@ -185,8 +245,9 @@ class XArm(Gripper, Servo, GPIO, Events):
 
     @property
     def position_offset(self):
-        return [self._position_offset[i] * RAD_DEGREE if 2 < i < 6 and not self._default_is_radian
-                else self._position_offset[i] for i in range(len(self._position_offset))]
+        position_offset = round_pose(self._position_offset)
+        return [position_offset[i] * RAD_DEGREE if 2 < i < 6 and not self._default_is_radian
+                else position_offset[i] for i in range(len(position_offset))]
 
     @property
     def state(self):
@@ -204,7 +265,8 @@ class XArm(Gripper, Servo, GPIO, Events):
 
     @property
     def tcp_load(self):
-        return self._tcp_load
+        tcp_load = self._snapshot.tcp_load
+        return [tcp_load[0], tcp_load[1:]]
 
     @property
     def collision_sensitivity(self):
@@ -216,11 +278,11 @@ class XArm(Gripper, Servo, GPIO, Events):
 
     @property
     def motor_brake_states(self):
-        return self._arm_motor_brake_states
+        return self._snapshot.motor_brake_states
 
     @property
     def motor_enable_states(self):
-        return self._arm_motor_enable_states
+        return self._snapshot.motor_enable_states
 
     @property
     def error_code(self):
@@ -281,6 +343,10 @@ class XArm(Gripper, Servo, GPIO, Events):
         return self._gravity_direction
 
     def connect(self, port=None, baudrate=None, timeout=None):
+        self._reconnect_stop.clear()
+        self._connect(port=port, baudrate=baudrate, timeout=timeout)
+
+    def _connect(self, port=None, baudrate=None, timeout=None):
         if self.connected:
             return
         self._is_ready = True
@@ -289,60 +355,63 @@ class XArm(Gripper, Servo, GPIO, Events):
         self._timeout = timeout if timeout is not None else self._timeout
         if not self._port:
             raise Exception('can not connect to port/ip {}'.format(self._port))
-        if isinstance(self._port, (str, bytes)):
-            if self._port == 'localhost' or re.match(
-                    r"^(?:(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\.){3}(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)$",
-                    self._port):
-                self._stream = SocketPort(self._port, XCONF.SocketConf.TCP_CONTROL_PORT,
-                                          heartbeat=self._enable_heartbeat,
-                                          buffer_size=XCONF.SocketConf.TCP_CONTROL_BUF_SIZE)
-                if not self.connected:
-                    raise Exception('connect socket failed')
-
-                self._report_error_warn_changed_callback()
-
-                self.arm_cmd = UxbusCmdTcp(self._stream)
-                self._stream_type = 'socket'
-
-                self._version = None
-                try:
-                    count = 30
-                    while not self._version and count:
-                        self.get_version()
-                        time.sleep(0.1)
-                        count -= 1
-                    version_date = '-'.join(self._version.split('-')[-3:])
-                    self._is_old_protocol = compare_time('2019-02-01', version_date)
-                except Exception as e:
-                    print('compare_time: {}, {}'.format(self._version, e))
+        self._transport = create_transport(self._port)
+        if self._transport.stream_type == 'socket':
+            if self._io_mode == 'reactor' and self._reactor is None:
+                self._reactor = Reactor(name='xarm-reactor-{}'.format(self._port))
+                self._reactor.start()
+                self._own_reactor = True
+            self._stream = self._transport.open_control(heartbeat=self._enable_heartbeat, reactor=self._reactor,
+                                                        coalesce_window=self._coalesce_window,
+                                                        profile=self._socket_profile)
+            if not self.connected:
+                raise Exception('connect socket failed')
+            if self._reactor is not None:
+                self._stream.close_callback = self._main_stream_closed
 
-                try:
-                    self._connect_report()
-                except:
-                    self._stream_report = None
+            self._report_error_warn_changed_callback()
 
-                if self._stream.connected and self._enable_report:
-                    if self._is_old_protocol:
-                        self._report_thread = threading.Thread(target=self._report_thread_handle_old, daemon=True)
-                    else:
-                        self._report_thread = threading.Thread(target=self._report_thread_handle, daemon=True)
-                    self._report_thread.start()
-                self._report_connect_changed_callback()
+            self.arm_cmd = UxbusCmdTcp(self._stream)
+            self.arm_cmd.wire_recorder = self._wire_recorder
+            self.arm_cmd.set_pipeline_depth(self._pipeline_depth)
+            self._stream_type = 'socket'
+
+            self._version = None
+            try:
+                count = 30
+                while not self._version and count:
+                    self.get_version()
+                    time.sleep(0.1)
+                    count -= 1
+                version_date = '-'.join(self._version.split('-')[-3:])
+                self._is_old_protocol = compare_time('2019-02-01', version_date)
+            except Exception as e:
+                print('compare_time: {}, {}'.format(self._version, e))
+
+            try:
+                self._connect_report()
+            except:
+                self._stream_report = None
+
+            if self._stream.connected and self._enable_report and self._reactor is None:
+                self._report_thread = threading.Thread(target=self._report_thread_handle, daemon=True)
+                self._report_thread.start()
+            self._report_connect_changed_callback()
+        else:
+            self._stream = self._transport.open_control()
+            if not self.connected:
+                raise Exception('connect serail failed')
+
+            self._report_error_warn_changed_callback()
+
+            self.arm_cmd = UxbusCmdSer(self._stream)
+            self._stream_type = 'serial'
+            if self._enable_report:
+                self._report_thread = threading.Thread(target=self._auto_get_report_thread, daemon=True)
+                self._report_thread.start()
+                self._report_connect_changed_callback(True, True)
             else:
-                self._stream = SerialPort(self._port)
-                if not self.connected:
-                    raise Exception('connect serail failed')
-
-                self._report_error_warn_changed_callback()
-
-                self.arm_cmd = UxbusCmdSer(self._stream)
-                self._stream_type = 'serial'
-                if self._enable_report:
-                    self._report_thread = threading.Thread(target=self._auto_get_report_thread, daemon=True)
-                    self._report_thread.start()
-                    self._report_connect_changed_callback(True, True)
-                else:
-                    self._report_connect_changed_callback(True, False)
+                self._report_connect_changed_callback(True, False)
 
     def _connect_report(self):
         if self._enable_report:
@@ -351,34 +420,124 @@ class XArm(Gripper, Servo, GPIO, Events):
                     self._stream_report.close()
                 except:
                     pass
-                time.sleep(3)
             if self._report_type == 'real':
                 self.__connect_report_real()
             elif self._report_type == 'normal':
                 self.__connect_report_normal()
             else:
                 self.__connect_report_rich()
+            if self._reactor is not None and self._stream_report:
+                self._stream_report.rx_callback = self._handle_report_data
+                self._stream_report.close_callback = self._report_stream_closed
+
+    def _main_stream_closed(self):
+        # reactor mode: the main socket is lost, same as the end of the report thread
+        self._main_stream_lost()
+
+    def _main_stream_lost(self):
+        if not self._auto_reconnect or self._reconnect_stop.is_set():
+            self.disconnect()
+            return
+        logger.error('main socket of {} is lost, reconnecting'.format(self._port))
+        self._close_streams(stop_reactor=False)
+        # the first report after the reconnection syncs the last position/angles and the limits again
+        self._is_sync = False
+        self._is_first_report = True
+        self._report_connect_changed_callback(False, False)
+        with self._reconnect_lock:
+            if self._reconnect_thread is None:
+                self._reconnect_thread = threading.Thread(target=self._reconnect_main, daemon=True)
+                self._reconnect_thread.start()
+
+    def _reconnect_main(self):
+        backoff = Backoff()
+        while not self._reconnect_stop.wait(backoff.next()):
+            try:
+                self._connect()
+            except Exception as e:
+                logger.error('reconnect {}: {}'.format(self._port, e))
+            with self._reconnect_lock:
+                # the lost connection after the lock is handled by a new reconnection
+                if self.connected:
+                    self._reconnect_thread = None
+                    break
+            if self._stream:
+                self._close_streams(stop_reactor=False)
+        else:
+            with self._reconnect_lock:
+                self._reconnect_thread = None
+            return
+        if self._reconnect_stop.is_set():
+            # disconnect was called during the connection
+            self._close_streams()
+        else:
+            logger.info('reconnect {} success'.format(self._port))
+
+    def _wait_reconnect_report(self, backoff):
+        # wait before the next connection of the report socket, return False if the main socket is gone
+        expired = time.time() + backoff.next()
+        while self.connected and not self._reconnect_stop.is_set():
+            remaining = expired - time.time()
+            if remaining <= 0:
+                return True
+            self._reconnect_stop.wait(min(remaining, 0.1))
+        return False
+
+    def _report_stream_closed(self):
+        # reactor mode: reconnect the report socket out of the reactor thread
+        self._report_connect_changed_callback(self.connected, False)
+        if self.connected:
+            threading.Thread(target=self._reconnect_report, daemon=True).start()
+
+    def _reconnect_report(self):
+        backoff = Backoff()
+        while self._wait_reconnect_report(backoff):
+            try:
+                self._connect_report()
+            except Exception as e:
+                logger.error('reconnect report: {}'.format(e))
+            if self._stream_report and self._stream_report.connected:
+                self._report_connect_changed_callback()
+                break
+
+    def wait_connected(self, timeout=None):
+        """
+        Wait until the control socket is connected (such as the reconnection of auto_reconnect)
+        A control socket closed by the peer is not connected, even before the receive thread gives it up,
+        a peer which is gone silently (without closing the socket) is only seen once the socket fails
+        :param timeout: seconds, None means wait forever
+        :return: True if connected
+        """
+        expired = None if timeout is None else time.monotonic() + timeout
+        while not self.connected:
+            if not self._auto_reconnect or self._reconnect_stop.is_set():
+                return False
+            remaining = 0.1 if expired is None else min(expired - time.monotonic(), 0.1)
+            if remaining <= 0:
+                return False
+            self._reconnect_stop.wait(remaining)
+        return True
 
     def __connect_report_normal(self):
         if self._stream_type == 'socket':
-            self._stream_report = SocketPort(self._port,
-                                             XCONF.SocketConf.TCP_REPORT_NORM_PORT,
-                                             buffer_size=XCONF.SocketConf.TCP_REPORT_NORMAL_BUF_SIZE
-                                             if not self._is_old_protocol else 87)
+            self._stream_report = self._transport.open_report(XCONF.SocketConf.TCP_REPORT_NORM_PORT,
+                                                              buffer_size=XCONF.SocketConf.TCP_REPORT_NORMAL_BUF_SIZE
+                                                              if not self._is_old_protocol else 87,
+                                                              reactor=self._reactor, profile=self._socket_profile)
 
     def __connect_report_rich(self):
         if self._stream_type == 'socket':
-            self._stream_report = SocketPort(self._port,
-                                             XCONF.SocketConf.TCP_REPORT_RICH_PORT,
-                                             buffer_size=XCONF.SocketConf.TCP_REPORT_RICH_BUF_SIZE
-                                             if not self._is_old_protocol else 187)
+            self._stream_report = self._transport.open_report(XCONF.SocketConf.TCP_REPORT_RICH_PORT,
+                                                              buffer_size=XCONF.SocketConf.TCP_REPORT_RICH_BUF_SIZE
+                                                              if not self._is_old_protocol else 187,
+                                                              reactor=self._reactor, profile=self._socket_profile)
 
     def __connect_report_real(self):
         if self._stream_type == 'socket':
-            self._stream_report = SocketPort(self._port,
-                                             XCONF.SocketConf.TCP_REPORT_REAL_PORT,
-                                             buffer_size=XCONF.SocketConf.TCP_REPORT_REAL_BUF_SIZE
-                                             if not self._is_old_protocol else 87)
+            self._stream_report = self._transport.open_report(XCONF.SocketConf.TCP_REPORT_REAL_PORT,
+                                                              buffer_size=XCONF.SocketConf.TCP_REPORT_REAL_BUF_SIZE
+                                                              if not self._is_old_protocol else 87,
+                                                              reactor=self._reactor, profile=self._socket_profile)
 
     def _report_connect_changed_callback(self, main_connected=None, report_connected=None):
         if REPORT_CONNECT_CHANGED_ID in self._report_callbacks.keys():
@@ -413,8 +572,8 @@ class XArm(Gripper, Servo, GPIO, Events):
 
     def _report_mtable_mtbrake_changed_callback(self):
         if REPORT_MTABLE_MTBRAKE_CHANGED_ID in self._report_callbacks.keys():
-            mtable = [bool(i) for i in self._arm_motor_enable_states]
-            mtbrake = [bool(i) for i in self._arm_motor_brake_states]
+            mtable = [bool(i) for i in self._snapshot.motor_enable_states]
+            mtbrake = [bool(i) for i in self._snapshot.motor_brake_states]
             for callback in self._report_callbacks[REPORT_MTABLE_MTBRAKE_CHANGED_ID]:
                 try:
                     callback({
@@ -451,9 +610,9 @@ class XArm(Gripper, Servo, GPIO, Events):
                 callback = item['callback']
                 ret = {}
                 if item['cartesian']:
-                    ret['cartesian'] = self._position.copy()
+                    ret['cartesian'] = round_pose(self._position)
                 if item['joints']:
-                    ret['joints'] = self._angles.copy()
+                    ret['joints'] = round_angles(self._angles)
                 try:
                     callback(ret)
                 except Exception as e:
@@ -465,9 +624,9 @@ class XArm(Gripper, Servo, GPIO, Events):
                 callback = item['callback']
                 ret = {}
                 if item['cartesian']:
-                    ret['cartesian'] = self._position.copy()
+                    ret['cartesian'] = round_pose(self._position)
                 if item['joints']:
-                    ret['joints'] = self._angles.copy()
+                    ret['joints'] = round_angles(self._angles)
                 if item['error_code']:
                     ret['error_code'] = self._error_code
                 if item['warn_code']:
@@ -475,11 +634,9 @@ class XArm(Gripper, Servo, GPIO, Events):
                 if item['state']:
                     ret['state'] = self._state
                 if item['mtable']:
-                    mtable = [bool(i) for i in self._arm_motor_enable_states]
-                    ret['mtable'] = mtable.copy()
+                    ret['mtable'] = [bool(i) for i in self._snapshot.motor_enable_states]
                 if item['mtbrake']:
-                    mtbrake = [bool(i) for i in self._arm_motor_brake_states]
-                    ret['mtbrake'] = mtbrake.copy()
+                    ret['mtbrake'] = [bool(i) for i in self._snapshot.motor_brake_states]
                 if item['cmdnum']:
                     ret['cmdnum'] = self._cmd_num
                 try:
@@ -487,353 +644,240 @@ class XArm(Gripper, Servo, GPIO, Events):
                 except Exception as e:
                     logger.error('report callback: {}'.format(e))
 
-    def _report_thread_handle_old(self):
-        def __handle_report_normal(rx_data):
-            # print('length:', convert.bytes_to_u32(rx_data[0:4]))
-            state, mtbrake, mtable, error_code, warn_code = rx_data[4:9]
-            angles = convert.bytes_to_fp32s(rx_data[9:7 * 4 + 9], 7)
-            pose = convert.bytes_to_fp32s(rx_data[37:6 * 4 + 37], 6)
-            cmd_num = convert.bytes_to_u16(rx_data[61:63])
-            pose_offset = convert.bytes_to_fp32s(rx_data[63:6 * 4 + 63], 6)
-
-            if error_code != self._error_code or warn_code != self._warn_code:
-                self._warn_code = warn_code
-                self._error_code = error_code
-                self._report_error_warn_changed_callback()
-                if self._error_code != 0:
-                    pretty_print('Error, Code: {}'.format(self._error_code), color='red')
-                else:
-                    pretty_print('Error had clean', color='blue')
-                if self._warn_code != 0:
-                    pretty_print('WarnCode: {}'.format(self._error_code), color='yellow')
-                else:
-                    pretty_print('Warnning had clean', color='blue')
-            elif not self._only_report_err_warn_changed:
-                self._report_error_warn_changed_callback()
-
-            if cmd_num != self._cmd_num:
-                self._cmd_num = cmd_num
-                self._report_cmdnum_changed_callback()
-
-            if state != self._state:
-                self._state = state
-                self._report_state_changed_callback()
-
-            mtbrake = [mtbrake & 0x01, mtbrake >> 1 & 0x01, mtbrake >> 2 & 0x01, mtbrake >> 3 & 0x01,
-                       mtbrake >> 4 & 0x01, mtbrake >> 5 & 0x01, mtbrake >> 6 & 0x01, mtbrake >> 7 & 0x01]
-            mtable = [mtable & 0x01, mtable >> 1 & 0x01, mtable >> 2 & 0x01, mtable >> 3 & 0x01,
-                      mtable >> 4 & 0x01, mtable >> 5 & 0x01, mtable >> 6 & 0x01, mtable >> 7 & 0x01]
-
-            if mtbrake != self._arm_motor_brake_states or mtable != self._arm_motor_enable_states:
-                self._arm_motor_enable_states = mtable
-                self._arm_motor_brake_states = mtbrake
-                self._report_mtable_mtbrake_changed_callback()
-
-            if not self._is_first_report:
-                axis = XCONF.RobotType.AXIS_MAP.get(self.device_type, self.axis)
-                if state == 4 or not all([bool(item[0] & item[1]) for item in zip(mtbrake, mtable)][:axis]):
-                    if self._is_ready:
-                        logger.info('[report], xArm is not ready to move', color='orange')
-                    self._is_ready = False
-                else:
-                    if not self._is_ready:
-                        logger.info('[report], xArm is ready to move', color='green')
-                    self._is_ready = True
+    def _handle_report_normal_old(self, rx_data, report=None):
+        report = REPORT_NORMAL_OLD.unpack(rx_data) if report is None else report
+        with self._snapshot_lock:
+            last = self._snapshot
+            snapshot = last.copy()
+            snapshot.state = report['state']
+            snapshot.mtbrake = report['mtbrake']
+            snapshot.mtable = report['mtable']
+            snapshot.error_code = report['error_code']
+            snapshot.warn_code = report['warn_code']
+            snapshot.cmd_num = report['cmd_num']
+            self._update_report_location(snapshot, report)
+            self._snapshot = snapshot
+        self._publish_report(snapshot, last)
+
+    def _handle_report_rich_old(self, rx_data):
+        report = REPORT_RICH_OLD.unpack(rx_data)
+        self._handle_report_normal_old(rx_data, report)
+        self._arm_type = report['arm_type']
+        self._arm_master_id = report['arm_master_id']
+        self._arm_slave_id = report['arm_slave_id']
+        self._arm_motor_tid = report['arm_motor_tid']
+        self._arm_motor_fid = report['arm_motor_fid']
+
+        self._arm_axis = XCONF.RobotType.AXIS_MAP.get(self.device_type, report['arm_axis'])
+
+        ver_msg = report['version']
+        # self._version = str(ver_msg, 'utf-8')
+
+        trs_msg = report['trs_msg']
+        # trs_msg = [i[0] for i in trs_msg]
+        (self._tcp_jerk,
+         self._min_tcp_acc,
+         self._max_tcp_acc,
+         self._min_tcp_speed,
+         self._max_tcp_speed) = trs_msg
+        # print('tcp_jerk: {}, min_acc: {}, max_acc: {}, min_speed: {}, max_speed: {}'.format(
+        #     self._tcp_jerk, self._min_tcp_acc, self._max_tcp_acc, self._min_tcp_speed, self._max_tcp_speed
+        # ))
+
+        p2p_msg = report['p2p_msg']
+        # p2p_msg = [i[0] for i in p2p_msg]
+        (self._joint_jerk,
+         self._min_joint_acc,
+         self._max_joint_acc,
+         self._min_joint_speed,
+         self._max_joint_speed) = p2p_msg
+        # print('joint_jerk: {}, min_acc: {}, max_acc: {}, min_speed: {}, max_speed: {}'.format(
+        #     self._joint_jerk, self._min_joint_acc, self._max_joint_acc,
+        #     self._min_joint_speed, self._max_joint_speed
+        # ))
+
+        rot_msg = report['rot_msg']
+        # rot_msg = [i[0] for i in rot_msg]
+        self._rot_jerk, self._max_rot_acc = rot_msg
+        # print('rot_jerk: {}, mac_acc: {}'.format(self._rot_jerk, self._max_rot_acc))
+
+        sv3_msg = report['sv3_msg']
+
+    def _handle_report_normal(self, rx_data, report=None):
+        report = REPORT_NORMAL.unpack(rx_data) if report is None else report
+        with self._snapshot_lock:
+            last = self._snapshot
+            snapshot = last.copy()
+            snapshot.state, snapshot.mode = report['state_mode'] & 0x0F, report['state_mode'] >> 4
+            snapshot.cmd_num = report['cmd_num']
+            snapshot.mtbrake = report['mtbrake']
+            snapshot.mtable = report['mtable']
+            snapshot.error_code = report['error_code']
+            snapshot.warn_code = report['warn_code']
+            snapshot.joints_torque = report['torque']
+            snapshot.tcp_load = report['tcp_load']
+            snapshot.collision_sensitivity = report['collis_sens']
+            snapshot.teach_sensitivity = report['teach_sens']
+            if 'gravity_direction' in report:
+                snapshot.gravity_direction = report['gravity_direction']
+            self._update_report_location(snapshot, report)
+            self._snapshot = snapshot
+        self._publish_report(snapshot, last)
+
+    @staticmethod
+    def _update_report_location(snapshot, report):
+        if 10 <= snapshot.error_code <= 17:
+            return
+        pose, angles, pose_offset = report['pose'], report['angles'], report['pose_offset']
+        if math.inf not in pose and -math.inf not in pose:
+            snapshot.position = pose
+        if math.inf not in angles and -math.inf not in angles:
+            snapshot.angles = angles
+        if math.inf not in pose_offset and -math.inf not in pose_offset:
+            snapshot.position_offset = pose_offset
+
+    def _update_snapshot(self, **fields):
+        """
+        Publish a copy of the snapshot with the fields set by the API (one swap for all the fields)
+        """
+        with self._snapshot_lock:
+            self._snapshot = self._snapshot.copy(**fields)
+
+    def _publish_report(self, snapshot, last):
+        # snapshot is already published (under the snapshot lock), the callbacks run out of the lock
+        if self._history is not None:
+            self._history.append(time.time(), snapshot)
+        if self.arm_cmd:
+            self.arm_cmd.has_err_warn = snapshot.error_code != 0 or snapshot.warn_code != 0
+
+        if snapshot.error_code != last.error_code or snapshot.warn_code != last.warn_code:
+            self._report_error_warn_changed_callback()
+            if snapshot.error_code != 0:
+                pretty_print('Error, Code: {}'.format(snapshot.error_code), color='red')
             else:
-                self._is_ready = False
-            self._is_first_report = False
-
-            self._error_code = error_code
-            self._warn_code = warn_code
-            self.arm_cmd.has_err_warn = error_code != 0 or warn_code != 0
-            self._state = state
-            self._cmd_num = cmd_num
-            self._arm_motor_brake_states = mtbrake
-            self._arm_motor_enable_states = mtable
-
-            for i in range(len(pose)):
-                if i < 3:
-                    pose[i] = float('{:.3f}'.format(pose[i]))
-                    # pose[i] = float('{:.3f}'.format(pose[i][0]))
-                else:
-                    pose[i] = float('{:.6f}'.format(pose[i]))
-                    # pose[i] = float('{:.6f}'.format(pose[i][0]))
-            for i in range(len(angles)):
-                angles[i] = float('{:.6f}'.format(angles[i]))
-                # angles[i] = float('{:.6f}'.format(angles[i][0]))
-            for i in range(len(pose_offset)):
-                if i < 3:
-                    pose_offset[i] = float('{:.3f}'.format(pose_offset[i]))
-                    # pose_offset[i] = float('{:.3f}'.format(pose_offset[i][0]))
-                else:
-                    pose_offset[i] = float('{:.6f}'.format(pose_offset[i]))
-                    # pose_offset[i] = float('{:.6f}'.format(pose_offset[i][0]))
-
-            if math.inf not in pose and -math.inf not in pose and not (10 <= self._error_code <= 17):
-                self._position = pose
-            if math.inf not in angles and -math.inf not in angles and not (10 <= self._error_code <= 17):
-                self._angles = angles
-            if math.inf not in pose_offset and -math.inf not in pose_offset and not (10 <= self._error_code <= 17):
-                self._position_offset = pose_offset
-
-            self._report_location_callback()
-
-            self._report_callback()
-            if not self._is_sync:
-                self._sync()
-                self._is_sync = True
-
-        def __handle_report_rich(rx_data):
-            __handle_report_normal(rx_data)
-            (self._arm_type,
-             self._arm_axis,
-             self._arm_master_id,
-             self._arm_slave_id,
-             self._arm_motor_tid,
-             self._arm_motor_fid) = rx_data[87:93]
-
-            self._arm_axis = XCONF.RobotType.AXIS_MAP.get(self.device_type, self._arm_axis)
-
-            ver_msg = rx_data[93:122]
-            # self._version = str(ver_msg, 'utf-8')
-
-            trs_msg = convert.bytes_to_fp32s(rx_data[123:143], 5)
-            # trs_msg = [i[0] for i in trs_msg]
-            (self._tcp_jerk,
-             self._min_tcp_acc,
-             self._max_tcp_acc,
-             self._min_tcp_speed,
-             self._max_tcp_speed) = trs_msg
-            # print('tcp_jerk: {}, min_acc: {}, max_acc: {}, min_speed: {}, max_speed: {}'.format(
-            #     self._tcp_jerk, self._min_tcp_acc, self._max_tcp_acc, self._min_tcp_speed, self._max_tcp_speed
-            # ))
-
-            p2p_msg = convert.bytes_to_fp32s(rx_data[143:163], 5)
-            # p2p_msg = [i[0] for i in p2p_msg]
-            (self._joint_jerk,
-             self._min_joint_acc,
-             self._max_joint_acc,
-             self._min_joint_speed,
-             self._max_joint_speed) = p2p_msg
-            # print('joint_jerk: {}, min_acc: {}, max_acc: {}, min_speed: {}, max_speed: {}'.format(
-            #     self._joint_jerk, self._min_joint_acc, self._max_joint_acc,
-            #     self._min_joint_speed, self._max_joint_speed
-            # ))
-
-            rot_msg = convert.bytes_to_fp32s(rx_data[163:171], 2)
-            # rot_msg = [i[0] for i in rot_msg]
-            self._rot_jerk, self._max_rot_acc = rot_msg
-            # print('rot_jerk: {}, mac_acc: {}'.format(self._rot_jerk, self._max_rot_acc))
-
-            sv3_msg = convert.bytes_to_u16s(rx_data[171:187], 8)
-
-        main_socket_connected = self._stream and self._stream.connected
-        report_socket_connected = self._stream_report and self._stream_report.connected
-        while self._stream and self._stream.connected:
-            try:
-                if not self._stream_report or not self._stream_report.connected:
-                    if report_socket_connected:
-                        report_socket_connected = False
-                        self._report_connect_changed_callback(main_socket_connected, report_socket_connected)
-                    self._connect_report()
-                    continue
-                if not report_socket_connected:
-                    report_socket_connected = True
-                    self._report_connect_changed_callback(main_socket_connected, report_socket_connected)
-                rx_data = self._stream_report.read()
-                if rx_data != -1 and len(rx_data) >= 87:
-                    if len(rx_data) == 87:
-                        __handle_report_normal(rx_data)
-                    elif len(rx_data) >= 187:
-                        __handle_report_rich(rx_data)
-            except Exception as e:
-                logger.error(e)
-            time.sleep(0.001)
-        self.disconnect()
-        self._report_connect_changed_callback(False, False)
-
-    def _report_thread_handle(self):
-        def __handle_report_normal(rx_data):
-            # print('length:', convert.bytes_to_u32(rx_data[0:4]))
-            state, mode = rx_data[4] & 0x0F, rx_data[4] >> 4
-            cmd_num = convert.bytes_to_u16(rx_data[5:7])
-            angles = convert.bytes_to_fp32s(rx_data[7:7 * 4 + 7], 7)
-            pose = convert.bytes_to_fp32s(rx_data[35:6 * 4 + 35], 6)
-            torque = convert.bytes_to_fp32s(rx_data[59:7 * 4 + 59], 7)
-            mtbrake, mtable, error_code, warn_code = rx_data[87:91]
-            pose_offset = convert.bytes_to_fp32s(rx_data[91:6 * 4 + 91], 6)
-            tcp_load = convert.bytes_to_fp32s(rx_data[115:4 * 4 + 115], 4)
-            collis_sens, teach_sens = rx_data[131:133]
-            self._gravity_direction = convert.bytes_to_fp32s(rx_data[133:3*4 + 133], 3)
-
-            # print('torque: {}'.format(torque))
-            # print('tcp_load: {}'.format(tcp_load))
-            # print('collis_sens: {}, teach_sens: {}'.format(collis_sens, teach_sens))
-
-            if error_code != self._error_code or warn_code != self._warn_code:
-                self._warn_code = warn_code
-                self._error_code = error_code
-                self._report_error_warn_changed_callback()
-                if self._error_code != 0:
-                    pretty_print('Error, Code: {}'.format(self._error_code), color='red')
-                else:
-                    pretty_print('Error had clean', color='blue')
-                if self._warn_code != 0:
-                    pretty_print('WarnCode: {}'.format(self._error_code), color='yellow')
-                else:
-                    pretty_print('Warnning had clean', color='blue')
-            elif not self._only_report_err_warn_changed:
-                self._report_error_warn_changed_callback()
-
-            if cmd_num != self._cmd_num:
-                self._cmd_num = cmd_num
-                self._report_cmdnum_changed_callback()
-
-            if state != self._state:
-                self._state = state
-                self._report_state_changed_callback()
-            if mode != self._mode:
-                self._mode = mode
-                self._report_mode_changed_callback()
-
-            mtbrake = [mtbrake & 0x01, mtbrake >> 1 & 0x01, mtbrake >> 2 & 0x01, mtbrake >> 3 & 0x01,
-                       mtbrake >> 4 & 0x01, mtbrake >> 5 & 0x01, mtbrake >> 6 & 0x01, mtbrake >> 7 & 0x01]
-            mtable = [mtable & 0x01, mtable >> 1 & 0x01, mtable >> 2 & 0x01, mtable >> 3 & 0x01,
-                      mtable >> 4 & 0x01, mtable >> 5 & 0x01, mtable >> 6 & 0x01, mtable >> 7 & 0x01]
-
-            if mtbrake != self._arm_motor_brake_states or mtable != self._arm_motor_enable_states:
-                self._arm_motor_enable_states = mtable
-                self._arm_motor_brake_states = mtbrake
-                self._report_mtable_mtbrake_changed_callback()
-
-            if not self._is_first_report:
-                axis = XCONF.RobotType.AXIS_MAP.get(self.device_type, self.axis)
-                if state == 4 or not all([bool(item[0] & item[1]) for item in zip(mtbrake, mtable)][:axis]):
-                    if self._is_ready:
-                        logger.info('[report], xArm is not ready to move', color='orange')
-                    self._is_ready = False
-                else:
-                    if not self._is_ready:
-                        logger.info('[report], xArm is ready to move', color='green')
-                    self._is_ready = True
+                pretty_print('Error had clean', color='blue')
+            if snapshot.warn_code != 0:
+                pretty_print('WarnCode: {}'.format(snapshot.warn_code), color='yellow')
             else:
+                pretty_print('Warnning had clean', color='blue')
+        elif not self._only_report_err_warn_changed:
+            self._report_error_warn_changed_callback()
+
+        if snapshot.cmd_num != last.cmd_num:
+            self._report_cmdnum_changed_callback()
+        if snapshot.state != last.state:
+            self._report_state_changed_callback()
+        if snapshot.mode != last.mode:
+            self._report_mode_changed_callback()
+        if snapshot.mtbrake != last.mtbrake or snapshot.mtable != last.mtable:
+            self._report_mtable_mtbrake_changed_callback()
+
+        if not self._is_first_report:
+            axis_mask = (1 << XCONF.RobotType.AXIS_MAP.get(self.device_type, self.axis)) - 1
+            if snapshot.state == 4 or snapshot.mtbrake & snapshot.mtable & axis_mask != axis_mask:
+                if self._is_ready:
+                    logger.info('[report], xArm is not ready to move', color='orange')
                 self._is_ready = False
-            self._is_first_report = False
-
-            self._error_code = error_code
-            self._warn_code = warn_code
-            self.arm_cmd.has_err_warn = error_code != 0 or warn_code != 0
-            self._state = state
-            self._mode = mode
-            self._cmd_num = cmd_num
-            self._arm_motor_brake_states = mtbrake
-            self._arm_motor_enable_states = mtable
-            self._joints_torque = torque
-            self._tcp_load = [tcp_load[0], tcp_load[1:]]
-            self._collision_sensitivity = collis_sens
-            self._teach_sensitivity = teach_sens
-
-            for i in range(len(pose)):
-                if i < 3:
-                    pose[i] = float('{:.3f}'.format(pose[i]))
-                    # pose[i] = float('{:.3f}'.format(pose[i][0]))
-                else:
-                    pose[i] = float('{:.6f}'.format(pose[i]))
-                    # pose[i] = float('{:.6f}'.format(pose[i][0]))
-            for i in range(len(angles)):
-                angles[i] = float('{:.6f}'.format(angles[i]))
-                # angles[i] = float('{:.6f}'.format(angles[i][0]))
-            for i in range(len(pose_offset)):
-                if i < 3:
-                    pose_offset[i] = float('{:.3f}'.format(pose_offset[i]))
-                    # pose_offset[i] = float('{:.3f}'.format(pose_offset[i][0]))
-                else:
-                    pose_offset[i] = float('{:.6f}'.format(pose_offset[i]))
-                    # pose_offset[i] = float('{:.6f}'.format(pose_offset[i][0]))
-
-            if math.inf not in pose and -math.inf not in pose and not (10 <= self._error_code <= 17):
-                self._position = pose
-            if math.inf not in angles and -math.inf not in angles and not (10 <= self._error_code <= 17):
-                self._angles = angles
-            if math.inf not in pose_offset and -math.inf not in pose_offset and not (10 <= self._error_code <= 17):
-                self._position_offset = pose_offset
-
-            self._report_location_callback()
-
-            self._report_callback()
-            if not self._is_sync:
-                self._sync()
-                self._is_sync = True
-
-        def __handle_report_rich(rx_data):
-            __handle_report_normal(rx_data)
-            (self._arm_type,
-             self._arm_axis,
-             self._arm_master_id,
-             self._arm_slave_id,
-             self._arm_motor_tid,
-             self._arm_motor_fid) = rx_data[145:151]
-
-            self._arm_axis = XCONF.RobotType.AXIS_MAP.get(self.device_type, self._arm_axis)
-
-            # self._version = str(rx_data[151:180], 'utf-8')
-
-            trs_msg = convert.bytes_to_fp32s(rx_data[181:201], 5)
-            # trs_msg = [i[0] for i in trs_msg]
-            (self._tcp_jerk,
-             self._min_tcp_acc,
-             self._max_tcp_acc,
-             self._min_tcp_speed,
-             self._max_tcp_speed) = trs_msg
-            # print('tcp_jerk: {}, min_acc: {}, max_acc: {}, min_speed: {}, max_speed: {}'.format(
-            #     self._tcp_jerk, self._min_tcp_acc, self._max_tcp_acc, self._min_tcp_speed, self._max_tcp_speed
-            # ))
-
-            p2p_msg = convert.bytes_to_fp32s(rx_data[201:221], 5)
-            # p2p_msg = [i[0] for i in p2p_msg]
-            (self._joint_jerk,
-             self._min_joint_acc,
-             self._max_joint_acc,
-             self._min_joint_speed,
-             self._max_joint_speed) = p2p_msg
-            # print('joint_jerk: {}, min_acc: {}, max_acc: {}, min_speed: {}, max_speed: {}'.format(
-            #     self._joint_jerk, self._min_joint_acc, self._max_joint_acc,
-            #     self._min_joint_speed, self._max_joint_speed
-            # ))
-
-            rot_msg = convert.bytes_to_fp32s(rx_data[221:229], 2)
-            # rot_msg = [i[0] for i in rot_msg]
-            self._rot_jerk, self._max_rot_acc = rot_msg
-            # print('rot_jerk: {}, mac_acc: {}'.format(self._rot_jerk, self._max_rot_acc))
-
-            sv3_msg = rx_data[229:245]
+            else:
+                if not self._is_ready:
+                    logger.info('[report], xArm is ready to move', color='green')
+                self._is_ready = True
+        else:
+            self._is_ready = False
+        self._is_first_report = False
+
+        self._report_location_callback()
+
+        self._report_callback()
+        if not self._is_sync:
+            self._sync()
+            self._is_sync = True
+
+    def _handle_report_rich(self, rx_data):
+        report = REPORT_RICH.unpack(rx_data)
+        self._handle_report_normal(rx_data, report)
+        self._arm_type = report['arm_type']
+        self._arm_master_id = report['arm_master_id']
+        self._arm_slave_id = report['arm_slave_id']
+        self._arm_motor_tid = report['arm_motor_tid']
+        self._arm_motor_fid = report['arm_motor_fid']
+
+        self._arm_axis = XCONF.RobotType.AXIS_MAP.get(self.device_type, report['arm_axis'])
+
+        # self._version = str(report['version'], 'utf-8')
+
+        trs_msg = report['trs_msg']
+        # trs_msg = [i[0] for i in trs_msg]
+        (self._tcp_jerk,
+         self._min_tcp_acc,
+         self._max_tcp_acc,
+         self._min_tcp_speed,
+         self._max_tcp_speed) = trs_msg
+        # print('tcp_jerk: {}, min_acc: {}, max_acc: {}, min_speed: {}, max_speed: {}'.format(
+        #     self._tcp_jerk, self._min_tcp_acc, self._max_tcp_acc, self._min_tcp_speed, self._max_tcp_speed
+        # ))
+
+        p2p_msg = report['p2p_msg']
+        # p2p_msg = [i[0] for i in p2p_msg]
+        (self._joint_jerk,
+         self._min_joint_acc,
+         self._max_joint_acc,
+         self._min_joint_speed,
+         self._max_joint_speed) = p2p_msg
+        # print('joint_jerk: {}, min_acc: {}, max_acc: {}, min_speed: {}, max_speed: {}'.format(
+        #     self._joint_jerk, self._min_joint_acc, self._max_joint_acc,
+        #     self._min_joint_speed, self._max_joint_speed
+        # ))
+
+        rot_msg = report['rot_msg']
+        # rot_msg = [i[0] for i in rot_msg]
+        self._rot_jerk, self._max_rot_acc = rot_msg
+        # print('rot_jerk: {}, mac_acc: {}'.format(self._rot_jerk, self._max_rot_acc))
+
+        sv3_msg = report.get('sv3_msg')
+
+    def _handle_report_data(self, rx_data):
+        recorder = self._report_recorder
+        if recorder is not None:
+            recorder.write(rx_data, report_type=self._report_type, is_old_protocol=self._is_old_protocol)
+        if self._is_old_protocol:
+            if len(rx_data) == 87:
+                self._handle_report_normal_old(rx_data)
+            elif len(rx_data) >= 187:
+                self._handle_report_rich_old(rx_data)
+        elif len(rx_data) >= XCONF.SocketConf.TCP_REPORT_RICH_BUF_SIZE:
+            self._handle_report_rich(rx_data)
+        elif len(rx_data) >= XCONF.SocketConf.TCP_REPORT_NORMAL_BUF_SIZE:
+            self._handle_report_normal(rx_data)
 
+    def _report_thread_handle(self):
         main_socket_connected = self._stream and self._stream.connected
         report_socket_connected = self._stream_report and self._stream_report.connected
-        while self._stream and self._stream.connected:
+        backoff = Backoff()
+        stream = self._stream
+        while stream.connected and not stream.peer_closed:
             try:
                 if not self._stream_report or not self._stream_report.connected:
                     if report_socket_connected:
                         report_socket_connected = False
                         self._report_connect_changed_callback(main_socket_connected, report_socket_connected)
+                    if not self._wait_reconnect_report(backoff):
+                        continue
                     self._connect_report()
                     continue
                 if not report_socket_connected:
                     report_socket_connected = True
+                    backoff.reset()
                     self._report_connect_changed_callback(main_socket_connected, report_socket_connected)
-                rx_data = self._stream_report.read()
-                if rx_data != -1 and len(rx_data) >= XCONF.SocketConf.TCP_REPORT_NORMAL_BUF_SIZE:
-                    # if len(rx_data) >= XCONF.SocketConf.TCP_REPORT_NORMAL_BUF_SIZE:
-                    #     __handle_report_normal(rx_data)
-                    if len(rx_data) >= XCONF.SocketConf.TCP_REPORT_RICH_BUF_SIZE:
-                        __handle_report_rich(rx_data)
-                    else:
-                        __handle_report_normal(rx_data)
+                rx_data = self._stream_report.read(timeout=0.1)
+                if rx_data != -1:
+                    self._handle_report_data(rx_data)
+                    continue
             except Exception as e:
                 logger.error(e)
             time.sleep(0.001)
-        self.disconnect()
-        self._report_connect_changed_callback(False, False)
+        if stream is self._stream:
+            self._main_stream_lost()
 
     def _auto_get_report_thread(self):
         logger.debug('get report thread start')
@@ -853,6 +897,8 @@ class XArm(Gripper, Servo, GPIO, Events):
                 self.get_servo_angle()
                 time.sleep(0.01)
                 self.get_position()
+                if self._history is not None:
+                    self._history.append(time.time(), self._snapshot)
 
                 if cmd_num != self._cmd_num:
                     self._report_cmdnum_changed_callback()
@@ -883,7 +929,58 @@ class XArm(Gripper, Servo, GPIO, Events):
         self._report_connect_changed_callback(False, False)
         logger.debug('get report thread stopped')
 
+    @xarm_is_connected(_type='set')
+    def wait_pipeline(self, timeout=None):
+        return self.arm_cmd.wait_pipeline(timeout=timeout)
+
+    def batch(self):
+        return CommandBatch(self)
+
+    def get_rtt_stats(self, funcode=None, reset=False):
+        if not self.arm_cmd:
+            return None
+        stats = self.arm_cmd.rtt_stats.get(funcode)
+        if reset:
+            self.arm_cmd.rtt_stats.reset()
+        return stats
+
+    def start_report_capture(self, path, **kwargs):
+        self.stop_report_capture()
+        self._report_recorder = ReportRecorder(path, **kwargs)
+
+    def stop_report_capture(self):
+        recorder, self._report_recorder = self._report_recorder, None
+        if recorder is None:
+            return 0
+        recorder.close()
+        return recorder.count
+
+    def start_wire_capture(self, path):
+        self.stop_wire_capture()
+        self._wire_recorder = WireRecorder(path)
+        if isinstance(self.arm_cmd, UxbusCmdTcp):
+            self.arm_cmd.wire_recorder = self._wire_recorder
+
+    def stop_wire_capture(self):
+        recorder, self._wire_recorder = self._wire_recorder, None
+        if recorder is None:
+            return 0
+        if isinstance(self.arm_cmd, UxbusCmdTcp):
+            self.arm_cmd.wire_recorder = None
+        recorder.close()
+        return recorder.count
+
     def disconnect(self):
+        if self._report_recorder is not None:
+            self._report_recorder.flush()
+        if self._wire_recorder is not None:
+            self._wire_recorder.flush()
+        self._reconnect_stop.set()
+        if self._stream:
+            self._close_streams()
+        self._report_connect_changed_callback(False, False)
+
+    def _close_streams(self, stop_reactor=True):
         self._stream.close()
         if self._stream_report:
             try:
@@ -891,6 +988,10 @@ class XArm(Gripper, Servo, GPIO, Events):
             except:
                 pass
         self._is_ready = False
+        if stop_reactor and self._own_reactor and self._reactor:
+            self._reactor.stop()
+            self._reactor = None
+            self._own_reactor = False
         try:
             self._stream.join()
         except:
@@ -900,7 +1001,6 @@ class XArm(Gripper, Servo, GPIO, Events):
                 self._stream_report.join()
             except:
                 pass
-        self._report_connect_changed_callback(False, False)
 
     def _sync(self):
         if not self._stream_report or not self._stream_report.connected:
@@ -918,10 +1018,12 @@ class XArm(Gripper, Servo, GPIO, Events):
 
         def start(self):
             if self.timeout > 0:
-                self.timer = threading.Timer(self.timeout, self.timeout_cb)
-                self.timer.setDaemon(True)
-                self.timer.start()
-            self.check_stop_move()
+                self.timer = get_scheduler().call_later(self.timeout, self.timeout_cb)
+            try:
+                self.check_stop_move()
+            finally:
+                if self.timer is not None:
+                    self.timer.cancel()
 
         def check_stop_move(self):
             base_joint_pos = self.owner.angles.copy()
@@ -986,19 +1088,8 @@ class XArm(Gripper, Servo, GPIO, Events):
                 return
             time.sleep(0.2)
 
-    @xarm_is_ready(_type='set')
-    def set_position(self, x=None, y=None, z=None, roll=None, pitch=None, yaw=None, radius=None,
-                     speed=None, mvacc=None, mvtime=None, relative=False, is_radian=None,
-                     wait=False, timeout=None, **kwargs):
-        ret = self._wait_until_cmdnum_lt_max()
-        if ret is not None:
-            return ret
-
-        is_radian = self._default_is_radian if is_radian is None else is_radian
-        tcp_pos = [x, y, z, roll, pitch, yaw]
+    def _update_last_position(self, tcp_pos, speed, mvacc, mvtime, relative=False, is_radian=False, **kwargs):
         last_used_position = self._last_position.copy()
-        last_used_tcp_speed = self._last_tcp_speed
-        last_used_tcp_acc = self._last_tcp_acc
         for i in range(6):
             value = tcp_pos[i]
             if value is None:
@@ -1067,6 +1158,23 @@ class XArm(Gripper, Servo, GPIO, Events):
                     mvtime = self._mvtime
             self._mvtime = mvtime
 
+    @xarm_is_ready(_type='set')
+    def set_position(self, x=None, y=None, z=None, roll=None, pitch=None, yaw=None, radius=None,
+                     speed=None, mvacc=None, mvtime=None, relative=False, is_radian=None,
+                     wait=False, timeout=None, **kwargs):
+        ret = self._wait_until_cmdnum_lt_max()
+        if ret is not None:
+            return ret
+
+        is_radian = self._default_is_radian if is_radian is None else is_radian
+        last_used_position = self._last_position.copy()
+        last_used_tcp_speed = self._last_tcp_speed
+        last_used_tcp_acc = self._last_tcp_acc
+        ret = self._update_last_position([x, y, z, roll, pitch, yaw], speed, mvacc, mvtime,
+                                         relative=relative, is_radian=is_radian, **kwargs)
+        if ret is not None:
+            return ret
+
         if kwargs.get('check', False):
             _, limit = self.is_tcp_limit(self._last_position)
             if _ == 0 and limit is True:
@@ -1130,20 +1238,8 @@ class XArm(Gripper, Servo, GPIO, Events):
                 return True
         return False
 
-    @xarm_is_ready(_type='set')
-    def set_servo_angle(self, servo_id=None, angle=None, speed=None, mvacc=None, mvtime=None,
-                        relative=False, is_radian=None, wait=False, timeout=None, **kwargs):
-        assert ((servo_id is None or servo_id == 8) and isinstance(angle, Iterable)) \
-            or (1 <= servo_id <= 7 and angle is not None and not isinstance(angle, Iterable)), \
-            'param servo_id or angle error'
-        ret = self._wait_until_cmdnum_lt_max()
-        if ret is not None:
-            return ret
-
+    def _update_last_angles(self, servo_id, angle, speed, mvacc, mvtime, relative=False, is_radian=False, **kwargs):
         last_used_angle = self._last_angles.copy()
-        last_used_joint_speed = self._last_joint_speed
-        last_used_joint_acc = self._last_joint_acc
-        is_radian = self._default_is_radian if is_radian is None else is_radian
         if servo_id is None or servo_id == 8:
             for i in range(min(len(angle), len(self._last_angles))):
                 value = angle[i]
@@ -1241,6 +1337,25 @@ class XArm(Gripper, Servo, GPIO, Events):
                     mvtime = self._mvtime
             self._mvtime = mvtime
 
+    @xarm_is_ready(_type='set')
+    def set_servo_angle(self, servo_id=None, angle=None, speed=None, mvacc=None, mvtime=None,
+                        relative=False, is_radian=None, wait=False, timeout=None, **kwargs):
+        assert ((servo_id is None or servo_id == 8) and isinstance(angle, Iterable)) \
+            or (1 <= servo_id <= 7 and angle is not None and not isinstance(angle, Iterable)), \
+            'param servo_id or angle error'
+        ret = self._wait_until_cmdnum_lt_max()
+        if ret is not None:
+            return ret
+
+        is_radian = self._default_is_radian if is_radian is None else is_radian
+        last_used_angle = self._last_angles.copy()
+        last_used_joint_speed = self._last_joint_speed
+        last_used_joint_acc = self._last_joint_acc
+        ret = self._update_last_angles(servo_id, angle, speed, mvacc, mvtime,
+                                       relative=relative, is_radian=is_radian, **kwargs)
+        if ret is not None:
+            return ret
+
         if kwargs.get('check', False):
             _, limit = self.is_joint_limit(self._last_angles)
             if _ == 0 and limit is True:
@@ -1556,7 +1671,7 @@ class XArm(Gripper, Servo, GPIO, Events):
     def get_err_warn_code(self, show=False):
         ret = self.arm_cmd.get_err_code()
         if ret[0] in [0, XCONF.UxbusState.ERR_CODE, XCONF.UxbusState.WAR_CODE]:
-            self._error_code, self._warn_code = ret[1:3]
+            self._update_snapshot(error_code=ret[1], warn_code=ret[2])
             ret[0] = 0
         if show:
             pretty_print('*************GetErrorWarnCode, status: {}**************'.format(ret[0]), color='light_blue')
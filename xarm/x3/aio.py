@@ -0,0 +1,521 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2019, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+import time
+import asyncio
+from collections.abc import Iterable
+from ..core.config.x_config import XCONF
+from ..core.comm.transport import create_transport, parse_port, TcpTransport
+from ..core.wrapper.uxbus_cmd_aio import UxbusCmdAio
+from ..core.utils import convert
+from ..core.utils.log import logger
+from .code import APIState
+from .utils import xarm_is_connected, xarm_is_ready, compare_time
+from .events import Events
+from .report import round_pose, round_angles
+from . import XArm, RAD_DEGREE
+
+# the inherited sync interfaces which do not talk to the controller, the others raise NotImplementedError
+SYNC_SAFE_METHODS = ('get_rtt_stats', 'start_report_capture', 'stop_report_capture', 'start_wire_capture',
+                     'stop_wire_capture')
+
+
+class _ReportStream(object):
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.connected = True
+
+    def close(self):
+        self.connected = False
+        self.writer.close()
+
+
+class _PortWriter(object):
+    """
+    The writer of the asyncio streams over a port of an in-process transport (loop://, sim://),
+    the frames received by the port are fed to the reader in the event loop
+    """
+    def __init__(self, port, reader, loop):
+        self.port = port
+        self._reader = reader
+        self._loop = loop
+
+    def write(self, data):
+        if self.port.write(data) != 0:
+            raise ConnectionError('{} is closed'.format(self.port.port_type))
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        self.port.close()
+        self._loop.call_soon_threadsafe(self._reader.feed_eof)
+
+
+def _open_port_streams(port):
+    loop = asyncio.get_event_loop()
+    reader = asyncio.StreamReader()
+    port.set_rx_callback(lambda data: loop.call_soon_threadsafe(reader.feed_data, bytes(data)))
+    return reader, _PortWriter(port, reader, loop)
+
+
+def _not_async(name):
+    def method(self, *args, **kwargs):
+        raise NotImplementedError('{} is a sync interface of XArm, it is not available on AsyncXArm, '
+                                  'use XArm/XArmAPI or await the raw command of arm.arm_cmd'.format(name))
+    method.__name__ = name
+    return method
+
+
+class AsyncXArm(XArm):
+    """
+    asyncio client of xArm, all the sockets are asyncio streams of the running event loop
+    The state (position, angles, state, error_code, ...) and the report callbacks are the same as XArm,
+    the interfaces which talk to the controller are coroutines:
+
+        arm = AsyncXArm('192.168.1.113')
+        await arm.connect()
+        await arm.set_position(x=300, y=0, z=200, roll=180, pitch=0, yaw=0, speed=100, wait=True)
+        code, angles = await arm.get_servo_angle()
+        await arm.disconnect()
+
+    The raw commands are available as awaitables too: `await arm.arm_cmd.set_tcp_jerk(1000)`
+    The sync interfaces of XArm without coroutine version raise NotImplementedError,
+    the properties (state, position, ...) return the reported values, await get_state() etc. to refresh them
+    without report. The port is an ip (asyncio sockets) or an in-process transport such as sim://
+    """
+    def __init__(self, port=None, is_radian=False, **kwargs):
+        super(AsyncXArm, self).__init__(port=port, is_radian=is_radian, do_not_open=True, **kwargs)
+        self._report_task = None
+
+    async def connect(self, port=None):
+        if self.connected:
+            return
+        self._is_ready = True
+        self._port = port if port is not None else self._port
+        if not self._port:
+            raise Exception('can not connect to port/ip {}'.format(self._port))
+        self._transport = create_transport(self._port)
+        if isinstance(self._transport, TcpTransport):
+            reader, writer = await asyncio.open_connection(parse_port(self._port)[1], XCONF.SocketConf.TCP_CONTROL_PORT)
+        elif self._transport.stream_type == 'socket':
+            reader, writer = _open_port_streams(self._transport.open_control())
+        else:
+            raise Exception('AsyncXArm does not support the port {}'.format(self._port))
+        logger.info('main-socket connect {} success'.format(self._port))
+        self.arm_cmd = UxbusCmdAio(reader, writer)
+        self.arm_cmd.wire_recorder = self._wire_recorder
+        self.arm_cmd.start()
+        self._stream = self.arm_cmd
+        self._stream_type = 'socket'
+        self._report_error_warn_changed_callback()
+
+        self._version = None
+        try:
+            count = 30
+            while not self._version and count:
+                await self.get_version()
+                count -= 1
+                if not self._version:
+                    await asyncio.sleep(0.1)
+            version_date = '-'.join(self._version.split('-')[-3:])
+            self._is_old_protocol = compare_time('2019-02-01', version_date)
+        except Exception as e:
+            print('compare_time: {}, {}'.format(self._version, e))
+
+        if self._enable_report:
+            self._report_task = asyncio.ensure_future(self._report_loop())
+        self._report_connect_changed_callback()
+
+    async def _connect_report(self):
+        if self._report_type == 'real':
+            port = XCONF.SocketConf.TCP_REPORT_REAL_PORT
+        elif self._report_type == 'normal':
+            port = XCONF.SocketConf.TCP_REPORT_NORM_PORT
+        else:
+            port = XCONF.SocketConf.TCP_REPORT_RICH_PORT
+        if isinstance(self._transport, TcpTransport):
+            reader, writer = await asyncio.open_connection(parse_port(self._port)[1], port)
+        else:
+            report_port = self._transport.open_report(port)
+            if report_port is None:
+                raise ConnectionError('no report of {}'.format(self._port))
+            reader, writer = _open_port_streams(report_port)
+        logger.info('report-socket connect {} success'.format(self._port))
+        self._stream_report = _ReportStream(reader, writer)
+        self._report_connect_changed_callback()
+
+    async def _report_loop(self):
+        while self.connected:
+            try:
+                if not self._stream_report or not self._stream_report.connected:
+                    await self._connect_report()
+                reader = self._stream_report.reader
+                header = await reader.readexactly(4)
+                size = convert.bytes_to_u32(header)
+                if size < 4 or size > XCONF.SocketConf.TCP_REPORT_FRAMER_CAPACITY:
+                    raise ConnectionError('invalid report size {}'.format(size))
+                self._handle_report_data(header + await reader.readexactly(size - 4))
+            except asyncio.CancelledError:
+                break
+            except (asyncio.IncompleteReadError, ConnectionError, OSError) as e:
+                logger.error('report-socket read: {}'.format(e))
+                if self._stream_report:
+                    self._stream_report.close()
+                self._report_connect_changed_callback(self.connected, False)
+                await asyncio.sleep(1)
+            except Exception as e:
+                logger.error(e)
+        if self._stream_report:
+            self._stream_report.close()
+
+    async def disconnect(self):
+        if self._report_task is not None:
+            self._report_task.cancel()
+            try:
+                await self._report_task
+            except asyncio.CancelledError:
+                pass
+            self._report_task = None
+        if self._stream_report:
+            self._stream_report.close()
+        if self.arm_cmd is not None:
+            await self.arm_cmd.close()
+        if self._wire_recorder is not None:
+            self._wire_recorder.flush()
+        self._is_ready = False
+        self._report_connect_changed_callback(False, False)
+
+    @property
+    def version(self):
+        return self._version
+
+    @property
+    def position(self):
+        position = round_pose(self._position)
+        return [position[i] * RAD_DEGREE if 2 < i < 6 and not self._default_is_radian else position[i]
+                for i in range(len(position))]
+
+    @property
+    def angles(self):
+        return [angle if self._default_is_radian else angle * RAD_DEGREE for angle in round_angles(self._angles)]
+
+    @property
+    def state(self):
+        return self._state
+
+    @property
+    def cmd_num(self):
+        return self._cmd_num
+
+    @property
+    def error_code(self):
+        return self._error_code
+
+    @property
+    def warn_code(self):
+        return self._warn_code
+
+    def _sync(self):
+        self._last_position = self._position.copy()
+        self._last_angles = self._angles.copy()
+
+    def _update_ready(self, name):
+        if self._state in [3, 4]:
+            if self._is_ready:
+                logger.info('[{}], xArm is not ready to move'.format(name), color='orange')
+            self._is_ready = False
+        else:
+            if not self._is_ready:
+                logger.info('[{}], xArm is ready to move'.format(name), color='green')
+            self._is_ready = True
+
+    async def _wait_until_cmdnum_lt_max(self):
+        if not self._check_cmdnum_limit:
+            return
+        self._is_stop = False
+        while self.cmd_num >= XCONF.MAX_CMD_NUM:
+            if not self.connected:
+                return APIState.NOT_CONNECTED
+            elif not self.ready:
+                return APIState.NOT_READY
+            elif self._is_stop:
+                return APIState.EMERGENCY_STOP
+            elif self.has_error:
+                return
+            await asyncio.sleep(0.2)
+
+    async def _wait_move(self, timeout=None):
+        if not self._enable_report:
+            logger.warn('if you want to wait, please enable report')
+            return
+        self._is_stop = False
+        timeout = timeout if timeout is not None else 10
+        expired = time.time() + timeout if timeout > 0 else None
+        base_joint_pos = self.angles.copy()
+        await asyncio.sleep(0.1)
+        count = 0
+        while (expired is None or time.time() < expired) and not self._is_stop \
+                and self.connected and not self.has_error:
+            if time.time() < self._sleep_finish_time:
+                await asyncio.sleep(0.01)
+                continue
+            if self.angles == base_joint_pos or self.state != 1:
+                count += 1
+                if count >= 6:
+                    break
+            else:
+                base_joint_pos = self._angles.copy()
+                count = 0
+            await asyncio.sleep(0.05)
+        self._is_stop = False
+
+    @xarm_is_connected(_type='get')
+    async def get_version(self):
+        ret = await self.arm_cmd.get_version()
+        if ret[0] in [0, XCONF.UxbusState.ERR_CODE, XCONF.UxbusState.WAR_CODE]:
+            version = ''.join(list(map(chr, ret[1:])))
+            self._version = version[:version.find('\0')]
+            ret[0] = 0
+        return ret[0], self._version
+
+    @xarm_is_connected(_type='get')
+    async def get_state(self):
+        ret = await self.arm_cmd.get_state()
+        if ret[0] in [0, XCONF.UxbusState.ERR_CODE, XCONF.UxbusState.WAR_CODE]:
+            self._state = ret[1]
+            ret[0] = 0
+        return ret[0], self._state
+
+    @xarm_is_connected(_type='set')
+    async def set_state(self, state=0):
+        ret = await self.arm_cmd.set_state(state)
+        if state == 4 and ret[0] in [0, XCONF.UxbusState.ERR_CODE, XCONF.UxbusState.WAR_CODE]:
+            self._sleep_finish_time = 0
+        await self.get_state()
+        self._update_ready('set_state')
+        return ret[0]
+
+    @xarm_is_connected(_type='set')
+    async def set_mode(self, mode=0):
+        ret = await self.arm_cmd.set_mode(mode)
+        if ret[0] in [0, XCONF.UxbusState.ERR_CODE, XCONF.UxbusState.WAR_CODE]:
+            ret[0] = 0
+        return ret[0]
+
+    @xarm_is_connected(_type='get')
+    async def get_cmdnum(self):
+        ret = await self.arm_cmd.get_cmdnum()
+        if ret[0] in [0, XCONF.UxbusState.ERR_CODE, XCONF.UxbusState.WAR_CODE]:
+            self._cmd_num = ret[1]
+            ret[0] = 0
+        return ret[0], self._cmd_num
+
+    @xarm_is_connected(_type='get')
+    async def get_err_warn_code(self):
+        ret = await self.arm_cmd.get_err_code()
+        if ret[0] in [0, XCONF.UxbusState.ERR_CODE, XCONF.UxbusState.WAR_CODE]:
+            self._update_snapshot(error_code=ret[1], warn_code=ret[2])
+            ret[0] = 0
+        return ret[0], [self._error_code, self._warn_code]
+
+    @xarm_is_connected(_type='set')
+    async def clean_error(self):
+        ret = await self.arm_cmd.clean_err()
+        await self.get_state()
+        self._update_ready('clean_error')
+        return ret[0]
+
+    @xarm_is_connected(_type='set')
+    async def clean_warn(self):
+        ret = await self.arm_cmd.clean_war()
+        return ret[0]
+
+    @xarm_is_connected(_type='set')
+    async def motion_enable(self, enable=True, servo_id=None):
+        assert servo_id is None or (isinstance(servo_id, int) and 1 <= servo_id <= 8)
+        if servo_id is None or servo_id == 8:
+            ret = await self.arm_cmd.motion_en(8, int(enable))
+        else:
+            ret = await self.arm_cmd.motion_en(servo_id, int(enable))
+        await self.get_state()
+        self._update_ready('motion_enable')
+        return ret[0]
+
+    @xarm_is_connected(_type='get')
+    async def get_position(self, is_radian=None):
+        is_radian = self._default_is_radian if is_radian is None else is_radian
+        ret = await self.arm_cmd.get_tcp_pose()
+        if ret[0] in [0, XCONF.UxbusState.ERR_CODE, XCONF.UxbusState.WAR_CODE] and len(ret) > 6:
+            self._position = [float('{:.6f}'.format(ret[i])) for i in range(1, 7)]
+            ret[0] = 0
+        return ret[0], [self._position[i] * RAD_DEGREE if 2 < i < 6 and not is_radian else self._position[i] for i in
+                        range(len(self._position))]
+
+    @xarm_is_connected(_type='get')
+    async def get_servo_angle(self, servo_id=None, is_radian=None):
+        is_radian = self._default_is_radian if is_radian is None else is_radian
+        ret = await self.arm_cmd.get_joint_pos()
+        if ret[0] in [0, XCONF.UxbusState.ERR_CODE, XCONF.UxbusState.WAR_CODE] and len(ret) > 7:
+            self._angles = [float('{:.6f}'.format(ret[i])) for i in range(1, 8)]
+            ret[0] = 0
+        if servo_id is None or servo_id == 8 or len(self._angles) < servo_id:
+            return ret[0], list(map(lambda x: x if is_radian else x * RAD_DEGREE, self._angles))
+        else:
+            return ret[0], self._angles[servo_id-1] if is_radian else self._angles[servo_id-1] * RAD_DEGREE
+
+    @xarm_is_ready(_type='set')
+    async def set_position(self, x=None, y=None, z=None, roll=None, pitch=None, yaw=None, radius=None,
+                           speed=None, mvacc=None, mvtime=None, relative=False, is_radian=None,
+                           wait=False, timeout=None, **kwargs):
+        ret = await self._wait_until_cmdnum_lt_max()
+        if ret is not None:
+            return ret
+
+        is_radian = self._default_is_radian if is_radian is None else is_radian
+        last_used_position = self._last_position.copy()
+        last_used_tcp_speed = self._last_tcp_speed
+        last_used_tcp_acc = self._last_tcp_acc
+        ret = self._update_last_position([x, y, z, roll, pitch, yaw], speed, mvacc, mvtime,
+                                         relative=relative, is_radian=is_radian, **kwargs)
+        if ret is not None:
+            return ret
+
+        if radius is not None and radius >= 0:
+            ret = await self.arm_cmd.move_lineb(self._last_position, self._last_tcp_speed,
+                                                self._last_tcp_acc, self._mvtime, radius)
+        else:
+            ret = await self.arm_cmd.move_line(self._last_position, self._last_tcp_speed,
+                                               self._last_tcp_acc, self._mvtime)
+        logger.debug('move line({}): pos={}, mvvelo={}, mvacc={}, mvtime={}, mvradius={}'.format(
+            ret[0], self._last_position, self._last_tcp_speed, self._last_tcp_acc, self._mvtime, radius
+        ))
+        if wait and ret[0] in [0, XCONF.UxbusState.WAR_CODE, XCONF.UxbusState.ERR_CODE]:
+            await self._wait_move(timeout)
+        if ret[0] < 0:
+            self._last_position = last_used_position
+            self._last_tcp_speed = last_used_tcp_speed
+            self._last_tcp_acc = last_used_tcp_acc
+        return ret[0]
+
+    @xarm_is_ready(_type='set')
+    async def set_servo_angle(self, servo_id=None, angle=None, speed=None, mvacc=None, mvtime=None,
+                              relative=False, is_radian=None, wait=False, timeout=None, **kwargs):
+        assert ((servo_id is None or servo_id == 8) and isinstance(angle, Iterable)) \
+            or (1 <= servo_id <= 7 and angle is not None and not isinstance(angle, Iterable)), \
+            'param servo_id or angle error'
+        ret = await self._wait_until_cmdnum_lt_max()
+        if ret is not None:
+            return ret
+
+        is_radian = self._default_is_radian if is_radian is None else is_radian
+        last_used_angle = self._last_angles.copy()
+        last_used_joint_speed = self._last_joint_speed
+        last_used_joint_acc = self._last_joint_acc
+        ret = self._update_last_angles(servo_id, angle, speed, mvacc, mvtime,
+                                       relative=relative, is_radian=is_radian, **kwargs)
+        if ret is not None:
+            return ret
+
+        ret = await self.arm_cmd.move_joint(self._last_angles, self._last_joint_speed,
+                                            self._last_joint_acc, self._mvtime)
+        logger.debug('move joint({}): joint={}, mvvelo={}, mvacc={}, mvtime={}'.format(
+            ret[0], self._last_angles, self._last_joint_speed, self._last_joint_acc, self._mvtime
+        ))
+        if wait and ret[0] in [0, XCONF.UxbusState.WAR_CODE, XCONF.UxbusState.ERR_CODE]:
+            await self._wait_move(timeout)
+        if ret[0] < 0:
+            self._last_angles = last_used_angle
+            self._last_joint_speed = last_used_joint_speed
+            self._last_joint_acc = last_used_joint_acc
+        return ret[0]
+
+    @xarm_is_ready(_type='set')
+    async def set_servo_angle_j(self, angles, speed=None, mvacc=None, mvtime=None, is_radian=None, **kwargs):
+        is_radian = self._default_is_radian if is_radian is None else is_radian
+        if not is_radian:
+            angles = [angle / RAD_DEGREE for angle in angles]
+        for i in range(7):
+            if self._is_out_of_joint_range(angles[i], i):
+                return APIState.OUT_OF_RANGE
+        ret = await self.arm_cmd.move_servoj(angles, self._last_joint_speed, self._last_joint_acc, self._mvtime)
+        return ret[0]
+
+    @xarm_is_ready(_type='set')
+    async def move_gohome(self, speed=None, mvacc=None, mvtime=None, is_radian=None, wait=False, timeout=None, **kwargs):
+        is_radian = self._default_is_radian if is_radian is None else is_radian
+        if speed is None:
+            speed = 0.8726646259971648  # 50 °/s
+        elif not is_radian:
+            speed /= RAD_DEGREE
+        if mvacc is None:
+            mvacc = 17.453292519943297  # 1000 °/s^2
+        elif not is_radian:
+            mvacc /= RAD_DEGREE
+        if mvtime is None:
+            mvtime = 0
+
+        ret = await self.arm_cmd.move_gohome(speed, mvacc, mvtime)
+        logger.debug('move gohome({}): mvvelo={}, mvacc={}, mvtime={}'.format(ret[0], speed, mvacc, mvtime))
+        if ret[0] in [0, XCONF.UxbusState.WAR_CODE, XCONF.UxbusState.ERR_CODE]:
+            self._last_position = [201.5, 0, 140.5, -3.1415926, 0, 0]
+            self._last_angles = [0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0]
+            if wait:
+                await self._wait_move(timeout)
+        return ret[0]
+
+    async def reset(self, speed=None, mvacc=None, mvtime=None, is_radian=None, wait=False, timeout=None):
+        is_radian = self._default_is_radian if is_radian is None else is_radian
+        if not self._enable_report:
+            await self.get_err_warn_code()
+            await self.get_state()
+        if self._warn_code != 0:
+            await self.clean_warn()
+        if self._error_code != 0:
+            await self.clean_error()
+            await self.motion_enable(enable=True, servo_id=8)
+            await self.set_state(0)
+        if not self._is_ready:
+            await self.motion_enable(enable=True, servo_id=8)
+            await self.set_state(state=0)
+        return await self.move_gohome(speed=speed, mvacc=mvacc, mvtime=mvtime, is_radian=is_radian,
+                                      wait=wait, timeout=timeout)
+
+    @xarm_is_connected(_type='set')
+    async def set_pause_time(self, sltime, wait=False):
+        assert isinstance(sltime, (int, float))
+        ret = await self.arm_cmd.sleep_instruction(sltime)
+        if wait:
+            await asyncio.sleep(sltime)
+        else:
+            if time.time() >= self._sleep_finish_time:
+                self._sleep_finish_time = time.time() + sltime
+            else:
+                self._sleep_finish_time += sltime
+        return ret[0]
+
+    async def emergency_stop(self):
+        start_time = time.time()
+        while self.state != 4 and time.time() - start_time < 3:
+            await self.set_state(4)
+            await asyncio.sleep(0.1)
+        self._is_stop = True
+        start_time = time.time()
+        await self.motion_enable(enable=True)
+        while self.state in [0, 3, 4] and time.time() - start_time < 3:
+            await self.set_state(0)
+            await asyncio.sleep(0.1)
+        self._sleep_finish_time = 0
+
+
+for _name in dir(XArm):
+    if _name.startswith('_') or _name in AsyncXArm.__dict__ or _name in SYNC_SAFE_METHODS or hasattr(Events, _name):
+        continue
+    if callable(getattr(XArm, _name)):
+        setattr(AsyncXArm, _name, _not_async(_name))
@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2019, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+"""
+Capture of the raw report frames
+    ReportRecorder(path): appends every frame to a memory-mapped file, the file grows by chunks
+    ReportCapture(path): reads a capture lazily through mmap (hours of capture are not loaded)
+    ReportReplay(capture, arm, speed): feeds the frames of a capture to the report handlers of an XArm
+File: [CAPTURE_HEADER] + records of [RECORD_HEADER (time, length, protocol, report type)] + frame
+The record header is written after its frame, the preallocated tail is zero (length 0 ends the records),
+so a capture which was not closed is still readable.
+The sidecar path + '.idx' is a sparse index of [INDEX_ENTRY (time, offset)], one entry every index_interval seconds.
+
+Capture of the control channel (the requests of UxbusCmdTcp.send_xbus and all the received responses)
+    WireRecorder(path): appends the frames of both directions with nanosecond timestamps (time.time_ns())
+    WireLog(path): the exchanges of a log, every request paired with its response by the bus_flag
+    WireReplay(log): responder of loop:// which answers the requests with the recorded responses
+File: [CAPTURE_HEADER] + records of [WIRE_RECORD (time ns, direction, length)] + frame
+
+    register_responder('replay', WireReplay('cmd.log', report_capture='report.bin'))
+    arm = XArmAPI('loop://replay')
+"""
+
+import bisect
+import mmap
+import os
+import struct
+import threading
+import time
+from ..core.wrapper.uxbus_cmd_tcp import TX2_HEADER, TX2_PROT_CON
+
+CAPTURE_MAGIC = b'XARMRC'
+CAPTURE_VERSION = 1
+CAPTURE_HEADER = struct.Struct('<6sHd')  # [magic, version, start time]
+RECORD_HEADER = struct.Struct('<dHBB')  # [time, frame length, protocol (1: old protocol), report type]
+INDEX_ENTRY = struct.Struct('<dQ')  # [time, record offset]
+WIRE_MAGIC = b'XARMWC'
+WIRE_RECORD = struct.Struct('<QBH')  # [time ns, direction, frame length]
+WIRE_REQUEST = 0
+WIRE_RESPONSE = 1
+
+REPORT_TYPE_CODES = {'normal': 0, 'rich': 1, 'real': 2}
+REPORT_TYPE_NAMES = {code: name for name, code in REPORT_TYPE_CODES.items()}
+
+
+class ReportRecorder(object):
+    """
+    :param path: the capture file, an existing file is overwritten
+    :param chunk_size: the bytes the file grows by
+    :param index_interval: the seconds between the index entries
+    """
+    def __init__(self, path, chunk_size=16 * 1024 * 1024, index_interval=1.0):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.index_interval = index_interval
+        self.count = 0
+        self._lock = threading.Lock()
+        self._file = open(path, 'w+b')
+        self._index = open(path + '.idx', 'wb')
+        self._size = max(chunk_size, CAPTURE_HEADER.size)
+        self._file.truncate(self._size)
+        self._mm = mmap.mmap(self._file.fileno(), self._size)
+        CAPTURE_HEADER.pack_into(self._mm, 0, CAPTURE_MAGIC, CAPTURE_VERSION, time.time())
+        self._offset = CAPTURE_HEADER.size
+        self._next_index_time = 0
+
+    @property
+    def closed(self):
+        return self._mm is None
+
+    def _grow(self, need):
+        self._mm.flush()
+        self._mm.close()
+        self._size += max(self.chunk_size, need)
+        self._file.truncate(self._size)
+        self._mm = mmap.mmap(self._file.fileno(), self._size)
+
+    def write(self, frame, report_type='rich', is_old_protocol=False, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        length = len(frame)
+        with self._lock:
+            if self._mm is None:
+                return
+            offset = self._offset
+            end = offset + RECORD_HEADER.size + length
+            if end > self._size:
+                self._grow(end - self._size)
+            self._mm[offset + RECORD_HEADER.size:end] = frame
+            RECORD_HEADER.pack_into(self._mm, offset, timestamp, length, 1 if is_old_protocol else 0,
+                                    REPORT_TYPE_CODES.get(report_type, 1))
+            self._offset = end
+            self.count += 1
+            if timestamp >= self._next_index_time:
+                self._index.write(INDEX_ENTRY.pack(timestamp, offset))
+                self._index.flush()
+                self._next_index_time = timestamp + self.index_interval
+
+    def flush(self):
+        with self._lock:
+            if self._mm is not None:
+                self._mm.flush()
+                self._index.flush()
+
+    def close(self):
+        with self._lock:
+            if self._mm is None:
+                return
+            self._mm.flush()
+            self._mm.close()
+            self._mm = None
+            self._file.truncate(self._offset)
+            self._file.close()
+            self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class ReportCapture(object):
+    """
+    :param path: the capture file of ReportRecorder
+    """
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.version, self.start_time = CAPTURE_HEADER.unpack_from(self._mm, 0)
+        if magic != CAPTURE_MAGIC:
+            self.close()
+            raise ValueError('{} is not a report capture'.format(path))
+        self._index_times, self._index_offsets = [], []
+        if os.path.exists(path + '.idx'):
+            with open(path + '.idx', 'rb') as f:
+                data = f.read()
+            for timestamp, offset in INDEX_ENTRY.iter_unpack(data[:len(data) - len(data) % INDEX_ENTRY.size]):
+                self._index_times.append(timestamp)
+                self._index_offsets.append(offset)
+
+    def _seek(self, t0):
+        # the offset of the last indexed record before t0
+        i = bisect.bisect_right(self._index_times, t0) - 1
+        return self._index_offsets[i] if i >= 0 else CAPTURE_HEADER.size
+
+    def records(self, t0=None, t1=None):
+        """
+        Iterate the records between t0 and t1 (time.time() of the receptions)
+        :return: generator of (time, frame, report_type, is_old_protocol)
+        """
+        mm = self._mm
+        size = len(mm)
+        offset = CAPTURE_HEADER.size if t0 is None else self._seek(t0)
+        while offset + RECORD_HEADER.size <= size:
+            timestamp, length, protocol, report_type = RECORD_HEADER.unpack_from(mm, offset)
+            if length == 0:
+                break
+            start = offset + RECORD_HEADER.size
+            offset = start + length
+            if t0 is not None and timestamp < t0:
+                continue
+            if t1 is not None and timestamp > t1:
+                break
+            yield timestamp, mm[start:offset], REPORT_TYPE_NAMES.get(report_type, 'rich'), protocol == 1
+
+    def __iter__(self):
+        return self.records()
+
+    @property
+    def end_time(self):
+        """
+        The time of the last record (scans from the last index entry)
+        """
+        last = None
+        for record in self.records(self._index_times[-1] if self._index_times else None):
+            last = record[0]
+        return last
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class ReportReplay(object):
+    """
+    :param capture: ReportCapture (or the path of a capture)
+    :param arm: the XArm which handles the frames, such as XArm(do_not_open=True)
+    :param speed: 1 is real time, 10 is 10 times faster, 0 is as fast as possible
+    """
+    def __init__(self, capture, arm, speed=1.0):
+        self.capture = ReportCapture(capture) if isinstance(capture, str) else capture
+        self.arm = arm
+        self.speed = speed
+        self.count = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run(self, t0=None, t1=None):
+        """
+        Replay the records between t0 and t1 in the calling thread
+        :return: the number of replayed frames
+        """
+        self._stop.clear()
+        self.count = 0
+        if not self.arm.connected:
+            # nothing to sync with on an offline arm
+            self.arm._is_sync = True
+        started = time.time()
+        first = None
+        for timestamp, frame, report_type, is_old_protocol in self.capture.records(t0, t1):
+            if self._stop.is_set():
+                break
+            if self.speed:
+                first = timestamp if first is None else first
+                delay = (timestamp - first) / self.speed - (time.time() - started)
+                if delay > 0 and self._stop.wait(delay):
+                    break
+            self.arm._is_old_protocol = is_old_protocol
+            self.arm._handle_report_data(frame)
+            self.count += 1
+        return self.count
+
+    def start(self, t0=None, t1=None):
+        self._thread = threading.Thread(target=self.run, args=(t0, t1), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self.join()
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    @property
+    def alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+
+class WireRecorder(object):
+    """
+    :param path: the log file, an existing file is overwritten
+    """
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._lock = threading.Lock()
+        self._file = open(path, 'wb')
+        self._file.write(CAPTURE_HEADER.pack(WIRE_MAGIC, CAPTURE_VERSION, time.time()))
+
+    @property
+    def closed(self):
+        return self._file is None
+
+    def _write(self, direction, frame):
+        timestamp = time.time_ns()
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(WIRE_RECORD.pack(timestamp, direction, len(frame)))
+            self._file.write(frame)
+            self.count += 1
+
+    def write_request(self, frame):
+        self._write(WIRE_REQUEST, frame)
+
+    def write_response(self, frame):
+        self._write(WIRE_RESPONSE, frame)
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class WireLog(object):
+    """
+    :param path: the log file of WireRecorder
+    exchanges: [request time ns, funcode, request data, response time ns (or None), response frame (or None)],
+        in the order of the requests
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, self.version, self.start_time = CAPTURE_HEADER.unpack_from(data, 0)
+        if magic != WIRE_MAGIC:
+            raise ValueError('{} is not a wire log'.format(path))
+        self.exchanges = []
+        pending = {}
+        offset = CAPTURE_HEADER.size
+        while offset + WIRE_RECORD.size <= len(data):
+            timestamp, direction, length = WIRE_RECORD.unpack_from(data, offset)
+            start = offset + WIRE_RECORD.size
+            offset = start + length
+            frame = data[start:offset]
+            if len(frame) < TX2_HEADER.size:
+                break
+            bus_flag, prot, _, funcode = TX2_HEADER.unpack_from(frame)
+            if prot != TX2_PROT_CON:
+                continue
+            if direction == WIRE_REQUEST:
+                pending[bus_flag] = len(self.exchanges)
+                self.exchanges.append([timestamp, funcode, frame[TX2_HEADER.size:], None, None])
+            else:
+                index = pending.pop(bus_flag, None)
+                if index is not None and self.exchanges[index][1] == funcode:
+                    self.exchanges[index][3:] = [timestamp, frame]
+
+    def __len__(self):
+        return len(self.exchanges)
+
+
+class WireReplay(object):
+    """
+    Stands in for the controller with the responses of a wire log (a responder of loop://)
+    The n-th request is answered by the response of the next recorded request with the same funcode
+    (looking ahead up to lookahead exchanges), the bus_flag of the response is the one of the live request.
+    A request without recorded exchange is answered by the last response of its funcode (or not at all).
+    :param log: WireLog (or the path of a log)
+    :param report_capture: ReportCapture (or the path of a capture) of the same session, the reports are
+        pushed at the recorded times relative to the first request
+    :param latency: delay every response by its recorded round-trip time
+    :param lookahead: the recorded exchanges searched for the funcode of a request
+    """
+    def __init__(self, log, report_capture=None, latency=False, lookahead=64):
+        self.log = WireLog(log) if isinstance(log, str) else log
+        self.reports = ReportCapture(report_capture) if isinstance(report_capture, str) else report_capture
+        self.latency = latency
+        self.lookahead = lookahead
+        self.matched = 0
+        self.skipped = 0
+        self.missed = 0
+        self.diverged = 0
+        self._next = 0
+        self._last = {}
+        self._lock = threading.Lock()
+        self._clock_offset = None
+        self._report_iter = None
+        self._pending_report = None
+
+    @property
+    def stats(self):
+        return {
+            'matched': self.matched,
+            'skipped': self.skipped,
+            'missed': self.missed,
+            'diverged': self.diverged,
+            'remaining': len(self.log.exchanges) - self._next,
+        }
+
+    def _find(self, funcode):
+        exchanges = self.log.exchanges
+        for i in range(self._next, min(self._next + self.lookahead, len(exchanges))):
+            if exchanges[i][1] == funcode and exchanges[i][4] is not None:
+                self.skipped += i - self._next
+                self._next = i + 1
+                return exchanges[i]
+        return None
+
+    def handle_frame(self, frame):
+        bus_flag, prot, _, funcode = TX2_HEADER.unpack_from(frame)
+        if prot != TX2_PROT_CON:
+            return bytes(frame)
+        with self._lock:
+            if self._clock_offset is None:
+                first = self.log.exchanges[0][0] / 1e9 if self.log.exchanges else self.log.start_time
+                self._clock_offset = time.time() - first
+            exchange = self._find(funcode)
+            if exchange is None:
+                self.missed += 1
+                response = self._last.get(funcode)
+                if response is None:
+                    return None
+            else:
+                self.matched += 1
+                if exchange[2] != bytes(frame[TX2_HEADER.size:]):
+                    self.diverged += 1
+                response = exchange[4]
+                self._last[funcode] = response
+        if exchange is not None and self.latency:
+            time.sleep((exchange[3] - exchange[0]) / 1e9)
+        response = bytearray(response)
+        struct.pack_into('>H', response, 0, bus_flag)
+        return response
+
+    def report_frame(self, report_type):
+        # the latest recorded report of the replay clock (recorded time + offset of the first request)
+        if self.reports is None or self._clock_offset is None:
+            return None
+        if self._report_iter is None:
+            self._report_iter = self.reports.records()
+        now = time.time() - self._clock_offset
+        frame = None
+        while True:
+            if self._pending_report is None:
+                self._pending_report = next(self._report_iter, None)
+                if self._pending_report is None:
+                    break
+            if self._pending_report[0] > now:
+                break
+            frame = self._pending_report[1]
+            self._pending_report = None
+        return frame
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2019, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+"""
+Telemetry history of the reported states in a preallocated numpy ring buffer (numpy required)
+One record per report: time (time.time()), joints (rad), pose (mm, rad), torque, state, error_code, warn_code, cmdnum.
+The ring has 2 * capacity slots and every record is written twice (at i and i + slots), so the last `capacity`
+records are always one contiguous slice and window/latest return views of the buffer without copying.
+The next `capacity` reports are written to the other slots, a view is overwritten after `capacity` more reports,
+copy() it to keep it.
+"""
+
+import threading
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HISTORY_DTYPE = [
+    ('time', '<f8'),
+    ('joints', '<f8', (7,)),
+    ('pose', '<f8', (6,)),
+    ('torque', '<f8', (7,)),
+    ('state', 'u1'),
+    ('error_code', 'u1'),
+    ('warn_code', 'u1'),
+    ('cmdnum', '<u4'),
+]
+
+_INTERPOLATED = ('joints', 'pose', 'torque')
+
+
+class TelemetryHistory(object):
+    """
+    :param seconds: the seconds of history to keep
+    :param rate: the max reports per second, capacity = seconds * rate records
+    """
+    def __init__(self, seconds=10, rate=100):
+        if np is None:
+            raise ImportError('numpy module is not found, please `pip install numpy` (or `pip install xArm-Python-SDK[numpy]`)')
+        self.capacity = max(int(seconds * rate), 2)
+        # the slots out of the views are written first, the kept records stay unchanged for capacity reports
+        self._slots = self.capacity * 2
+        self._buf = np.zeros(self._slots * 2, dtype=HISTORY_DTYPE)
+        self._count = 0  # the records ever written
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    def append(self, timestamp, snapshot):
+        """
+        Record a snapshot (RobotStateSnapshot), called by the report thread
+        """
+        index = self._count % self._slots
+        self._buf[index] = (timestamp, snapshot.angles, snapshot.position, snapshot.joints_torque,
+                            snapshot.state, snapshot.error_code, snapshot.warn_code, snapshot.cmd_num)
+        self._buf[index + self._slots] = self._buf[index]
+        with self._lock:
+            self._count += 1
+
+    def clear(self):
+        with self._lock:
+            self._count = 0
+
+    def _records(self):
+        # the contiguous view of all the kept records, the oldest first
+        with self._lock:
+            count = self._count
+        size = min(count, self.capacity)
+        end = count % self._slots + self._slots
+        return self._buf[end - size:end]
+
+    def latest(self, n=1):
+        """
+        :return: view of the last n records (fewer if not recorded yet)
+        """
+        records = self._records()
+        return records[max(len(records) - n, 0):]
+
+    def window(self, t0, t1=None):
+        """
+        :param t0: the start time (time.time())
+        :param t1: the end time, default is now
+        :return: view of the records with t0 <= time <= t1
+        """
+        records = self._records()
+        times = records['time']
+        start = np.searchsorted(times, t0, side='left')
+        end = len(records) if t1 is None else np.searchsorted(times, t1, side='right')
+        return records[start:end]
+
+    def at(self, t):
+        """
+        The state at time t, joints/pose/torque are interpolated linearly between the two reports around t,
+        the other fields are the values of the report before t
+        :return: one record (numpy.void), None if t is out of the history
+        """
+        records = self._records()
+        times = records['time']
+        if not len(records) or t < times[0] or t > times[-1]:
+            return None
+        index = np.searchsorted(times, t, side='right') - 1
+        if index >= len(records) - 1 or times[index] == t:
+            return records[index].copy()
+        before, after = records[index], records[index + 1]
+        ratio = (t - before['time']) / (after['time'] - before['time'])
+        record = before.copy()
+        record['time'] = t
+        for name in _INTERPOLATED:
+            record[name] = before[name] + (after[name] - before[name]) * ratio
+        return record
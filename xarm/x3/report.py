@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2019, UFACTORY, Inc.
+# All rights reserved.
+#
+# Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
+
+"""
+Layouts of the report frames
+Every layout is declared once as (name, offset, format, count) fields, format is a numpy type string
+('<f4': fp32 little-endian, '>u2'/'>u4': big-endian, 'u1': u8, 'S29': bytes).
+From the same declaration:
+    layout.unpack(frame): the fields of one frame with a few precompiled struct calls
+    layout.pack(values): one frame from the fields (the inverse of unpack, used by the controller simulator)
+    layout.dtype / decode_reports(data): numpy structured dtype, all the frames of a buffer in one np.frombuffer call
+        (split by the size headers if the frames are not all of the layout size)
+numpy is optional (the `numpy` extra: `pip install xArm-Python-SDK[numpy]`), only the numpy interfaces need it.
+"""
+
+import struct
+from ..core.config.x_config import XCONF
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_STRUCT_CODES = {
+    'u1': (None, 'B'),
+    '>u2': ('>', 'H'),
+    '>u4': ('>', 'I'),
+    '<f4': ('<', 'f'),
+}
+
+
+def _struct_code(fmt):
+    if fmt.startswith('S'):
+        return None, '{}s'.format(fmt[1:])
+    return _STRUCT_CODES[fmt]
+
+
+def _field_size(fmt, count):
+    if fmt.startswith('S'):
+        return int(fmt[1:])
+    return struct.calcsize(_struct_code(fmt)[1]) * count
+
+
+def _make_segments(fields):
+    # consecutive fields of the same byte order are unpacked by one struct
+    segments = []
+    current = None
+    for name, offset, fmt, count in sorted(fields, key=lambda f: f[1]):
+        order, code = _struct_code(fmt)
+        if current is None or (order and current['order'] and order != current['order']):
+            current = {'order': order, 'start': offset, 'end': offset, 'codes': [], 'names': []}
+            segments.append(current)
+        current['order'] = current['order'] or order
+        if offset > current['end']:
+            current['codes'].append('{}x'.format(offset - current['end']))
+        current['codes'].append(code if count == 1 else '{}{}'.format(count, code))
+        current['names'].append((name, 1 if fmt.startswith('S') else count))
+        current['end'] = offset + _field_size(fmt, count)
+    ret = []
+    for seg in segments:
+        scalars, arrays = [], []
+        index = 0
+        for name, count in seg['names']:
+            if count == 1:
+                scalars.append((name, index))
+            else:
+                arrays.append((name, index, index + count))
+            index += count
+        ret.append((seg['start'], seg['end'], struct.Struct((seg['order'] or '<') + ''.join(seg['codes'])),
+                    scalars, arrays))
+    return ret
+
+
+class ReportLayout(object):
+    def __init__(self, name, fields, size):
+        self.name = name
+        self.fields = fields
+        self.size = size
+        self._segments = _make_segments(fields)
+        # the frames shorter than the layout (older firmware) are decoded field by field
+        self._field_segments = [_make_segments([field])[0] for field in fields]
+        self._dtype = None
+        self._field_structs = None
+
+    @property
+    def dtype(self):
+        if self._dtype is None:
+            if np is None:
+                raise ImportError('numpy module is not found, please `pip install numpy` (or `pip install xArm-Python-SDK[numpy]`)')
+            self._dtype = np.dtype({
+                'names': [f[0] for f in self.fields],
+                'formats': [f[2] if f[3] == 1 else (f[2], (f[3],)) for f in self.fields],
+                'offsets': [f[1] for f in self.fields],
+                'itemsize': self.size,
+            })
+        return self._dtype
+
+    def unpack(self, data):
+        """
+        Decode one frame, the fields which are out of the frame are left out
+        :return: {name: value or list of values}
+        """
+        ret = {}
+        length = len(data)
+        segments = self._segments if length >= self.size else self._field_segments
+        for start, end, st, scalars, arrays in segments:
+            if end > length:
+                continue
+            values = st.unpack_from(data, start)
+            for name, index in scalars:
+                ret[name] = values[index]
+            for name, index, stop in arrays:
+                ret[name] = list(values[index:stop])
+        return ret
+
+    def pack(self, values):
+        """
+        Encode one frame of the layout size, the missing fields are zeros
+        :param values: {name: value or list of values}, 'size' defaults to the layout size
+        :return: bytearray
+        """
+        if self._field_structs is None:
+            self._field_structs = []
+            for name, offset, fmt, count in self.fields:
+                order, code = _struct_code(fmt)
+                st = struct.Struct((order or '<') + (code if count == 1 else '{}{}'.format(count, code)))
+                self._field_structs.append((name, offset, st, count > 1 and not fmt.startswith('S')))
+        buf = bytearray(self.size)
+        for name, offset, st, is_array in self._field_structs:
+            value = values.get(name, self.size if name == 'size' else None)
+            if value is None:
+                continue
+            if is_array:
+                st.pack_into(buf, offset, *value)
+            else:
+                st.pack_into(buf, offset, value)
+        return buf
+
+
+_NORMAL_FIELDS = [
+    ('size', 0, '>u4', 1),
+    ('state_mode', 4, 'u1', 1),
+    ('cmd_num', 5, '>u2', 1),
+    ('angles', 7, '<f4', 7),
+    ('pose', 35, '<f4', 6),
+    ('torque', 59, '<f4', 7),
+    ('mtbrake', 87, 'u1', 1),
+    ('mtable', 88, 'u1', 1),
+    ('error_code', 89, 'u1', 1),
+    ('warn_code', 90, 'u1', 1),
+    ('pose_offset', 91, '<f4', 6),
+    ('tcp_load', 115, '<f4', 4),
+    ('collis_sens', 131, 'u1', 1),
+    ('teach_sens', 132, 'u1', 1),
+    ('gravity_direction', 133, '<f4', 3),
+]
+
+_RICH_FIELDS = _NORMAL_FIELDS + [
+    ('arm_type', 145, 'u1', 1),
+    ('arm_axis', 146, 'u1', 1),
+    ('arm_master_id', 147, 'u1', 1),
+    ('arm_slave_id', 148, 'u1', 1),
+    ('arm_motor_tid', 149, 'u1', 1),
+    ('arm_motor_fid', 150, 'u1', 1),
+    ('version', 151, 'S29', 1),
+    ('trs_msg', 181, '<f4', 5),
+    ('p2p_msg', 201, '<f4', 5),
+    ('rot_msg', 221, '<f4', 2),
+    ('sv3_msg', 229, 'u1', 16),
+]
+
+_OLD_NORMAL_FIELDS = [
+    ('size', 0, '>u4', 1),
+    ('state', 4, 'u1', 1),
+    ('mtbrake', 5, 'u1', 1),
+    ('mtable', 6, 'u1', 1),
+    ('error_code', 7, 'u1', 1),
+    ('warn_code', 8, 'u1', 1),
+    ('angles', 9, '<f4', 7),
+    ('pose', 37, '<f4', 6),
+    ('cmd_num', 61, '>u2', 1),
+    ('pose_offset', 63, '<f4', 6),
+]
+
+_OLD_RICH_FIELDS = _OLD_NORMAL_FIELDS + [
+    ('arm_type', 87, 'u1', 1),
+    ('arm_axis', 88, 'u1', 1),
+    ('arm_master_id', 89, 'u1', 1),
+    ('arm_slave_id', 90, 'u1', 1),
+    ('arm_motor_tid', 91, 'u1', 1),
+    ('arm_motor_fid', 92, 'u1', 1),
+    ('version', 93, 'S29', 1),
+    ('trs_msg', 123, '<f4', 5),
+    ('p2p_msg', 143, '<f4', 5),
+    ('rot_msg', 163, '<f4', 2),
+    ('sv3_msg', 171, '>u2', 8),
+]
+
+REPORT_REAL = ReportLayout('real', _NORMAL_FIELDS[:6], XCONF.SocketConf.TCP_REPORT_REAL_BUF_SIZE)
+REPORT_NORMAL = ReportLayout('normal', _NORMAL_FIELDS, 145)
+REPORT_RICH = ReportLayout('rich', _RICH_FIELDS, 245)
+REPORT_NORMAL_OLD = ReportLayout('normal', _OLD_NORMAL_FIELDS, 87)
+REPORT_RICH_OLD = ReportLayout('rich', _OLD_RICH_FIELDS, 187)
+
+_LAYOUTS = {
+    ('real', False): REPORT_REAL,
+    ('normal', False): REPORT_NORMAL,
+    ('rich', False): REPORT_RICH,
+    ('normal', True): REPORT_NORMAL_OLD,
+    ('rich', True): REPORT_RICH_OLD,
+}
+
+
+def report_layout(report_type='rich', is_old_protocol=False):
+    return _LAYOUTS[(report_type, bool(is_old_protocol))]
+
+
+def report_dtype(report_type='rich', is_old_protocol=False):
+    return report_layout(report_type, is_old_protocol).dtype
+
+
+_FRAME_SIZE = struct.Struct('>I')
+
+
+def _frame_spans(data):
+    # (offset, size) of the back-to-back frames by their size headers, stops at an invalid or incomplete frame
+    spans = []
+    offset = 0
+    while offset + _FRAME_SIZE.size <= len(data):
+        size = _FRAME_SIZE.unpack_from(data, offset)[0]
+        if size < _FRAME_SIZE.size or offset + size > len(data):
+            break
+        spans.append((offset, size))
+        offset += size
+    return spans
+
+
+def decode_reports(data, report_type='rich', is_old_protocol=False):
+    """
+    Decode a buffer of back-to-back frames of the same report type in one call (numpy required)
+    The frames of the layout size are decoded with one np.frombuffer call, a buffer with frames of other sizes
+    (such as the shorter frames of older firmware) is split by the size headers, the fields out of a shorter
+    frame are zeros (check ret['size']) and the bytes beyond the layout of a longer frame are ignored
+    :param data: bytes/bytearray/memoryview, the trailing incomplete frame is ignored
+    :return: numpy structured array, such as ret['angles'] (N x 7), ret['error_code'] (N)
+    """
+    layout = report_layout(report_type, is_old_protocol)
+    dtype = layout.dtype
+    count = len(data) // layout.size
+    reports = np.frombuffer(data, dtype=dtype, count=count)
+    tail = count * layout.size
+    if (reports['size'] == layout.size).all() and \
+            (len(data) - tail < _FRAME_SIZE.size or _FRAME_SIZE.unpack_from(data, tail)[0] == layout.size):
+        return reports
+    spans = _frame_spans(memoryview(data).cast('B'))
+    raw = np.frombuffer(data, dtype=np.uint8)
+    reports = np.zeros(len(spans), dtype=dtype)
+    records = reports.view(np.uint8).reshape(len(spans), layout.size)
+    for i, (offset, size) in enumerate(spans):
+        size = min(size, layout.size)
+        records[i, :size] = raw[offset:offset + size]
+    return reports
+
+
+class RobotStateSnapshot(object):
+    """
+    The state of the arm decoded from one report frame
+    The report handler fills a new snapshot and publishes it with one reference swap,
+    so a reader on another thread always sees the fields of the same frame.
+    The values are not rounded, round_pose/round_angles are applied where they are returned to the user.
+    Note: do not modify a published snapshot, use copy()
+    """
+    __slots__ = ('state', 'mode', 'cmd_num', 'error_code', 'warn_code', 'mtbrake', 'mtable',
+                 'angles', 'position', 'position_offset', 'joints_torque', 'tcp_load',
+                 'collision_sensitivity', 'teach_sensitivity', 'gravity_direction')
+
+    def __init__(self):
+        self.state = 4
+        self.mode = 0
+        self.cmd_num = 0
+        self.error_code = 0
+        self.warn_code = 0
+        self.mtbrake = 0  # bit i: the brake state of the motor-(i+1)
+        self.mtable = 0  # bit i: the enable state of the motor-(i+1)
+        self.angles = [0] * 7
+        self.position = [0] * 6
+        self.position_offset = [0] * 6
+        self.joints_torque = [0] * 7
+        self.tcp_load = [0, 0, 0, 0]  # [weight, x, y, z]
+        self.collision_sensitivity = 0
+        self.teach_sensitivity = 0
+        self.gravity_direction = [0, 0, -1]
+
+    def copy(self, **kwargs):
+        snapshot = RobotStateSnapshot.__new__(RobotStateSnapshot)
+        for name in self.__slots__:
+            setattr(snapshot, name, kwargs[name] if name in kwargs else getattr(self, name))
+        return snapshot
+
+    @property
+    def motor_brake_states(self):
+        return [self.mtbrake >> i & 0x01 for i in range(8)]
+
+    @property
+    def motor_enable_states(self):
+        return [self.mtable >> i & 0x01 for i in range(8)]
+
+
+class SnapshotField(object):
+    """
+    Attribute of XArm backed by a field of the published snapshot (self._snapshot),
+    a write publishes a modified copy of the snapshot with obj._update_snapshot
+    (under the snapshot lock shared with the report handler, so a report is never rolled back)
+    """
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        return getattr(obj._snapshot, self.name)
+
+    def __set__(self, obj, value):
+        obj._update_snapshot(**{self.name: value})
+
+
+def round_pose(pose):
+    return [round(pose[i], 3) if i < 3 else round(pose[i], 6) for i in range(len(pose))]
+
+
+def round_angles(angles):
+    return [round(angle, 6) for angle in angles]
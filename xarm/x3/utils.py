@@ -7,13 +7,26 @@
 # Author: Vinman <vinman.wen@ufactory.cc> <vinman.cub@gmail.com>
 
 import time
+import random
+import asyncio
 import functools
 from ..core.utils.log import logger
+from ..core.config.x_config import XCONF
 from .code import APIState
 
 
 def xarm_is_connected(_type='set'):
     def _xarm_is_connected(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_decorator(*args, **kwargs):
+                if args[0].connected:
+                    return await func(*args, **kwargs)
+                else:
+                    logger.error('xArm is not connect')
+                    return APIState.NOT_CONNECTED if _type == 'set' else (APIState.NOT_CONNECTED, 'xArm is not connect')
+            return async_decorator
+
         @functools.wraps(func)
         def decorator(*args, **kwargs):
             if args[0].connected:
@@ -27,6 +40,25 @@ def xarm_is_connected(_type='set'):
 
 def xarm_is_ready(_type='set'):
     def _xarm_is_ready(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_decorator(*args, **kwargs):
+                if args[0].connected and kwargs.get('auto_enable', False):
+                    await args[0].motion_enable(enable=True)
+                    await args[0].set_mode(0)
+                    await args[0].set_state(0)
+                if args[0].connected and args[0].ready:
+                    return await func(*args, **kwargs)
+                elif not args[0].connected:
+                    logger.error('xArm is not connect')
+                    return APIState.NOT_CONNECTED if _type == 'set' else (APIState.NOT_CONNECTED, 'xArm is not connect')
+                else:
+                    logger.error('xArm is not ready')
+                    logger.info('Please check the arm for errors. If so, please clear the error first. '
+                                'Then enable the motor, set the mode and set the state')
+                    return APIState.NOT_READY if _type == 'set' else (APIState.NOT_READY, 'xArm is not ready')
+            return async_decorator
+
         @functools.wraps(func)
         def decorator(*args, **kwargs):
             if args[0].connected and kwargs.get('auto_enable', False):
@@ -93,3 +125,60 @@ def compare_time(time1, time2):
         return int(s_time) - int(e_time) > 0
     except:
         return False
+
+
+class CommandBatch(object):
+    """
+    Scope of XArm.batch: the frames written in the scope are gathered by the control socket and sent together,
+    the set commands do not wait for their responses (a pipeline is used if pipeline_depth is 1).
+    code: the first failed code of the set commands of the scope (or 0), available after the scope
+    """
+    def __init__(self, arm):
+        self._arm = arm
+        self._active = False
+        self._own_pipeline = False
+        self.code = 0
+
+    def __enter__(self):
+        arm = self._arm
+        if arm.connected and arm._stream_type == 'socket':
+            # the pipeline is only used once the port gathers the frames
+            arm._stream.begin_batch()
+            self._active = True
+            self._own_pipeline = arm.arm_cmd.pipeline_depth == 1
+            if self._own_pipeline:
+                arm.arm_cmd.set_pipeline_depth(XCONF.SocketConf.TCP_TX_COALESCE_MAX_FRAMES)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if not self._active:
+            return False
+        arm = self._arm
+        self._active = False
+        arm._stream.end_batch()
+        if self._own_pipeline:
+            self.code = arm.arm_cmd.wait_pipeline()
+            arm.arm_cmd.set_pipeline_depth(1)
+        return False
+
+
+class Backoff(object):
+    """
+    Exponential backoff with jitter of the reconnection
+    """
+    def __init__(self, delay_min=None, delay_max=None, jitter=None):
+        self.delay_min = XCONF.SocketConf.RECONNECT_DELAY_MIN if delay_min is None else delay_min
+        self.delay_max = XCONF.SocketConf.RECONNECT_DELAY_MAX if delay_max is None else delay_max
+        self.jitter = XCONF.SocketConf.RECONNECT_JITTER if jitter is None else jitter
+        self.attempts = 0
+
+    def next(self):
+        """
+        :return: the delay (seconds) before the next attempt
+        """
+        delay = min(self.delay_min * (2 ** min(self.attempts, 16)), self.delay_max)
+        self.attempts += 1
+        return max(delay * (1 + random.uniform(-self.jitter, self.jitter)), 0)
+
+    def reset(self):
+        self.attempts = 0